@@ -1,48 +1,73 @@
-import React, { useState } from "react";
+import React, { useState, useEffect } from "react";
 import { useAuth } from "../contexts/AuthContext";
+import { loadDirectories } from "../utils/bootstrap";
 import General_info from "./tables/general_Info/General_info";
 import Maintenance from "./tables/maintenance/Maintenance";
 import Complaints from "./tables/complaints/Complaints";
+import CarLookup from "./ui/CarLookup";
+
+// Фильтры вкладок: ключи — параметры запроса списков на сервере
+const EMPTY_FILTERS = {
+  general: {
+    vehicle_model_id: null,
+    engine_model_id: null,
+    transmission_model_id: null,
+    steering_axle_model_id: null,
+    drive_axle_model_id: null,
+  },
+  maintenance: { maintenance_type_id: null, car_id: null, service_company_id: null },
+  complaints: { node_failure_id: null, recovery_method_id: null, service_company_id: null },
+};
+
+// Поля панели фильтров: [ключ фильтра, подпись, справочник]
+const FILTER_FIELDS = {
+  general: [
+    ["vehicle_model_id", "Модель техники", "vehicle"],
+    ["engine_model_id", "Модель двигателя", "engine"],
+    ["transmission_model_id", "Модель трансмиссии", "transmission"],
+    ["steering_axle_model_id", "Модель управляемого моста", "steering-axle"],
+    ["drive_axle_model_id", "Модель ведущего моста", "drive-axle"],
+  ],
+  maintenance: [
+    ["maintenance_type_id", "Вид ТО", "maintenance-types"],
+    ["service_company_id", "Сервисная компания", "service-company"],
+  ],
+  complaints: [
+    ["node_failure_id", "Узел отказа", "failure-node"],
+    ["recovery_method_id", "Способ восстановления", "recovery-method"],
+    ["service_company_id", "Сервисная компания", "service-company"],
+  ],
+};
 
 const MainAuth = () => {
   const { user } = useAuth();
   const [activeTab, setActiveTab] = useState("general");
   const [showFilters, setShowFilters] = useState(false);
+  const [filters, setFilters] = useState(EMPTY_FILTERS);
+  const [directory, setDirectory] = useState(() => () => []);
 
-  const [generalFilters, setGeneralFilters] = useState({
-    vehicle_model: "",
-    engine_model: "",
-    transmission_model: "",
-    steering_axle_model: "",
-    drive_axle_model: "",
-  });
-
-  const [maintFilters, setMaintFilters] = useState({
-    maintenance_type: "",
-    vin: "",
-    service_company: "",
-  });
+  // Справочники для выпадающих списков фильтров
+  useEffect(() => {
+    if (!showFilters) return;
+    let cancelled = false;
+    loadDirectories()
+      .then((lookup) => {
+        if (!cancelled) setDirectory(() => lookup);
+      })
+      .catch((e) => console.error(e));
+    return () => {
+      cancelled = true;
+    };
+  }, [showFilters]);
 
-	const [complaintsFilters, setComplaintsFilters] = useState({
-		node_failure: "",
-		recovery_method: "",
-    service_company: "",
-	})
+  const setFilter = (key, value) =>
+    setFilters((f) => ({
+      ...f,
+      [activeTab]: { ...f[activeTab], [key]: value },
+    }));
 
   const clearActiveFilters = () => {
-    if (activeTab === "general") {
-      setGeneralFilters({
-        vehicle_model: "",
-        engine_model: "",
-        transmission_model: "",
-        steering_axle_model: "",
-        drive_axle_model: "",
-      });
-    } else if (activeTab === "maintenance") {
-      setMaintFilters({ maintenance_type: "", vin: "", service_company: "" });
-    } else if (activeTab === "complaints") {
-      setComplaintsFilters({ node_failure: "", recovery_method: "", service_company: "" });
-    }
+    setFilters((f) => ({ ...f, [activeTab]: EMPTY_FILTERS[activeTab] }));
   };
 
   return (
@@ -101,9 +126,9 @@ const MainAuth = () => {
               className="min-w-0 flex-1 overflow-x-auto"
               style={{ maxWidth: showFilters ? "calc(100% - 20rem)" : "100%" }}
             >
-              <General_info activeTab={activeTab} filters={generalFilters} />
-              <Maintenance activeTab={activeTab} filters={maintFilters} />
-							<Complaints activeTab={activeTab} filters={complaintsFilters} />
+              <General_info activeTab={activeTab} filters={filters.general} />
+              <Maintenance activeTab={activeTab} filters={filters.maintenance} />
+							<Complaints activeTab={activeTab} filters={filters.complaints} />
             </div>
             {showFilters && (
               <div className="w-80 border-l border-gray-200 bg-white shadow-inner">
@@ -134,205 +159,43 @@ const MainAuth = () => {
                   </div>
                 </div>
                 <div className="space-y-3 p-4">
-                  {activeTab === "general" && (
-                    <>
-                      <div>
-                        <label className="mb-1 block text-xs text-[#3d3d3d]">
-                          Модель техники
-                        </label>
-                        <input
-                          type="text"
-                          value={generalFilters.vehicle_model}
-                          onChange={(e) =>
-                            setGeneralFilters((f) => ({
-                              ...f,
-                              vehicle_model: e.target.value,
-                            }))
-                          }
-                          className="w-full  border border-gray-300 px-2 py-1 text-sm"
-                          placeholder="например: ПД3500"
-                        />
-                      </div>
-                      <div>
-                        <label className="mb-1 block text-xs text-[#3d3d3d]">
-                          Модель двигателя
-                        </label>
-                        <input
-                          type="text"
-                          value={generalFilters.engine_model}
-                          onChange={(e) =>
-                            setGeneralFilters((f) => ({
-                              ...f,
-                              engine_model: e.target.value,
-                            }))
-                          }
-                          className="w-full  border border-gray-300 px-2 py-1 text-sm"
-                          placeholder="например: Г300"
-                        />
-                      </div>
-                      <div>
-                        <label className="mb-1 block text-xs text-[#3d3d3d]">
-                          Модель трансмиссии
-                        </label>
-                        <input
-                          type="text"
-                          value={generalFilters.transmission_model}
-                          onChange={(e) =>
-                            setGeneralFilters((f) => ({
-                              ...f,
-                              transmission_model: e.target.value,
-                            }))
-                          }
-                          className="w-full  border border-gray-300 px-2 py-1 text-sm"
-                          placeholder="например: АКПП8"
-                        />
-                      </div>
-                      <div>
-                        <label className="mb-1 block text-xs text-[#3d3d3d]">
-                          Модель управляемого моста
-                        </label>
-                        <input
-                          type="text"
-                          value={generalFilters.steering_axle_model}
-                          onChange={(e) =>
-                            setGeneralFilters((f) => ({
-                              ...f,
-                              steering_axle_model: e.target.value,
-                            }))
-                          }
-                          className="w-full  border border-gray-300 px-2 py-1 text-sm"
-                          placeholder="например: Carraro"
-                        />
-                      </div>
-                      <div>
-                        <label className="mb-1 block text-xs text-[#3d3d3d]">
-                          Модель ведущего моста
-                        </label>
-                        <input
-                          type="text"
-                          value={generalFilters.drive_axle_model}
-                          onChange={(e) =>
-                            setGeneralFilters((f) => ({
-                              ...f,
-                              drive_axle_model: e.target.value,
-                            }))
-                          }
-                          className="w-full  border border-gray-300 px-2 py-1 text-sm"
-                          placeholder="например: ZF"
-                        />
-                      </div>
-                    </>
-                  )}
                   {activeTab === "maintenance" && (
-                    <>
-                      <div>
-                        <label className="mb-1 block text-xs text-[#3d3d3d]">
-                          Вид ТО
-                        </label>
-                        <input
-                          type="text"
-                          value={maintFilters.maintenance_type}
-                          onChange={(e) =>
-                            setMaintFilters((f) => ({
-                              ...f,
-                              maintenance_type: e.target.value,
-                            }))
-                          }
-                          className="w-full  border border-gray-300 px-2 py-1 text-sm"
-                          placeholder="например: ТО-1"
-                        />
-                      </div>
-                      <div>
-                        <label className="mb-1 block text-xs text-[#3d3d3d]">
-                          Зав. номер машины
-                        </label>
-                        <input
-                          type="text"
-                          value={maintFilters.vin}
-                          onChange={(e) =>
-                            setMaintFilters((f) => ({
-                              ...f,
-                              vin: e.target.value,
-                            }))
-                          }
-                          className="w-full  border border-gray-300 px-2 py-1 text-sm"
-                          placeholder="VIN/зав. номер"
-                        />
-                      </div>
-                      <div>
-                        <label className="mb-1 block text-xs text-[#3d3d3d]">
-                          Сервисная компания
-                        </label>
-                        <input
-                          type="text"
-                          value={maintFilters.service_company}
-                          onChange={(e) =>
-                            setMaintFilters((f) => ({
-                              ...f,
-                              service_company: e.target.value,
-                            }))
-                          }
-                          className="w-full  border border-gray-300 px-2 py-1 text-sm"
-                          placeholder="например: ООО «СИЙМО ТРЕЙД»"
-                        />
-                      </div>
-                    </>
+                    <div>
+                      <label className="mb-1 block text-xs text-[#3d3d3d]">
+                        Зав. номер машины
+                      </label>
+                      <CarLookup
+                        className="border-gray-300"
+                        placeholder="VIN/зав. номер"
+                        value={filters.maintenance.car_id}
+                        onChange={(carId) => setFilter("car_id", carId)}
+                      />
+                    </div>
                   )}
-									{activeTab === "complaints" && (
-										<>
-											<div>
-                        <label className="mb-1 block text-xs text-[#3d3d3d]">
-                          Узел отказа
-                        </label>
-                        <input
-                          type="text"
-                          value={complaintsFilters.node_failure}
-                          onChange={(e) =>
-                            setComplaintsFilters((f) => ({
-                              ...f,
-                              node_failure: e.target.value,
-                            }))
-                          }
-                          className="w-full  border border-gray-300 px-2 py-1 text-sm"
-                          placeholder="например: Ходовая часть"
-                        />
-                      </div>
-                      <div>
-                        <label className="mb-1 block text-xs text-[#3d3d3d]">
-                          Способ восстановления
-                        </label>
-                        <input
-                          type="text"
-                          value={complaintsFilters.recovery_method}
-                          onChange={(e) =>
-                            setComplaintsFilters((f) => ({
-                              ...f,
-                              recovery_method: e.target.value,
-                            }))
-                          }
-                          className="w-full  border border-gray-300 px-2 py-1 text-sm"
-                          placeholder="например: Замена"
-                        />
-                      </div>
-                      <div>
-                        <label className="mb-1 block text-xs text-[#3d3d3d]">
-                          Сервисная компания
-                        </label>
-                        <input
-                          type="text"
-                          value={complaintsFilters.service_company}
-                          onChange={(e) =>
-                            setComplaintsFilters((f) => ({
-                              ...f,
-                              service_company: e.target.value,
-                            }))
-                          }
-                          className="w-full  border border-gray-300 px-2 py-1 text-sm"
-                          placeholder="например: ООО «СИЙМО ТРЕЙД»"
-                        />
-                      </div>
-										</>
-									)}
+                  {FILTER_FIELDS[activeTab].map(([key, label, name]) => (
+                    <div key={key}>
+                      <label className="mb-1 block text-xs text-[#3d3d3d]">
+                        {label}
+                      </label>
+                      <select
+                        value={filters[activeTab][key] ?? ""}
+                        onChange={(e) =>
+                          setFilter(
+                            key,
+                            e.target.value ? Number(e.target.value) : null,
+                          )
+                        }
+                        className="w-full  border border-gray-300 px-2 py-1 text-sm"
+                      >
+                        <option value="">Все</option>
+                        {directory(name).map((o) => (
+                          <option key={o.id} value={o.id}>
+                            {o.name}
+                          </option>
+                        ))}
+                      </select>
+                    </div>
+                  ))}
                 </div>
               </div>
             )}
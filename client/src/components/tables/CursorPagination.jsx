@@ -0,0 +1,67 @@
+// Пагинация для списков с курсором: общее число строк сервер не считает,
+// поэтому вместо «1-10 из N» — номер страницы и переход к соседним.
+// DataTable передаёт rowCount из paginationTotalRows: он больше строк до
+// конца текущей страницы, только если есть следующая
+const CursorPagination = ({
+  rowsPerPage,
+  rowCount,
+  currentPage,
+  onChangePage,
+  onChangeRowsPerPage,
+  paginationRowsPerPageOptions = [10, 25, 50, 100],
+}) => {
+  const hasNext = rowCount > currentPage * rowsPerPage;
+  const button =
+    "px-2 py-1 text-sm text-[#163E6C] hover:bg-gray-100 disabled:text-gray-300 disabled:hover:bg-transparent";
+
+  return (
+    <div className="flex items-center justify-end gap-4 border-t px-4 py-2 text-sm text-[#3d3d3d]">
+      <label className="flex items-center gap-2">
+        Строк на странице
+        <select
+          className="border px-1 py-0.5"
+          value={rowsPerPage}
+          onChange={(e) => onChangeRowsPerPage(Number(e.target.value), 1)}
+        >
+          {paginationRowsPerPageOptions.map((n) => (
+            <option key={n} value={n}>
+              {n}
+            </option>
+          ))}
+        </select>
+      </label>
+      <span>Страница {currentPage}</span>
+      <div className="flex gap-1">
+        <button
+          type="button"
+          className={button}
+          disabled={currentPage === 1}
+          onClick={() => onChangePage(1)}
+          title="В начало"
+        >
+          «
+        </button>
+        <button
+          type="button"
+          className={button}
+          disabled={currentPage === 1}
+          onClick={() => onChangePage(currentPage - 1)}
+          title="Предыдущая страница"
+        >
+          ‹
+        </button>
+        <button
+          type="button"
+          className={button}
+          disabled={!hasNext}
+          onClick={() => onChangePage(currentPage + 1)}
+          title="Следующая страница"
+        >
+          ›
+        </button>
+      </div>
+    </div>
+  );
+};
+
+export default CursorPagination;
@@ -1,17 +1,37 @@
 import React, { useState, useEffect, useMemo, useCallback } from "react";
 import DataTable from "react-data-table-component";
 import { apiClient } from "../../../utils/fetchWithTimeout";
-import { useApi } from "../../../hooks/useApi";
+import { useCursorPages } from "../../../hooks/useCursorPages";
 import { useAuth } from "../../../contexts/AuthContext";
-import { complaintsColumns, complaintsfilteredRows } from "./config";
+import { complaintsColumns } from "./config";
 import { customStyles } from "../customStylesForTables";
 import { saveModel } from "../../../utils/saveModel";
+import { loadDirectories } from "../../../utils/bootstrap";
 import ModelDetailsModal from "../../modals/ModelDetailsModal";
 import NoData from "../../tables/NoDataForTables";
+import CarLookup from "../../ui/CarLookup";
+import CursorPagination from "../CursorPagination";
 
 const Complaints = ({ activeTab, filters = {} }) => {
-  const [complaintsRows, setComplaintsRows] = useState([]);
-  const { loading, error, get, clearError } = useApi();
+  // Фильтры, сортировка и страницы — на сервере
+  const {
+    rows: complaintsRows,
+    setRows: setComplaintsRows,
+    loading,
+    error,
+    baseIndex,
+    page,
+    perPage,
+    totalRows,
+    onChangePage,
+    onChangeRowsPerPage,
+    onSort,
+  } = useCursorPages("http://localhost:8000/api/complaints", {
+    filters,
+    defaultSort: "-date_of_failure",
+    enabled: activeTab === "complaints",
+    topics: ["complaint", "directory"],
+  });
   const { hasRole } = useAuth();
   const canEdit = hasRole("manager") || hasRole("service");
 
@@ -25,11 +45,6 @@ const Complaints = ({ activeTab, filters = {} }) => {
     data: { id: null, name: "", description: "" },
   });
 
-  // Параметры пагинации
-  const [page, setPage] = useState(1);
-  const [perPage, setPerPage] = useState(10);
-  const baseIndex = (page - 1) * perPage;
-
   // Добавление новой записи рекламации
   const emptyNewRow = {
     car_id: null,
@@ -86,8 +101,7 @@ const Complaints = ({ activeTab, filters = {} }) => {
     },
   };
 
-  // Опции для селектов
-  const [carOpts, setCarOpts] = useState([]);
+  // Опции для селектов; машина выбирается поиском (CarLookup)
   const [failureNodeOpts, setFailureNodeOpts] = useState([]);
   const [recoveryMethodOpts, setRecoveryMethodOpts] = useState([]);
   const [serviceCompanyOpts, setServiceCompanyOpts] = useState([]);
@@ -98,35 +112,11 @@ const Complaints = ({ activeTab, filters = {} }) => {
     let cancelled = false;
     const loadLists = async () => {
       try {
-        const [cars, failureNodes, recoveryMethods, serviceCompanies] =
-          await Promise.all([
-            apiClient.get("http://localhost:8000/api/cars", 10000),
-            apiClient.get(
-              "http://localhost:8000/api/models/failure-node",
-              10000,
-            ),
-            apiClient.get(
-              "http://localhost:8000/api/models/recovery-method",
-              10000,
-            ),
-            apiClient.get(
-              "http://localhost:8000/api/models/service-company",
-              10000,
-            ),
-          ]);
+        const directory = await loadDirectories();
         if (!cancelled) {
-          setCarOpts(
-            Array.isArray(cars)
-              ? cars.map((c) => ({ id: c.id, name: c.vin }))
-              : [],
-          );
-          setFailureNodeOpts(Array.isArray(failureNodes) ? failureNodes : []);
-          setRecoveryMethodOpts(
-            Array.isArray(recoveryMethods) ? recoveryMethods : [],
-          );
-          setServiceCompanyOpts(
-            Array.isArray(serviceCompanies) ? serviceCompanies : [],
-          );
+          setFailureNodeOpts(directory("failure-node"));
+          setRecoveryMethodOpts(directory("recovery-method"));
+          setServiceCompanyOpts(directory("service-company"));
         }
       } catch (e) {
         console.error(e);
@@ -189,43 +179,10 @@ const Complaints = ({ activeTab, filters = {} }) => {
   );
   const currentCfg = modal.type ? MODAL_CFG[modal.type] : null;
 
-  // Кэшируем столбцы и отфильтрованные строки
+  // Кэшируем столбцы
   const columns = useMemo(() => {
     return complaintsColumns({ baseIndex, openModel });
   }, [baseIndex, openModel]);
-  const filteredRows = useMemo(() => {
-    const filtered = complaintsfilteredRows(complaintsRows, filters);
-    return filtered;
-  }, [complaintsRows, filters]);
-
-  // Загрузка данных при монтировании вкладки
-  useEffect(() => {
-    let cancelled = false;
-    if (activeTab !== "complaints") return;
-    const load = async () => {
-      try {
-        const res = await get("http://localhost:8000/api/complaints", 10000);
-        if (!cancelled) {
-          if (res.success) {
-            const data = res.data;
-            setComplaintsRows(Array.isArray(data) ? data : []);
-          } else {
-            console.log("No maintenance data or failed response");
-            setComplaintsRows([]);
-          }
-        }
-      } catch (e) {
-        console.log(e);
-        if (!cancelled) setComplaintsRows([]);
-      }
-    };
-    load();
-    return () => {
-      cancelled = true;
-      clearError();
-    };
-    // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [activeTab]);
 
   return (
     <div>
@@ -238,7 +195,7 @@ const Complaints = ({ activeTab, filters = {} }) => {
           )}
           <DataTable
             columns={columns}
-            data={filteredRows}
+            data={complaintsRows}
             persistTableHead
             subHeader={canEdit}
             subHeaderComponent={
@@ -257,25 +214,14 @@ const Complaints = ({ activeTab, filters = {} }) => {
                       <label className="mb-1 self-start text-xs text-[#3d3d3d]">
                         Машина
                       </label>
-                      <select
-                        className={`h-[30px] border px-2 py-1 text-sm ${!newRow.car_id ? "border-red-500" : ""}`}
-                        value={newRow.car_id ?? ""}
-                        onChange={(e) =>
-                          setNewRow((r) => ({
-                            ...r,
-                            car_id: e.target.value
-                              ? Number(e.target.value)
-                              : null,
-                          }))
+                      <CarLookup
+                        className={!newRow.car_id ? "border-red-500" : ""}
+                        placeholder="VIN машины (обязательно)"
+                        value={newRow.car_id}
+                        onChange={(carId) =>
+                          setNewRow((r) => ({ ...r, car_id: carId }))
                         }
-                      >
-                        <option value="">Машина (обязательно)</option>
-                        {carOpts.map((o) => (
-                          <option key={o.id} value={o.id}>
-                            {o.name}
-                          </option>
-                        ))}
-                      </select>
+                      />
                     </div>
                     <div className="flex flex-col">
                       <label className="mb-1 self-start text-xs text-[#3d3d3d]">
@@ -498,26 +444,23 @@ const Complaints = ({ activeTab, filters = {} }) => {
             noDataComponent={null}
             customStyles={customStyles("2200px")}
             pagination
+            paginationServer
+            paginationComponent={CursorPagination}
+            paginationTotalRows={totalRows}
+            paginationDefaultPage={page}
             paginationPerPage={perPage}
-            onChangePage={(p) => setPage(p)}
-            onChangeRowsPerPage={(newPerPage, p) => {
-              setPerPage(newPerPage);
-              setPage(p);
-            }}
+            onChangePage={onChangePage}
+            onChangeRowsPerPage={onChangeRowsPerPage}
             paginationRowsPerPageOptions={[10, 25, 50, 100]}
-            paginationComponentOptions={{
-              rowsPerPageText: "Строк на странице",
-              rangeSeparatorText: "из",
-              selectAllRowsItem: true,
-              selectAllRowsItemText: "Все",
-            }}
+            sortServer
+            onSort={onSort}
             highlightOnHover
             striped
             responsive
             defaultSortFieldId="date_of_failure"
             defaultSortAsc={false}
           />
-          {(loading || filteredRows.length === 0) && (
+          {(loading || complaintsRows.length === 0) && (
             <NoData loading={loading} />
           )}
           {/* Универсальное модальное окно */}
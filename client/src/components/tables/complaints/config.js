@@ -27,6 +27,7 @@ const styleClickableRows =
 	"w-full inline-flex justify-center text-[#163E6C] underline decoration-dotted hover:text-[#1c4f8a]";
 
 
+// Список сортирует сервер: sortable только у колонок с sortField
 export const complaintsColumns = (opts = {}) => [
 	{
 		name: "#",
@@ -40,7 +41,7 @@ export const complaintsColumns = (opts = {}) => [
 	{
 		name: imgHeader(number_logo, "VIN"),
 		selector: (r) => r.vin,
-		sortable: true,
+		sortable: false,
 		grow: 2,
 		wrap: true,
 		center: "true",
@@ -48,7 +49,7 @@ export const complaintsColumns = (opts = {}) => [
 	{
 		name: imgHeader(model_logo, header("Модель", "техники")),
 		selector: (r) => r.vehicle_model,
-		sortable: true,
+		sortable: false,
 		center: "true",
 		grow: 2,
 		wrap: true,
@@ -58,6 +59,7 @@ export const complaintsColumns = (opts = {}) => [
 		selector: (r) => r.date_of_failure,
 		id: "date_of_failure",
 		sortable: true,
+		sortField: "date_of_failure",
 		grow: 2,
 		wrap: true,
 		center: "true",
@@ -65,7 +67,7 @@ export const complaintsColumns = (opts = {}) => [
 	{
 		name: imgHeader(operating_time_logo, header("Наработка", "м/час")),
 		selector: (r) => r.operating_time,
-		sortable: true,
+		sortable: false,
 		center: "true",
 		id: "operating_time",
 		grow: 2,
@@ -75,7 +77,7 @@ export const complaintsColumns = (opts = {}) => [
 		name: imgHeader(node_failure_logo, header("Узел", "отказа")),
 		selector: (r) => r.node_failure_id,
 		center: "true",
-		sortable: true,
+		sortable: false,
 		grow: 2,
 		wrap: true,
 		cell: (r) =>
@@ -103,7 +105,7 @@ export const complaintsColumns = (opts = {}) => [
 	{
 		name: imgHeader(description_failure_logo, header("Описание", "отказа")),
 		selector: (r) => r.description_failure,
-		sortable: true,
+		sortable: false,
 		center: "true",
 		grow: 2,
 		wrap: true,
@@ -111,7 +113,7 @@ export const complaintsColumns = (opts = {}) => [
 	{
 		name: imgHeader(recovery_method_logo, header("Способ", "восстановления")),
 		selector: (r) => r.recovery_method_id,
-		sortable: true,
+		sortable: false,
 		grow: 2,
 		wrap: true,
 		center: "true",
@@ -140,7 +142,7 @@ export const complaintsColumns = (opts = {}) => [
 	{
 		name: imgHeader(spare_parts_logo, header("Используемые", "запасные части")),
 		selector: (r) => r.used_spare_parts,
-		sortable: true,
+		sortable: false,
 		center: "true",
 		grow: 2,
 		wrap: true,
@@ -148,7 +150,7 @@ export const complaintsColumns = (opts = {}) => [
 	{
 		name: imgHeader(date_logo, header("Дата", "восстановления")),
 		selector: (r) => r.date_recovery,
-		sortable: true,
+		sortable: false,
 		center: "true",
 		grow: 2,
 		wrap: true,
@@ -156,7 +158,7 @@ export const complaintsColumns = (opts = {}) => [
 	{
 		name: imgHeader(equipment_downtime_logo, header("Время", "простоя техники")),
 		selector: (r) => r.equipment_downtime,
-		sortable: true,
+		sortable: false,
 		center: "true",
 		grow: 2,
 		wrap: true,
@@ -164,27 +166,9 @@ export const complaintsColumns = (opts = {}) => [
 	{
 		name: imgHeader(service_logo, header("Сервисная", "компания")),
 		selector: (r) => r.service_company,
-		sortable: true,
+		sortable: false,
 		center: "true",
 		grow: 2,
 		wrap: true,
 	},
 ];
-
-export const complaintsfilteredRows = (rows, filters) => {
-	const f = {
-		node_failure: (filters?.node_failure || "").trim().toLowerCase(),
-		recovery_method: (filters?.recovery_method || "").trim().toLowerCase(),
-		service_company: (filters?.service_company || "").trim().toLowerCase(),
-	};
-	return rows.filter((r) => {
-		const nf = String(r.node_failure || "").toLowerCase();
-		const rm = String(r.recovery_method || "").toLowerCase();
-		const sc = String(r.service_company || "").toLowerCase();
-		return (
-			(!f.node_failure || nf.includes(f.node_failure)) &&
-			(!f.recovery_method || rm.includes(f.recovery_method)) &&
-			(!f.service_company || sc.includes(f.service_company))
-		);
-	});
-};
@@ -1,17 +1,36 @@
 import React, { useState, useEffect, useMemo, useCallback } from "react";
 import DataTable from "react-data-table-component";
 import { apiClient } from "../../../utils/fetchWithTimeout";
-import { useApi } from "../../../hooks/useApi";
+import { useCursorPages } from "../../../hooks/useCursorPages";
 import { useAuth } from "../../../contexts/AuthContext";
-import { generalColumns, generalFilterRows } from "./config";
+import { generalColumns } from "./config";
 import { customStyles } from "../customStylesForTables";
 import { saveModel } from "../../../utils/saveModel";
+import { loadDirectories } from "../../../utils/bootstrap";
 import ModelDetailsModal from "../../modals/ModelDetailsModal";
 import NoData from "../../tables/NoDataForTables";
+import CursorPagination from "../CursorPagination";
 
 const General_info = ({ activeTab, filters = {} }) => {
-  const [rows, setRows] = useState([]);
-  const { loading, error, get, clearError } = useApi();
+  // Фильтры, сортировка и страницы — на сервере
+  const {
+    rows,
+    setRows,
+    loading,
+    error,
+    baseIndex,
+    page,
+    perPage,
+    totalRows,
+    onChangePage,
+    onChangeRowsPerPage,
+    onSort,
+  } = useCursorPages("http://localhost:8000/api/cars", {
+    filters,
+    defaultSort: "-shipment_date",
+    enabled: activeTab === "general",
+    topics: ["car", "directory"],
+  });
   const { hasRole } = useAuth();
   const canEdit = hasRole("manager");
 
@@ -25,11 +44,6 @@ const General_info = ({ activeTab, filters = {} }) => {
     data: { id: null, name: "", description: "" },
   });
 
-  // Параметры пагинации
-  const [page, setPage] = useState(1);
-  const [perPage, setPerPage] = useState(10);
-  const baseIndex = (page - 1) * perPage;
-
   // Добавление новой записи "машина"
   const emptyNewRow = {
     vin: "",
@@ -127,29 +141,15 @@ const General_info = ({ activeTab, filters = {} }) => {
     let cancelled = false;
     const loadLists = async () => {
       try {
-        const [veh, eng, trn, drv, str, clients, servs] = await Promise.all([
-          apiClient.get("http://localhost:8000/api/models/vehicle", 10000),
-          apiClient.get("http://localhost:8000/api/models/engine", 10000),
-          apiClient.get("http://localhost:8000/api/models/transmission", 10000),
-          apiClient.get("http://localhost:8000/api/models/drive-axle", 10000),
-          apiClient.get(
-            "http://localhost:8000/api/models/steering-axle",
-            10000,
-          ),
-          apiClient.get("http://localhost:8000/api/models/clients", 10000),
-          apiClient.get(
-            "http://localhost:8000/api/models/service-company",
-            10000,
-          ),
-        ]);
+        const directory = await loadDirectories();
         if (!cancelled) {
-          setVehicleOpts(Array.isArray(veh) ? veh : []);
-          setEngineOpts(Array.isArray(eng) ? eng : []);
-          setTransmissionOpts(Array.isArray(trn) ? trn : []);
-          setDriveAxleOpts(Array.isArray(drv) ? drv : []);
-          setSteeringAxleOpts(Array.isArray(str) ? str : []);
-          setClientOpts(Array.isArray(clients) ? clients : []);
-          setServiceCompanyOpts(Array.isArray(servs) ? servs : []);
+          setVehicleOpts(directory("vehicle"));
+          setEngineOpts(directory("engine"));
+          setTransmissionOpts(directory("transmission"));
+          setDriveAxleOpts(directory("drive-axle"));
+          setSteeringAxleOpts(directory("steering-axle"));
+          setClientOpts(directory("clients"));
+          setServiceCompanyOpts(directory("service-company"));
         }
       } catch (e) {
         console.error(e);
@@ -200,7 +200,7 @@ const General_info = ({ activeTab, filters = {} }) => {
   );
   const currentCfg = modal.type ? MODAL_CFG[modal.type] : null;
 
-  // Кэшируем столбцы и отфильтрованные строки
+  // Кэшируем столбцы
   const columns = useMemo(
     () =>
       generalColumns({
@@ -210,39 +210,6 @@ const General_info = ({ activeTab, filters = {} }) => {
     [baseIndex, openModel],
   );
 
-  const filteredRows = useMemo(
-    () => generalFilterRows(rows, filters),
-    [rows, filters],
-  );
-
-  // Загрузка данных при монтировании вкладки
-  useEffect(() => {
-    let cancelled = false;
-    if (activeTab !== "general") return;
-    const load = async () => {
-      try {
-        const res = await get("http://localhost:8000/api/cars", 10000);
-        if (!cancelled) {
-          if (res.success) {
-            const data = res.data;
-            setRows(Array.isArray(data) ? data : []);
-          } else {
-            setRows([]);
-          }
-        }
-      } catch (e) {
-        console.log(e);
-        if (!cancelled) setRows([]);
-      }
-    };
-    load();
-    return () => {
-      cancelled = true;
-      clearError();
-    };
-    // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [activeTab]);
-
   return (
     <div>
       {activeTab === "general" && (
@@ -255,7 +222,7 @@ const General_info = ({ activeTab, filters = {} }) => {
           <div className="relative">
             <DataTable
               columns={columns}
-              data={filteredRows}
+              data={rows}
               persistTableHead
               subHeader={canEdit}
               subHeaderComponent={
@@ -663,26 +630,23 @@ const General_info = ({ activeTab, filters = {} }) => {
               noDataComponent={null}
               customStyles={customStyles("2600px")}
               pagination
+              paginationServer
+              paginationComponent={CursorPagination}
+              paginationTotalRows={totalRows}
+              paginationDefaultPage={page}
               paginationPerPage={perPage}
-              onChangePage={(p) => setPage(p)}
-              onChangeRowsPerPage={(newPerPage, p) => {
-                setPerPage(newPerPage);
-                setPage(p);
-              }}
+              onChangePage={onChangePage}
+              onChangeRowsPerPage={onChangeRowsPerPage}
               paginationRowsPerPageOptions={[10, 25, 50, 100]}
-              paginationComponentOptions={{
-                rowsPerPageText: "Строк на странице",
-                rangeSeparatorText: "из",
-                selectAllRowsItem: true,
-                selectAllRowsItemText: "Все",
-              }}
+              sortServer
+              onSort={onSort}
               highlightOnHover
               striped
               responsive
               defaultSortFieldId="shipment_date"
               defaultSortAsc={false}
             />
-            {(loading || filteredRows.length === 0) && (
+            {(loading || rows.length === 0) && (
               <NoData loading={loading} />
             )}
 
@@ -27,6 +27,7 @@ const styleClickableRows =
 
 
 
+// Список сортирует сервер: sortable только у колонок с sortField
 export const generalColumns = (opts = {}) => [
 	{
 		name: header("#"),
@@ -40,7 +41,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(number_logo, "VIN"),
 		selector: (r) => r.vin,
-		sortable: true,
+		sortable: false,
 		grow: 3,
 		wrap: true,
 		center: "true",
@@ -48,7 +49,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(model_logo, header("Модель", "техники")),
 		selector: (r) => r.vehicle_model,
-		sortable: true,
+		sortable: false,
 		grow: 2,
 		wrap: true,
 		center: "true",
@@ -73,7 +74,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(engine_logo, header("Модель", "двигателя")),
 		selector: (r) => r.engine_model,
-		sortable: true,
+		sortable: false,
 		grow: 2,
 		wrap: true,
 		ignoreRowClick: true,
@@ -99,7 +100,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(number_logo, header("Заводской №", "двигателя")),
 		selector: (r) => r.engine_number,
-		sortable: true,
+		sortable: false,
 		grow: 2,
 		wrap: true,
 		center: "true",
@@ -107,7 +108,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(transmission_logo, header("Модель", "трансмиссии")),
 		selector: (r) => r.transmission_model,
-		sortable: true,
+		sortable: false,
 		grow: 2,
 		wrap: true,
 		ignoreRowClick: true,
@@ -137,7 +138,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(number_logo, header("Заводской №", "трансмиссии")),
 		selector: (r) => r.transmission_number,
-		sortable: true,
+		sortable: false,
 		grow: 2,
 		wrap: true,
 		center: "true",
@@ -145,7 +146,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(transmission_logo, header("Ведущий", "мост")),
 		selector: (r) => r.drive_axle_model,
-		sortable: true,
+		sortable: false,
 		grow: 2,
 		wrap: true,
 		ignoreRowClick: true,
@@ -175,7 +176,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(number_logo, header("Заводской №", "ведущего моста")),
 		selector: (r) => r.drive_axle_number,
-		sortable: true,
+		sortable: false,
 		grow: 2,
 		wrap: true,
 		center: "true",
@@ -183,7 +184,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(transmission_logo, header("Управляемый", "мост")),
 		selector: (r) => r.steering_axle_model,
-		sortable: true,
+		sortable: false,
 		grow: 2.2,
 		wrap: true,
 		ignoreRowClick: true,
@@ -213,7 +214,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(number_logo, header("Заводской №", "управляемого моста")),
 		selector: (r) => r.steering_axle_number,
-		sortable: true,
+		sortable: false,
 		grow: 2.2,
 		wrap: true,
 		center: "true",
@@ -221,7 +222,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(contract_logo, header("Договор", "поставки")),
 		selector: (r) => r.delivery_agreement,
-		sortable: true,
+		sortable: false,
 		grow: 2,
 		wrap: true,
 		center: "true",
@@ -230,6 +231,7 @@ export const generalColumns = (opts = {}) => [
 		name: imgHeader(date_logo, header("Дата", "отгрузки")),
 		selector: (r) => r.shipment_date,
 		sortable: true,
+		sortField: "shipment_date",
 		id: "shipment_date",
 		grow: 2,
 		wrap: true,
@@ -238,7 +240,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(recipient_logo, header("Грузо", "получатель")),
 		selector: (r) => r.recipient,
-		sortable: true,
+		sortable: false,
 		grow: 2,
 		wrap: true,
 		center: "true",
@@ -246,7 +248,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(location_logo, header("Адрес", "поставки")),
 		selector: (r) => r.delivery_address,
-		sortable: true,
+		sortable: false,
 		grow: 2,
 		wrap: true,
 		center: "true",
@@ -254,7 +256,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(complete_logo, header("Комплектация")),
 		selector: (r) => r.equipment,
-		sortable: true,
+		sortable: false,
 		grow: 2.5,
 		wrap: true,
 		center: "true",
@@ -262,7 +264,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(client_logo, header("Клиент")),
 		selector: (r) => r.client,
-		sortable: true,
+		sortable: false,
 		grow: 2.5,
 		wrap: true,
 		center: "true",
@@ -270,7 +272,7 @@ export const generalColumns = (opts = {}) => [
 	{
 		name: imgHeader(service_logo, header("Сервисная", "компания")),
 		selector: (r) => r.service_company,
-		sortable: true,
+		sortable: false,
 		grow: 2.5,
 		wrap: true,
 		center: "true",
@@ -298,33 +300,3 @@ export const generalColumns = (opts = {}) => [
 			),
 	},
 ];
-
-export const generalFilterRows = (rows, filters) => {
-	const f = {
-		vehicle_model: (filters?.vehicle_model || "").trim().toLowerCase(),
-		engine_model: (filters?.engine_model || "").trim().toLowerCase(),
-		transmission_model: (filters?.transmission_model || "")
-			.trim()
-			.toLowerCase(),
-		steering_axle_model: (filters?.steering_axle_model || "")
-			.trim()
-			.toLowerCase(),
-		drive_axle_model: (filters?.drive_axle_model || "").trim().toLowerCase(),
-	};
-
-	return rows.filter((r) => {
-		const vm = String(r.vehicle_model || "").toLowerCase();
-		const em = String(r.engine_model || "").toLowerCase();
-		const tm = String(r.transmission_model || "").toLowerCase();
-		const sa = String(r.steering_axle_model || "").toLowerCase();
-		const da = String(r.drive_axle_model || "").toLowerCase();
-
-		return (
-			(!f.vehicle_model || vm.includes(f.vehicle_model)) &&
-			(!f.engine_model || em.includes(f.engine_model)) &&
-			(!f.transmission_model || tm.includes(f.transmission_model)) &&
-			(!f.steering_axle_model || sa.includes(f.steering_axle_model)) &&
-			(!f.drive_axle_model || da.includes(f.drive_axle_model))
-		);
-	});
-};
@@ -1,17 +1,37 @@
 import React, { useState, useEffect, useMemo, useCallback } from "react";
 import DataTable from "react-data-table-component";
 import { apiClient } from "../../../utils/fetchWithTimeout";
-import { useApi } from "../../../hooks/useApi";
+import { useCursorPages } from "../../../hooks/useCursorPages";
 import { useAuth } from "../../../contexts/AuthContext";
-import { maintColumns, maintenancefilteredRows } from "./config";
+import { maintColumns } from "./config";
 import { customStyles } from "../customStylesForTables";
 import { saveModel } from "../../../utils/saveModel";
+import { loadDirectories } from "../../../utils/bootstrap";
 import ModelDetailsModal from "../../modals/ModelDetailsModal";
 import NoData from "../../tables/NoDataForTables";
+import CarLookup from "../../ui/CarLookup";
+import CursorPagination from "../CursorPagination";
 
 const Maintenance = ({ activeTab, filters = {} }) => {
-  const [maintRows, setMaintRows] = useState([]);
-  const { loading, error, get, clearError } = useApi();
+  // Фильтры, сортировка и страницы — на сервере
+  const {
+    rows: maintRows,
+    setRows: setMaintRows,
+    loading,
+    error,
+    baseIndex,
+    page,
+    perPage,
+    totalRows,
+    onChangePage,
+    onChangeRowsPerPage,
+    onSort,
+  } = useCursorPages("http://localhost:8000/api/maintenance", {
+    filters,
+    defaultSort: "-maintenance_date",
+    enabled: activeTab === "maintenance",
+    topics: ["maintenance", "directory"],
+  });
   const { hasRole } = useAuth();
   const canEdit = hasRole("manager") || hasRole("service") || hasRole("client");
 
@@ -25,11 +45,6 @@ const Maintenance = ({ activeTab, filters = {} }) => {
     data: { id: null, name: "", description: "" },
   });
 
-  // Параметры пагинации
-  const [page, setPage] = useState(1);
-  const [perPage, setPerPage] = useState(10);
-  const baseIndex = (page - 1) * perPage;
-
   // Добавление новой записи ТО
   const emptyNewRow = {
     car_id: null,
@@ -68,8 +83,7 @@ const Maintenance = ({ activeTab, filters = {} }) => {
 		service_company: { idKey: "service_company_id", labelKey: "service_company" },
   };
 
-  // Опции для селектов
-  const [carOpts, setCarOpts] = useState([]);
+  // Опции для селектов; машина выбирается поиском (CarLookup)
   const [maintenanceTypeOpts, setMaintenanceTypeOpts] = useState([]);
   const [serviceCompanyOpts, setServiceCompanyOpts] = useState([]);
 
@@ -79,29 +93,10 @@ const Maintenance = ({ activeTab, filters = {} }) => {
     let cancelled = false;
     const loadLists = async () => {
       try {
-        const [cars, maintenanceTypes, serviceCompanies] = await Promise.all([
-          apiClient.get("http://localhost:8000/api/cars", 10000),
-          apiClient.get(
-            "http://localhost:8000/api/models/maintenance-types",
-            10000,
-          ),
-          apiClient.get(
-            "http://localhost:8000/api/models/service-company",
-            10000,
-          ),
-        ]);
+        const directory = await loadDirectories();
         if (!cancelled) {
-          setCarOpts(
-            Array.isArray(cars)
-              ? cars.map((c) => ({ id: c.id, name: c.vin }))
-              : [],
-          );
-          setMaintenanceTypeOpts(
-            Array.isArray(maintenanceTypes) ? maintenanceTypes : [],
-          );
-          setServiceCompanyOpts(
-            Array.isArray(serviceCompanies) ? serviceCompanies : [],
-          );
+          setMaintenanceTypeOpts(directory("maintenance-types"));
+          setServiceCompanyOpts(directory("service-company"));
         }
       } catch (e) {
         console.error(e);
@@ -159,50 +154,13 @@ const Maintenance = ({ activeTab, filters = {} }) => {
   );
   const currentCfg = modal.type ? MODAL_CFG[modal.type] : null;
 
-  // Кэшируем столбцы и отфильтрованные строки
+  // Кэшируем столбцы
   const columns = useMemo(
     () => {
       return maintColumns({ baseIndex, openModel });
     },
     [baseIndex, openModel],
   );
-  const filteredRows = useMemo(
-    () => {
-      const filtered = maintenancefilteredRows(maintRows, filters);
-      return filtered;
-    },
-    [maintRows, filters],
-  );
-
-  // Загрузка данных при монтировании вкладки
-  useEffect(() => {
-    let cancelled = false;
-    if (activeTab !== "maintenance") return;
-    const load = async () => {
-      try {
-        const res = await get("http://localhost:8000/api/maintenance", 10000);
-        if (!cancelled) {
-          if (res.success) {
-            const data = res.data;
-            setMaintRows(Array.isArray(data) ? data : []);
-          } else {
-            console.log("No maintenance data or failed response");
-            setMaintRows([]);
-          }
-        }
-      } catch (e) {
-        console.log(e);
-        if (!cancelled) setMaintRows([]);
-      }
-    };
-    load();
-    return () => {
-      cancelled = true;
-      clearError();
-    };
-    // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [activeTab]);
-
   return (
     <div>
       {activeTab === "maintenance" && (
@@ -214,7 +172,7 @@ const Maintenance = ({ activeTab, filters = {} }) => {
           )}
           <DataTable
             columns={columns}
-            data={filteredRows}
+            data={maintRows}
             persistTableHead
             subHeader={canEdit}
             subHeaderComponent={
@@ -231,23 +189,13 @@ const Maintenance = ({ activeTab, filters = {} }) => {
                   <>
                     <div className="flex flex-col">
                       <label className="text-xs text-[#3d3d3d] mb-1 self-start">Машина (обязательно)</label>
-                      <select
-                        className={`h-[30px] border px-2 py-1 text-sm ${!newRow.car_id ? "border-red-500" : ""}`}
-                        value={newRow.car_id ?? ""}
-                        onChange={(e) =>
-                          setNewRow((r) => ({
-                            ...r,
-                            car_id: e.target.value ? Number(e.target.value) : null,
-                          }))
+                      <CarLookup
+                        className={!newRow.car_id ? "border-red-500" : ""}
+                        value={newRow.car_id}
+                        onChange={(carId) =>
+                          setNewRow((r) => ({ ...r, car_id: carId }))
                         }
-                      >
-                        <option value="">Выберите машину</option>
-                        {carOpts.map((o) => (
-                          <option key={o.id} value={o.id}>
-                            {o.name}
-                          </option>
-                        ))}
-                      </select>
+                      />
                     </div>
                     <div className="flex flex-col">
                       <label className="text-xs text-[#3d3d3d] mb-1 self-start">Тип ТО (обязательно)</label>
@@ -380,26 +328,23 @@ const Maintenance = ({ activeTab, filters = {} }) => {
 						noDataComponent={null}
             customStyles={customStyles()}
             pagination
+            paginationServer
+            paginationComponent={CursorPagination}
+            paginationTotalRows={totalRows}
+            paginationDefaultPage={page}
             paginationPerPage={perPage}
-            onChangePage={(p) => setPage(p)}
-            onChangeRowsPerPage={(newPerPage, p) => {
-              setPerPage(newPerPage);
-              setPage(p);
-            }}
+            onChangePage={onChangePage}
+            onChangeRowsPerPage={onChangeRowsPerPage}
             paginationRowsPerPageOptions={[10, 25, 50, 100]}
-            paginationComponentOptions={{
-              rowsPerPageText: "Строк на странице",
-              rangeSeparatorText: "из",
-              selectAllRowsItem: true,
-              selectAllRowsItemText: "Все",
-            }}
+            sortServer
+            onSort={onSort}
             highlightOnHover
             striped
             responsive
             defaultSortFieldId="maintenance_date"
             defaultSortAsc={false}
           />
-					{(loading || filteredRows.length === 0) && (
+					{(loading || maintRows.length === 0) && (
               <NoData loading={loading} />
             )}
           {/* Универсальное модальное окно */}
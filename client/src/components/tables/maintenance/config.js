@@ -19,6 +19,7 @@ const header = (namefirst, namelast) =>
 const styleClickableRows =
 	"w-full inline-flex justify-center text-[#163E6C] underline decoration-dotted hover:text-[#1c4f8a]";
 
+// Список сортирует сервер: sortable только у колонок с sortField
 export const maintColumns = (opts = {}) => [
 	{
 		name: "#",
@@ -32,7 +33,7 @@ export const maintColumns = (opts = {}) => [
 	{
 		name: imgHeader(number_logo, "VIN"),
 		selector: (r) => r.vin,
-		sortable: true,
+		sortable: false,
 		grow: 1,
 		wrap: true,
 		center: "true",
@@ -40,7 +41,7 @@ export const maintColumns = (opts = {}) => [
 	{
 		name: imgHeader(type_service_logo, "Вид ТО"),
 		selector: (r) => r.maintenance_type,
-		sortable: true,
+		sortable: false,
 		grow: 1,
 		wrap: true,
 		center: "true",
@@ -70,6 +71,7 @@ export const maintColumns = (opts = {}) => [
 		name: imgHeader(date_logo, "Дата ТО"),
 		selector: (r) => r.maintenance_date,
 		sortable: true,
+		sortField: "maintenance_date",
 		center: "true",
 		id: "maintenance_date",
 		grow: 1,
@@ -79,7 +81,7 @@ export const maintColumns = (opts = {}) => [
 		name: imgHeader(contract_logo, "Заказ-наряд №"),
 		selector: (r) => r.order_number,
 		center: "true",
-		sortable: true,
+		sortable: false,
 		grow: 1,
 		wrap: true,
 	},
@@ -87,6 +89,7 @@ export const maintColumns = (opts = {}) => [
 		name: imgHeader(date_logo, header("Дата", "заказ-наряда")),
 		selector: (r) => r.order_date,
 		sortable: true,
+		sortField: "order_date",
 		center: "true",
 		grow: 1,
 		wrap: true,
@@ -94,7 +97,7 @@ export const maintColumns = (opts = {}) => [
 	{
 		name: imgHeader(service_logo, header("Сервисная", "компания")),
 		selector: (r) => r.service_company,
-		sortable: true,
+		sortable: false,
 		grow: 1,
 		wrap: true,
 		center: "true",
@@ -121,21 +124,3 @@ export const maintColumns = (opts = {}) => [
 			),
 	},
 ];
-
-export const maintenancefilteredRows = (rows, filters) => {
-	const f = {
-		maintenance_type: (filters?.maintenance_type || "").trim().toLowerCase(),
-		vin: (filters?.vin || "").trim().toLowerCase(),
-		service_company: (filters?.service_company || "").trim().toLowerCase(),
-	};
-	return rows.filter((r) => {
-		const mt = String(r.maintenance_type || "").toLowerCase();
-		const vn = String(r.vin || "").toLowerCase();
-		const sc = String(r.service_company || "").toLowerCase();
-		return (
-			(!f.maintenance_type || mt.includes(f.maintenance_type)) &&
-			(!f.vin || vn.includes(f.vin)) &&
-			(!f.service_company || sc.includes(f.service_company))
-		);
-	});
-};
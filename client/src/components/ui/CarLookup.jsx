@@ -0,0 +1,85 @@
+import { useState, useEffect } from "react";
+import { apiClient } from "../../utils/fetchWithTimeout";
+
+const SEARCH_URL = "http://localhost:8000/api/search";
+// Пауза после ввода перед запросом, мс
+const SEARCH_DELAY = 300;
+
+// Выбор машины по началу VIN или заводского номера агрегата. Машин может
+// быть сотни тысяч, поэтому вместо полного списка — поиск /api/search
+// (только машины, доступные пользователю)
+const CarLookup = ({ value, onChange, placeholder = "Начните вводить VIN", className = "" }) => {
+  const [text, setText] = useState("");
+  const [hits, setHits] = useState([]);
+  const [open, setOpen] = useState(false);
+
+  // Сброс выбора снаружи (например, «Очистить» фильтры) очищает поле
+  useEffect(() => {
+    if (value == null) setText("");
+  }, [value]);
+
+  useEffect(() => {
+    const q = text.trim();
+    if (!open || q.length < 2) {
+      setHits([]);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const params = new URLSearchParams({ q, kind: "car", limit: "20" });
+        const data = await apiClient.get(`${SEARCH_URL}?${params}`, 10000);
+        if (!cancelled) setHits(Array.isArray(data) ? data : []);
+      } catch (e) {
+        console.error(e);
+        if (!cancelled) setHits([]);
+      }
+    }, SEARCH_DELAY);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [text, open]);
+
+  return (
+    <div className="relative">
+      <input
+        className={`w-full border px-2 py-1 text-sm ${className}`}
+        placeholder={placeholder}
+        value={text}
+        onChange={(e) => {
+          setText(e.target.value);
+          setOpen(true);
+          if (value != null) onChange(null);
+        }}
+        onFocus={() => setOpen(true)}
+        onBlur={() => setTimeout(() => setOpen(false), 150)}
+      />
+      {open && hits.length > 0 && (
+        <ul className="absolute z-30 mt-1 max-h-60 w-full min-w-[16rem] overflow-y-auto border bg-white text-left text-sm shadow-md">
+          {hits.map((hit) => (
+            <li key={hit.id}>
+              <button
+                type="button"
+                className="w-full px-2 py-1 text-left hover:bg-gray-100"
+                onMouseDown={(e) => e.preventDefault()}
+                onClick={() => {
+                  setText(hit.vin);
+                  setOpen(false);
+                  onChange(hit.car_id);
+                }}
+              >
+                <span className="font-semibold">{hit.vin}</span>
+                {hit.snippet && hit.snippet !== hit.vin && (
+                  <span className="block text-xs text-[#3d3d3d]">{hit.snippet}</span>
+                )}
+              </button>
+            </li>
+          ))}
+        </ul>
+      )}
+    </div>
+  );
+};
+
+export default CarLookup;
@@ -0,0 +1,104 @@
+import { useState, useEffect, useCallback, useRef } from 'react';
+import { fetchPage } from '../utils/fetchWithTimeout';
+import { subscribeChanges } from '../utils/events';
+
+// Серверная пагинация списка по курсору для DataTable (paginationServer).
+// Фильтры и сортировка уходят на сервер; курсор страницы N берётся из
+// X-Next-Cursor страницы N - 1, поэтому листать можно только на соседнюю
+// страницу или в начало. Смена фильтров, сортировки или размера страницы
+// возвращает на первую страницу
+export const useCursorPages = (url, { filters = {}, defaultSort, enabled = true, topics = [] }) => {
+  const [rows, setRows] = useState([]);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState(null);
+  const [page, setPage] = useState(1);
+  const [perPage, setPerPage] = useState(10);
+  const [sort, setSort] = useState(defaultSort);
+  const [hasNext, setHasNext] = useState(false);
+
+  // cursors.current[i] — курсор страницы i + 1; у первой страницы его нет
+  const cursors = useRef([null]);
+  // Номер последнего запроса: ответ устаревшего запроса не показывается
+  const requestSeq = useRef(0);
+
+  const filtersKey = JSON.stringify(filters);
+
+  useEffect(() => {
+    cursors.current = [null];
+    setPage(1);
+  }, [filtersKey, sort, perPage]);
+
+  const load = useCallback(async () => {
+    const seq = ++requestSeq.current;
+    setLoading(true);
+    setError(null);
+    try {
+      const { rows: data, nextCursor } = await fetchPage(url, {
+        ...JSON.parse(filtersKey),
+        sort,
+        limit: perPage,
+        cursor: cursors.current[page - 1],
+      });
+      if (seq !== requestSeq.current) return;
+      cursors.current[page] = nextCursor;
+      setRows(Array.isArray(data) ? data : []);
+      setHasNext(Boolean(nextCursor));
+    } catch (e) {
+      if (seq !== requestSeq.current) return;
+      setError(e.message);
+      setRows([]);
+      setHasNext(false);
+    } finally {
+      if (seq === requestSeq.current) setLoading(false);
+    }
+  }, [url, filtersKey, sort, perPage, page]);
+
+  useEffect(() => {
+    if (!enabled) return;
+    load();
+    return () => {
+      requestSeq.current += 1;
+    };
+  }, [enabled, load]);
+
+  // Новые записи и правки справочников — перезагрузка текущей страницы.
+  // Подписка одна на всё время вкладки, а не на каждую страницу
+  const loadRef = useRef(load);
+  loadRef.current = load;
+  const topicsKey = topics.join(',');
+
+  useEffect(() => {
+    if (!enabled) return;
+    return subscribeChanges(topicsKey.split(','), () => loadRef.current());
+  }, [enabled, topicsKey]);
+
+  const onChangePage = useCallback((p) => {
+    // Без курсора страницу не загрузить: остаёмся на текущей
+    if (p === 1 || cursors.current[p - 1]) setPage(p);
+  }, []);
+
+  const onChangeRowsPerPage = useCallback((newPerPage) => setPerPage(newPerPage), []);
+
+  // Сортируются только колонки с sortField — полем сортировки на сервере
+  const onSort = useCallback((column, direction) => {
+    if (!column.sortField) return;
+    setSort(direction === 'desc' ? `-${column.sortField}` : column.sortField);
+  }, []);
+
+  return {
+    rows,
+    setRows,
+    loading,
+    error,
+    clearError: () => setError(null),
+    page,
+    perPage,
+    baseIndex: (page - 1) * perPage,
+    // DataTable считает страницы по общему числу строк; оно неизвестно,
+    // поэтому «есть ещё» — одна строка сверх текущей страницы
+    totalRows: (page - 1) * perPage + rows.length + (hasNext ? 1 : 0),
+    onChangePage,
+    onChangeRowsPerPage,
+    onSort,
+  };
+};
@@ -0,0 +1,9 @@
+import { apiClient } from "./fetchWithTimeout";
+
+// Все справочники и текущий пользователь одним запросом. Повторную загрузку
+// браузер сверяет по ETag и при неизменных справочниках получает 304
+export async function loadDirectories(timeout = 10000) {
+  const data = await apiClient.get("http://localhost:8000/api/bootstrap", timeout);
+  const directories = data?.directories ?? {};
+  return (key) => (Array.isArray(directories[key]) ? directories[key] : []);
+}
@@ -0,0 +1,63 @@
+import { apiClient } from "./fetchWithTimeout";
+
+const EVENTS_URL = "http://localhost:8000/api/events";
+// Пауза перед повторным подключением после обрыва или ошибки, мс
+const RECONNECT_DELAY = 3000;
+
+// Подписка на поток изменений /api/events. EventSource не умеет передавать
+// заголовки, а токен входа в URL попал бы в журналы, поэтому перед каждым
+// подключением запрашивается короткоживущий билет. Билет истекает, так что
+// переподключается подписка сама: новый билет и Last-Event-ID параметром.
+export function subscribeChanges(names, onChange, delay = 500) {
+  let hasToken;
+  try {
+    hasToken = Boolean(JSON.parse(localStorage.getItem("user") || "null")?.token);
+  } catch {
+    hasToken = false;
+  }
+  if (!hasToken || typeof EventSource === "undefined") return () => {};
+
+  let source = null;
+  let closed = false;
+  let lastEventId = null;
+  let reconnectTimer = null;
+  // Пачка изменений (например, несколько записей подряд) — одна перезагрузка
+  let timer = null;
+  const schedule = (event) => {
+    if (event.lastEventId) lastEventId = event.lastEventId;
+    clearTimeout(timer);
+    timer = setTimeout(onChange, delay);
+  };
+
+  const reconnect = () => {
+    if (source) source.close();
+    source = null;
+    if (!closed) reconnectTimer = setTimeout(connect, RECONNECT_DELAY);
+  };
+
+  const connect = async () => {
+    let ticket;
+    try {
+      ({ ticket } = await apiClient.post(`${EVENTS_URL}/ticket`, {}));
+    } catch {
+      reconnect();
+      return;
+    }
+    if (closed) return;
+    const params = new URLSearchParams({ ticket });
+    if (lastEventId) params.set("last_event_id", lastEventId);
+    source = new EventSource(`${EVENTS_URL}?${params}`);
+    // reset: сервер не сохранил пропущенные события, список нужно перечитать
+    [...names, "reset"].forEach((name) => source.addEventListener(name, schedule));
+    source.onerror = reconnect;
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    clearTimeout(timer);
+    clearTimeout(reconnectTimer);
+    if (source) source.close();
+  };
+}
@@ -1,21 +1,37 @@
-// Утилита для обработки запросов с таймаутом
-export const fetchWithTimeout = async (url, options = {}, timeout = 10000) => {
+// Токен, выданный при входе: сервер по нему ограничивает списки ролью
+export const authHeaders = () => {
+  try {
+    const user = JSON.parse(localStorage.getItem("user") || "null");
+    return user?.token ? { Authorization: `Bearer ${user.token}` } : {};
+  } catch {
+    return {};
+  }
+};
+
+// Запрос с таймаутом: возвращает ответ, ошибку HTTP превращает в исключение
+const request = async (url, options, timeout, read) => {
   const controller = new AbortController();
   const timeoutId = setTimeout(() => controller.abort(), timeout);
   
   try {
     const response = await fetch(url, {
       ...options,
+      headers: { ...authHeaders(), ...options.headers },
       signal: controller.signal,
     });
     clearTimeout(timeoutId);
     
+    if (response.status === 401 && authHeaders().Authorization) {
+      // Токен истёк или недействителен: после перезагрузки потребуется вход
+      localStorage.removeItem("user");
+    }
+
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}));
       throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
     }
     
-    return await response.json();
+    return await read(response);
   } catch (error) {
     clearTimeout(timeoutId);
     if (error.name === 'AbortError') {
@@ -25,6 +41,25 @@ export const fetchWithTimeout = async (url, options = {}, timeout = 10000) => {
   }
 };
 
+// Утилита для обработки запросов с таймаутом
+export const fetchWithTimeout = (url, options = {}, timeout = 10000) =>
+  request(url, options, timeout, (response) => response.json());
+
+// Одна страница списка: строки и курсор следующей страницы из X-Next-Cursor
+// (null на последней странице). Пустые параметры в запрос не попадают
+export const fetchPage = (url, params = {}, timeout = 10000) => {
+  const query = new URLSearchParams();
+  Object.entries(params).forEach(([key, value]) => {
+    if (value !== null && value !== undefined && value !== "") {
+      query.set(key, value);
+    }
+  });
+  return request(`${url}?${query}`, { method: 'GET' }, timeout, async (response) => ({
+    rows: await response.json(),
+    nextCursor: response.headers.get("X-Next-Cursor"),
+  }));
+};
+
 // Утилита для обработки разных методов
 export const apiClient = {
   get: (url, timeout = 10000) => fetchWithTimeout(url, { method: 'GET' }, timeout),
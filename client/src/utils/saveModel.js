@@ -1,3 +1,5 @@
+import { authHeaders } from "./fetchWithTimeout";
+
 // Функция для сохранения изменений в модели
 export async function saveModel({ url, data, method = 'PUT', headers = {}, timeout = 10000 }) {
   const controller = new AbortController();
@@ -5,7 +7,7 @@ export async function saveModel({ url, data, method = 'PUT', headers = {}, timeo
   try {
     const resp = await fetch(url, {
       method,
-      headers: { 'Content-Type': 'application/json', ...headers },
+      headers: { 'Content-Type': 'application/json', ...authHeaders(), ...headers },
       body: JSON.stringify(data ?? {}),
       signal: controller.signal,
     });
@@ -0,0 +1,161 @@
+"""Инкрементальное ведение сводных таблиц аналитики.
+
+Пути записи рекламаций и ТО вызывают record_* в той же транзакции, что и
+вставку, поэтому сводки всегда согласованы с фактическими таблицами.
+rebuild_summaries пересчитывает сводки целиком (миграция, восстановление).
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import String, cast, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import (
+    CarModel,
+    ComplaintModel,
+    ComplaintSummaryModel,
+    MaintenanceSummaryModel,
+    TechMaintenanceExtendModel,
+)
+
+# Разрез сводки рекламаций -> поле рекламации с id справочника
+COMPLAINT_DIMENSIONS = {
+    "node_failure": "node_failure_id",
+    "recovery_method": "recovery_method_id",
+    "service_company": "service_company_id",
+    "vehicle_model": "vehicle_model_id",
+}
+
+
+def _upsert(db: AsyncSession, model_class: type):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model_class)
+    return sqlite.insert(model_class)
+
+
+def _month(value: date) -> str:
+    return value.strftime("%Y-%m")
+
+
+async def record_complaints(db: AsyncSession, complaints: Iterable[dict]) -> None:
+    """Учитывает новые рекламации в сводке.
+
+    Каждая рекламация — словарь с id справочников (включая vehicle_model_id
+    машины) и equipment_downtime в днях.
+    """
+    deltas: Dict[Tuple[str, int], List[int]] = defaultdict(lambda: [0, 0, 0])
+    for complaint in complaints:
+        downtime = complaint.get("equipment_downtime")
+        for dimension, field in COMPLAINT_DIMENSIONS.items():
+            delta = deltas[(dimension, complaint[field])]
+            delta[0] += 1
+            if downtime is not None:
+                delta[1] += downtime
+                delta[2] += 1
+    if not deltas:
+        return
+
+    stmt = _upsert(db, ComplaintSummaryModel).values(
+        [
+            {
+                "dimension": dimension,
+                "key_id": key_id,
+                "failure_count": count,
+                "downtime_days_total": total,
+                "downtime_count": known,
+            }
+            for (dimension, key_id), (count, total, known) in deltas.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["dimension", "key_id"],
+        set_={
+            "failure_count": ComplaintSummaryModel.failure_count
+            + stmt.excluded.failure_count,
+            "downtime_days_total": ComplaintSummaryModel.downtime_days_total
+            + stmt.excluded.downtime_days_total,
+            "downtime_count": ComplaintSummaryModel.downtime_count
+            + stmt.excluded.downtime_count,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def record_maintenance(db: AsyncSession, records: Iterable[dict]) -> None:
+    """Учитывает новые ТО в помесячной сводке по видам ТО"""
+    deltas: Dict[Tuple[int, str], int] = defaultdict(int)
+    for record in records:
+        deltas[(record["maintenance_type_id"], _month(record["maintenance_date"]))] += 1
+    if not deltas:
+        return
+
+    stmt = _upsert(db, MaintenanceSummaryModel).values(
+        [
+            {"maintenance_type_id": type_id, "month": month, "maintenance_count": count}
+            for (type_id, month), count in deltas.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["maintenance_type_id", "month"],
+        set_={
+            "maintenance_count": MaintenanceSummaryModel.maintenance_count
+            + stmt.excluded.maintenance_count,
+        },
+    )
+    await db.execute(stmt)
+
+
+def rebuild_summaries(conn) -> None:
+    """Пересчитывает сводки по фактическим таблицам (синхронное соединение)"""
+    conn.execute(delete(ComplaintSummaryModel))
+    conn.execute(delete(MaintenanceSummaryModel))
+
+    for dimension, field in COMPLAINT_DIMENSIONS.items():
+        if field == "vehicle_model_id":
+            # Модель техники берётся у машины, а не из текстового поля рекламации
+            query = (
+                select(
+                    CarModel.vehicle_model_id,
+                    func.count(),
+                    func.coalesce(func.sum(ComplaintModel.equipment_downtime), 0),
+                    func.count(ComplaintModel.equipment_downtime),
+                )
+                .join(CarModel, CarModel.id == ComplaintModel.car_id)
+                .group_by(CarModel.vehicle_model_id)
+            )
+        else:
+            column = getattr(ComplaintModel, field)
+            query = select(
+                column,
+                func.count(),
+                func.coalesce(func.sum(ComplaintModel.equipment_downtime), 0),
+                func.count(ComplaintModel.equipment_downtime),
+            ).group_by(column)
+        rows = [
+            {
+                "dimension": dimension,
+                "key_id": key_id,
+                "failure_count": count,
+                "downtime_days_total": total,
+                "downtime_count": known,
+            }
+            for key_id, count, total, known in conn.execute(query)
+        ]
+        if rows:
+            conn.execute(insert(ComplaintSummaryModel), rows)
+
+    # Даты хранятся как YYYY-MM-DD, месяц — первые 7 символов
+    month = func.substr(cast(TechMaintenanceExtendModel.maintenance_date, String), 1, 7)
+    rows = [
+        {"maintenance_type_id": type_id, "month": month_value, "maintenance_count": count}
+        for type_id, month_value, count in conn.execute(
+            select(
+                TechMaintenanceExtendModel.maintenance_type_id, month, func.count()
+            ).group_by(TechMaintenanceExtendModel.maintenance_type_id, month)
+        )
+    ]
+    if rows:
+        conn.execute(insert(MaintenanceSummaryModel), rows)
@@ -0,0 +1,126 @@
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query, Response, status
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from analytics import rebuild_summaries
+from database import engine, get_db, get_read_db
+from jobs import JobContext, JobStatus, accepted, job_runner
+from models import (
+    ComplaintSummaryModel,
+    FailureNodeModel,
+    MaintenanceSummaryModel,
+    RecoveryMethodModel,
+    ServiceCompanyModel,
+    TechMaintenanceModel,
+    UserRole,
+    VehicleModel,
+)
+from reference_cache import reference_cache
+from security import CurrentUser, require_roles
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+FailureDimension = Literal["node_failure", "recovery_method", "service_company", "vehicle_model"]
+
+_DIMENSION_MODELS = {
+    "node_failure": FailureNodeModel,
+    "recovery_method": RecoveryMethodModel,
+    "service_company": ServiceCompanyModel,
+    "vehicle_model": VehicleModel,
+}
+
+
+class FailureStats(BaseModel):
+    id: int = Field(..., description="ID записи справочника")
+    name: str = Field(..., description="Наименование")
+    failure_count: int = Field(..., description="Количество отказов")
+    avg_downtime_days: Optional[float] = Field(None, description="Средний простой, дней")
+
+
+class MaintenanceStats(BaseModel):
+    maintenance_type_id: int = Field(..., description="ID вида ТО")
+    maintenance_type: str = Field(..., description="Вид ТО")
+    month: str = Field(..., description="Месяц (YYYY-MM)")
+    maintenance_count: int = Field(..., description="Количество ТО")
+
+
+# Сводки строятся по всему парку, поэтому доступны только менеджеру
+manager_only = require_roles(UserRole.manager)
+
+
+# Отказы и средний простой в разрезе справочника
+@router.get("/failures/{dimension}", response_model=List[FailureStats])
+async def get_failure_stats(
+    dimension: FailureDimension,
+    user: CurrentUser = Depends(manager_only),
+    db: AsyncSession = Depends(get_read_db),
+):
+    result = await db.execute(
+        select(ComplaintSummaryModel)
+        .where(ComplaintSummaryModel.dimension == dimension)
+        .order_by(ComplaintSummaryModel.failure_count.desc())
+    )
+    model_class = _DIMENSION_MODELS[dimension]
+    return [
+        {
+            "id": s.key_id,
+            "name": reference_cache.name(model_class, s.key_id),
+            "failure_count": s.failure_count,
+            "avg_downtime_days": round(s.downtime_days_total / s.downtime_count, 2)
+            if s.downtime_count
+            else None,
+        }
+        for s in result.scalars().all()
+    ]
+
+
+# Количество ТО по видам и месяцам
+@router.get("/maintenance", response_model=List[MaintenanceStats])
+async def get_maintenance_stats(
+    maintenance_type_id: Optional[int] = None,
+    month_from: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="С месяца (YYYY-MM)"),
+    month_to: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="По месяц (YYYY-MM)"),
+    user: CurrentUser = Depends(manager_only),
+    db: AsyncSession = Depends(get_read_db),
+):
+    stmt = select(MaintenanceSummaryModel).order_by(
+        MaintenanceSummaryModel.month, MaintenanceSummaryModel.maintenance_type_id
+    )
+    if maintenance_type_id is not None:
+        stmt = stmt.where(MaintenanceSummaryModel.maintenance_type_id == maintenance_type_id)
+    if month_from:
+        stmt = stmt.where(MaintenanceSummaryModel.month >= month_from)
+    if month_to:
+        stmt = stmt.where(MaintenanceSummaryModel.month <= month_to)
+    result = await db.execute(stmt)
+    return [
+        {
+            "maintenance_type_id": s.maintenance_type_id,
+            "maintenance_type": reference_cache.name(TechMaintenanceModel, s.maintenance_type_id),
+            "month": s.month,
+            "maintenance_count": s.maintenance_count,
+        }
+        for s in result.scalars().all()
+    ]
+
+
+async def _rebuild_job(job: JobContext):
+    async with engine.begin() as conn:
+        await conn.run_sync(rebuild_summaries)
+
+
+job_runner.register("analytics_rebuild", _rebuild_job)
+
+
+# Полный пересчёт сводок фоновой задачей (после ручной правки данных в БД)
+@router.post("/rebuild", response_model=JobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def submit_rebuild(
+    response: Response,
+    user: CurrentUser = Depends(manager_only),
+    db: AsyncSession = Depends(get_db),
+):
+    job = await job_runner.submit(db, "analytics_rebuild", {}, user)
+    return accepted(job, response)
@@ -1,35 +1,44 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from starlette.concurrency import run_in_threadpool
 
-from database import get_db
-from models import User
+from database import get_read_db
+from models import Client, ServiceCompanyModel, User, UserRole
+from reference_cache import reference_cache
 from schemas import LoginRequest, LoginResponse
+from security import DUMMY_PASSWORD_HASH, issue_token, verify_password
 
 router = APIRouter(tags=["auth"])
 
 
 @router.post("/login", response_model=LoginResponse)
-async def login(payload: LoginRequest, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(User)
-        .options(selectinload(User.client), selectinload(User.service_company))
-        .where(User.username == payload.username)
-    )
+async def login(payload: LoginRequest, db: AsyncSession = Depends(get_read_db)):
+    result = await db.execute(select(User).where(User.username == payload.username))
     user = result.scalar_one_or_none()
-    if not user or user.password != payload.password:
+    # scrypt занимает десятки миллисекунд, поэтому считается в пуле потоков;
+    # для неизвестного логина проверяется фиктивный хэш с той же стоимостью
+    password_ok = await run_in_threadpool(
+        verify_password, payload.password, user.password if user else DUMMY_PASSWORD_HASH
+    )
+    if not user or not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверное имя пользователя или пароль",
         )
 
-    name = None
-    if user.client:
-        name = user.client.name
-    elif user.service_company:
-        name = user.service_company.name
+    name = reference_cache.name(Client, user.client_id, None) or reference_cache.name(
+        ServiceCompanyModel, user.service_company_id, None
+    )
+    token, expires_at = issue_token(user)
 
     return LoginResponse(
-        id=user.id, username=user.username, role=str(user.role), name=name
+        id=user.id,
+        username=user.username,
+        role=UserRole(user.role or UserRole.no_auth).value,
+        name=name,
+        client_id=user.client_id,
+        service_company_id=user.service_company_id,
+        token=token,
+        expires_at=expires_at,
     )
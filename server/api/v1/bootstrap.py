@@ -0,0 +1,101 @@
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Response
+from pydantic import BaseModel, Field
+
+from fast_json import dumps, encoded_response
+from models import (
+    Client,
+    DriveAxleModel,
+    EngineModel,
+    FailureNodeModel,
+    RecoveryMethodModel,
+    ServiceCompanyModel,
+    SteeringAxleModel,
+    TechMaintenanceModel,
+    TransmissionModel,
+    VehicleModel,
+)
+from reference_cache import REFERENCE_MODELS, reference_cache
+from security import CurrentUser, get_current_user
+from table_versions import scoped_table_etag
+
+router = APIRouter(tags=["bootstrap"])
+
+# Ключ в ответе -> справочник; ключи совпадают с путями /api/models/*
+DIRECTORIES = {
+    "vehicle": VehicleModel,
+    "engine": EngineModel,
+    "transmission": TransmissionModel,
+    "drive-axle": DriveAxleModel,
+    "steering-axle": SteeringAxleModel,
+    "recovery-method": RecoveryMethodModel,
+    "failure-node": FailureNodeModel,
+    "clients": Client,
+    "service-company": ServiceCompanyModel,
+    "maintenance-types": TechMaintenanceModel,
+}
+
+
+class DirectoryItem(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+
+
+class SessionUser(BaseModel):
+    id: int
+    role: str
+    name: Optional[str] = Field(None, description="Клиент или сервисная компания")
+    client_id: Optional[int] = None
+    service_company_id: Optional[int] = None
+
+
+class Bootstrap(BaseModel):
+    version: int = Field(..., description="Версия справочников, растёт при любом изменении")
+    directories: Dict[str, List[DirectoryItem]]
+    user: SessionUser
+
+
+# Закодированные справочники для текущей версии кэша: собираются один раз
+# после изменения, а не на каждый запрос
+_encoded: Tuple[int, bytes] = (-1, b"")
+
+
+def _encoded_directories() -> Tuple[int, bytes]:
+    global _encoded
+    version = reference_cache.version
+    if _encoded[0] != version:
+        _encoded = (
+            version,
+            dumps({
+                key: [entry._asdict() for entry in reference_cache.entries(model_class)]
+                for key, model_class in DIRECTORIES.items()
+            }),
+        )
+    return _encoded
+
+
+# Всё, что нужно клиенту для первой отрисовки: справочники и текущий пользователь.
+# Справочники берутся из кэша в памяти, из БД читаются только версии таблиц.
+@router.get(
+    "/bootstrap",
+    response_model=Bootstrap,
+    dependencies=[Depends(scoped_table_etag(*REFERENCE_MODELS))],
+)
+async def get_bootstrap(response: Response, user: CurrentUser = Depends(get_current_user)):
+    version, directories = _encoded_directories()
+    session_user = {
+        "id": user.id,
+        "role": user.role.value,
+        "name": reference_cache.name(Client, user.client_id, None)
+        or reference_cache.name(ServiceCompanyModel, user.service_company_id, None),
+        "client_id": user.client_id,
+        "service_company_id": user.service_company_id,
+    }
+    body = (
+        b'{"version":' + str(version).encode()
+        + b',"directories":' + directories
+        + b',"user":' + dumps(session_user) + b"}"
+    )
+    return encoded_response(body, response)
@@ -1,14 +1,28 @@
+import logging
 from typing import List, Optional
 from datetime import date as _date
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
-from database import get_db
+from database import get_db, get_read_db
+from events import Audience, event_broker
+from export import ExportFormat, export_response
+from fast_json import list_response
+from jobs import JobContext, JobStatus, accepted, build_filters, filter_params, job_runner
+from reference_cache import reference_cache
+from vin_cache import vin_cache
+from pagination import apply_keyset, finalize_page, page_limit, parse_sort
+from security import CurrentUser, get_current_user, require_roles, scope_cars
+from table_versions import scoped_table_etag
+from write_queue import write_queue
 from models import (
     CarModel,
+    UserRole,
     VehicleModel,
     EngineModel,
     TransmissionModel,
@@ -22,93 +36,226 @@ from pydantic import BaseModel, Field
 
 router = APIRouter(prefix="/cars", tags=["cars"])
 
-# Получение экземпляра машины для незарегистрированных пользователей
-@router.get("/{vin}", response_model=SCarNotAuth)
-async def get_car_by_vin(vin: str, db: AsyncSession = Depends(get_db)):
-    stmt = select(CarModel).where(CarModel.vin == vin)
-    result = await db.execute(stmt)
-    car = result.scalar_one_or_none()
+logger = logging.getLogger("silant.api")
+
+def _car_to_dict(car: CarModel) -> dict:
+    return {
+        "id": car.id,
+        "vin": car.vin,
+        "vehicle_model_id": car.vehicle_model.id if car.vehicle_model else None,
+        "vehicle_model": car.vehicle_model.name if car.vehicle_model else "Не указано",
+        "engine_model_id": car.engine_model.id if car.engine_model else None,
+        "engine_model": car.engine_model.name if car.engine_model else "Не указано",
+        "engine_number": car.engine_number or "Не указан",
+        "transmission_model_id": car.transmission_model.id if car.transmission_model else None,
+        "transmission_model": car.transmission_model.name if car.transmission_model else "Не указана",
+        "transmission_number": car.transmission_number or "Не указан",
+        "drive_axle_model_id": car.drive_axle_model.id if car.drive_axle_model else None,
+        "drive_axle_model": car.drive_axle_model.name if car.drive_axle_model else "Не указан",
+        "drive_axle_number": car.drive_axle_number or "Не указан",
+        "steering_axle_model_id": car.steering_axle_model.id if car.steering_axle_model else None,
+        "steering_axle_model": car.steering_axle_model.name if car.steering_axle_model else "Не указан",
+        "steering_axle_number": car.steering_axle_number or "Не указан",
+        "delivery_agreement": car.delivery_agreement or "",
+        "shipment_date": car.shipment_date.isoformat() if car.shipment_date else "",
+        "recipient": car.recipient or "",
+        "delivery_address": car.delivery_address or "",
+        "equipment": car.equipment or "",
+        "client": car.client.name if car.client else "",
+        "service_company": car.service_company_model.name if car.service_company_model else "",
+        "service_company_id": car.service_company_model.id if car.service_company_model else None,
+    }
 
-    if not car:
-        raise HTTPException(status_code=404, detail="Машина с указанным VIN не найдена")
 
-    vehicle_model = await db.get(VehicleModel, car.vehicle_model_id)
-    engine_model = await db.get(EngineModel, car.engine_model_id)
-    transmission_model = await db.get(TransmissionModel, car.transmission_model_id)
-    drive_axle_model = await db.get(DriveAxleModel, car.drive_axle_model_id)
-    steering_axle_model = await db.get(SteeringAxleModel, car.steering_axle_model_id)
+# Таблицы, от которых зависит содержимое списка машин (для ETag)
+CAR_LIST_TABLES = (
+    CarModel,
+    VehicleModel,
+    EngineModel,
+    TransmissionModel,
+    DriveAxleModel,
+    SteeringAxleModel,
+    Client,
+    ServiceCompanyModel,
+)
 
-    response_data = {
+CAR_SORT_FIELDS = {
+    "id": CarModel.id,
+    "shipment_date": CarModel.shipment_date,
+}
+
+
+class CarFilters:
+    """Серверные фильтры списка машин"""
+
+    def __init__(
+        self,
+        vehicle_model_id: Optional[int] = None,
+        engine_model_id: Optional[int] = None,
+        transmission_model_id: Optional[int] = None,
+        drive_axle_model_id: Optional[int] = None,
+        steering_axle_model_id: Optional[int] = None,
+        client_id: Optional[int] = None,
+        service_company_id: Optional[int] = None,
+        shipment_date_from: Optional[_date] = Query(None, description="Дата отгрузки с"),
+        shipment_date_to: Optional[_date] = Query(None, description="Дата отгрузки по"),
+    ):
+        self.fk = {
+            CarModel.vehicle_model_id: vehicle_model_id,
+            CarModel.engine_model_id: engine_model_id,
+            CarModel.transmission_model_id: transmission_model_id,
+            CarModel.drive_axle_model_id: drive_axle_model_id,
+            CarModel.steering_axle_model_id: steering_axle_model_id,
+            CarModel.client_id: client_id,
+            CarModel.service_company_id: service_company_id,
+        }
+        self.shipment_date_from = shipment_date_from
+        self.shipment_date_to = shipment_date_to
+
+    def apply(self, stmt):
+        for column, value in self.fk.items():
+            if value is not None:
+                stmt = stmt.where(column == value)
+        if self.shipment_date_from is not None:
+            stmt = stmt.where(CarModel.shipment_date >= self.shipment_date_from)
+        if self.shipment_date_to is not None:
+            stmt = stmt.where(CarModel.shipment_date <= self.shipment_date_to)
+        return stmt
+
+
+def _cars_query():
+    return select(CarModel).options(
+        selectinload(CarModel.vehicle_model),
+        selectinload(CarModel.engine_model),
+        selectinload(CarModel.transmission_model),
+        selectinload(CarModel.drive_axle_model),
+        selectinload(CarModel.steering_axle_model),
+        selectinload(CarModel.client),
+        selectinload(CarModel.service_company_model),
+    )
+
+
+# Потоковая выгрузка машин
+@router.get("/export")
+async def export_cars(
+    filters: CarFilters = Depends(),
+    fmt: ExportFormat = Query("csv", alias="format", description="csv или ndjson"),
+    user: CurrentUser = Depends(get_current_user),
+):
+    stmt = scope_cars(filters.apply(_cars_query()), user).order_by(CarModel.id)
+    return export_response(stmt, _car_to_dict, list(SCar.model_fields), fmt, "cars")
+
+
+async def _export_cars_job(job: JobContext):
+    filters = build_filters(CarFilters, job.params["filters"])
+    stmt = scope_cars(filters.apply(_cars_query()), job.user).order_by(CarModel.id)
+    await job.export(stmt, CarModel.id, _car_to_dict, list(SCar.model_fields), job.params["format"])
+
+
+job_runner.register("cars_export", _export_cars_job)
+
+
+# Выгрузка машин фоновой задачей: результат — через /api/jobs/{id}
+@router.post("/export", response_model=JobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def submit_cars_export(
+    request: Request,
+    response: Response,
+    filters: CarFilters = Depends(),
+    fmt: ExportFormat = Query("csv", alias="format", description="csv или ndjson"),
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    params = {"filters": filter_params(CarFilters, request), "format": fmt}
+    job = await job_runner.submit(db, "cars_export", params, user)
+    return accepted(job, response)
+
+
+def _car_public_dict(car) -> dict:
+    return {
         "vin": car.vin or "",
-        "vehicle_model": vehicle_model.name if vehicle_model else "Не указано",
-        "engine_model": engine_model.name if engine_model else "Не указано",
+        "vehicle_model": car.vehicle_model or "Не указано",
+        "engine_model": car.engine_model or "Не указано",
         "engine_number": car.engine_number or "Не указан",
-        "transmission_model": transmission_model.name if transmission_model else "Не указана",
+        "transmission_model": car.transmission_model or "Не указана",
         "transmission_number": car.transmission_number or "Не указан",
-        "drive_axle_model": drive_axle_model.name if drive_axle_model else "Не указан",
+        "drive_axle_model": car.drive_axle_model or "Не указан",
         "drive_axle_number": car.drive_axle_number or "Не указан",
-        "steering_axle_model": steering_axle_model.name if steering_axle_model else "Не указан",
+        "steering_axle_model": car.steering_axle_model or "Не указан",
         "steering_axle_number": car.steering_axle_number or "Не указан",
     }
 
-    for field, value in response_data.items():
-        if value is None:
-            response_data[field] = ""
+
+# Получение экземпляра машины для незарегистрированных пользователей
+@router.get("/{vin}", response_model=SCarNotAuth)
+async def get_car_by_vin(vin: str, db: AsyncSession = Depends(get_read_db)):
+    cached, response_data = vin_cache.get(vin)
+    if not cached:
+        generation = vin_cache.generation()
+        # Машина и наименования моделей получаются одним запросом
+        stmt = (
+            select(
+                CarModel.vin,
+                CarModel.engine_number,
+                CarModel.transmission_number,
+                CarModel.drive_axle_number,
+                CarModel.steering_axle_number,
+                VehicleModel.name.label("vehicle_model"),
+                EngineModel.name.label("engine_model"),
+                TransmissionModel.name.label("transmission_model"),
+                DriveAxleModel.name.label("drive_axle_model"),
+                SteeringAxleModel.name.label("steering_axle_model"),
+            )
+            .outerjoin(VehicleModel, VehicleModel.id == CarModel.vehicle_model_id)
+            .outerjoin(EngineModel, EngineModel.id == CarModel.engine_model_id)
+            .outerjoin(TransmissionModel, TransmissionModel.id == CarModel.transmission_model_id)
+            .outerjoin(DriveAxleModel, DriveAxleModel.id == CarModel.drive_axle_model_id)
+            .outerjoin(SteeringAxleModel, SteeringAxleModel.id == CarModel.steering_axle_model_id)
+            .where(CarModel.vin == vin)
+        )
+        result = await db.execute(stmt)
+        car = result.one_or_none()
+        response_data = _car_public_dict(car) if car else None
+        vin_cache.set(vin, response_data, generation)
+
+    if response_data is None:
+        raise HTTPException(status_code=404, detail="Машина с указанным VIN не найдена")
 
     return response_data
 
 # Получение экземпляра машины для зарегистрированных пользователей
-@router.get("", response_model=List[SCar])
-async def get_all_cars(db: AsyncSession = Depends(get_db)):
+@router.get(
+    "",
+    response_model=List[SCar],
+    dependencies=[Depends(scoped_table_etag(*CAR_LIST_TABLES))],
+)
+async def get_all_cars(
+    response: Response,
+    filters: CarFilters = Depends(),
+    sort: str = Query("id", description="Поле сортировки, '-' в начале — по убыванию"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: Optional[int] = Depends(page_limit),
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    sort_key, sort_column, descending = parse_sort(sort, CAR_SORT_FIELDS)
+    stmt = apply_keyset(
+        scope_cars(filters.apply(_cars_query()), user),
+        sort_column,
+        CarModel.id,
+        descending,
+        cursor,
+        limit,
+    )
     try:
-        result = await db.execute(
-            select(CarModel)
-            .options(
-                selectinload(CarModel.vehicle_model),
-                selectinload(CarModel.engine_model),
-                selectinload(CarModel.transmission_model),
-                selectinload(CarModel.drive_axle_model),
-                selectinload(CarModel.steering_axle_model),
-                selectinload(CarModel.client),
-                selectinload(CarModel.service_company_model),
-            )
-        )
-        cars = result.scalars().all()
-
-        return [
-            {
-                "id": car.id,
-                "vin": car.vin,
-                "vehicle_model_id": car.vehicle_model.id if car.vehicle_model else None,
-                "vehicle_model": car.vehicle_model.name if car.vehicle_model else "Не указано",
-                "engine_model_id": car.engine_model.id if car.engine_model else None,
-                "engine_model": car.engine_model.name if car.engine_model else "Не указано",
-                "engine_number": car.engine_number or "Не указан",
-                "transmission_model_id": car.transmission_model.id if car.transmission_model else None,
-                "transmission_model": car.transmission_model.name if car.transmission_model else "Не указана",
-                "transmission_number": car.transmission_number or "Не указан",
-                "drive_axle_model_id": car.drive_axle_model.id if car.drive_axle_model else None,
-                "drive_axle_model": car.drive_axle_model.name if car.drive_axle_model else "Не указан",
-                "drive_axle_number": car.drive_axle_number or "Не указан",
-                "steering_axle_model_id": car.steering_axle_model.id if car.steering_axle_model else None,
-                "steering_axle_model": car.steering_axle_model.name if car.steering_axle_model else "Не указан",
-                "steering_axle_number": car.steering_axle_number or "Не указан",
-                "delivery_agreement": car.delivery_agreement or "",
-                "shipment_date": car.shipment_date.isoformat() if car.shipment_date else "",
-                "recipient": car.recipient or "",
-                "delivery_address": car.delivery_address or "",
-                "equipment": car.equipment or "",
-                "client": car.client.name if car.client else "",
-                "service_company": car.service_company_model.name if car.service_company_model else "",
-                "service_company_id": car.service_company_model.id if car.service_company_model else None,
-            }
-            for car in cars
-        ]
-    except Exception as e:
+        result = await db.execute(stmt)
+    except SQLAlchemyError:
+        logger.exception("Ошибка при получении списка машин")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при получении списка машин: {str(e)}",
+            detail="Ошибка при получении списка машин",
         )
+    cars = finalize_page(result.scalars().all(), limit, sort_key, response)
+    return list_response([_car_to_dict(car) for car in cars], response)
 
 
 # Создание новой машины
@@ -132,88 +279,210 @@ class CarCreateRequest(BaseModel):
     service_company_id: int = Field(..., description="ID сервисной компании")
 
 
+# Справочники, на которые ссылается машина
+CAR_REFERENCE_FIELDS = {
+    "vehicle_model_id": VehicleModel,
+    "engine_model_id": EngineModel,
+    "transmission_model_id": TransmissionModel,
+    "drive_axle_model_id": DriveAxleModel,
+    "steering_axle_model_id": SteeringAxleModel,
+    "client_id": Client,
+    "service_company_id": ServiceCompanyModel,
+}
+
+
+# Регистрировать машины может только менеджер
+manager_only = require_roles(UserRole.manager)
+
+
+async def _existing_refs(db: AsyncSession, items: List[CarCreateRequest]) -> dict:
+    """Существующие id справочников по полям машины: по кэшу, промахи — одним IN-запросом"""
+    return {
+        field: await reference_cache.ensure(db, model_class, (getattr(item, field) for item in items))
+        for field, model_class in CAR_REFERENCE_FIELDS.items()
+    }
+
+
+def _car_row(payload: CarCreateRequest, existing_refs: dict) -> tuple:
+    """Проверка машины перед вставкой — общая для одиночной и массовой регистрации.
+
+    Возвращает (строка для вставки, None) или (None, описание ошибки).
+    """
+    if len(payload.vin) != 17:
+        return None, "VIN должен состоять из 17 символов"
+    if payload.drive_axle_model_id is None:
+        return None, "Поле 'drive_axle_model_id' обязательно"
+    for field in CAR_REFERENCE_FIELDS:
+        model_id = getattr(payload, field)
+        if model_id is not None and model_id not in existing_refs[field]:
+            return None, f"Указан несуществующий {field}"
+    if not payload.shipment_date:
+        return None, "Поле 'shipment_date' обязательно"
+    try:
+        shipment_dt = _date.fromisoformat(payload.shipment_date)
+    except ValueError:
+        return None, "Неверный формат shipment_date"
+
+    row = payload.model_dump()
+    for field in ("engine_number", "transmission_number", "drive_axle_number",
+                  "steering_axle_number", "delivery_agreement", "recipient",
+                  "delivery_address", "equipment"):
+        row[field] = row[field] or ""
+    row["shipment_date"] = shipment_dt
+    return row, None
+
+
+def _publish_car_created(car_id: int, row) -> None:
+    event_broker.publish(
+        "car",
+        {"action": "created", "id": car_id, "vin": row["vin"]},
+        Audience(row["client_id"], row["service_company_id"]),
+    )
+
+
 @router.post("", response_model=SCar, status_code=status.HTTP_201_CREATED)
-async def create_car(payload: CarCreateRequest, db: AsyncSession = Depends(get_db)):
+async def create_car(
+    payload: CarCreateRequest,
+    user: CurrentUser = Depends(manager_only),
+    db: AsyncSession = Depends(get_db),
+):
     # Проверка на дубликат VIN
-    exists = await db.execute(select(CarModel).where(CarModel.vin == payload.vin))
+    exists = await db.execute(select(CarModel.id).where(CarModel.vin == payload.vin))
     if exists.scalar_one_or_none() is not None:
         raise HTTPException(status_code=409, detail="Автомобиль с таким VIN уже существует")
 
-    # Бизнес-валидация обязательных полей
-    if payload.drive_axle_model_id is None:
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Поле 'drive_axle_model_id' обязательно")
-    # Проверка существования связей (минимум для обязательного поля)
-    if payload.drive_axle_model_id is not None:
-        drv = await db.get(DriveAxleModel, payload.drive_axle_model_id)
-        if drv is None:
-            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Указан несуществующий drive_axle_model_id")
-    # client_id и service_company_id обязательны согласно модели
-    client = await db.get(Client, payload.client_id)
-    if client is None:
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Указан несуществующий client_id")
-    service_company = await db.get(ServiceCompanyModel, payload.service_company_id)
-    if service_company is None:
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Указан несуществующий service_company_id")
-
-    # Преобразуем дату
-    shipment_dt = None
-    if payload.shipment_date:
-        try:
-            shipment_dt = _date.fromisoformat(payload.shipment_date)
-        except Exception:
-            shipment_dt = None
-
-    car = CarModel(
-        vin=payload.vin,
-        vehicle_model_id=payload.vehicle_model_id,
-        engine_model_id=payload.engine_model_id,
-        engine_number=payload.engine_number or "",
-        transmission_model_id=payload.transmission_model_id,
-        transmission_number=payload.transmission_number or "",
-        drive_axle_model_id=payload.drive_axle_model_id,
-        drive_axle_number=payload.drive_axle_number or "",
-        steering_axle_model_id=payload.steering_axle_model_id,
-        steering_axle_number=payload.steering_axle_number or "",
-        delivery_agreement=payload.delivery_agreement or "",
-        shipment_date=shipment_dt,
-        recipient=payload.recipient or "",
-        delivery_address=payload.delivery_address or "",
-        equipment=payload.equipment or "",
-        client_id=payload.client_id,
-        service_company_id=payload.service_company_id,
-    )
-    db.add(car)
-    await db.commit()
-    await db.refresh(car)
+    row, error = _car_row(payload, await _existing_refs(db, [payload]))
+    if error:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=error)
 
-    vehicle_model = await db.get(VehicleModel, car.vehicle_model_id) if car.vehicle_model_id else None
-    engine_model = await db.get(EngineModel, car.engine_model_id) if car.engine_model_id else None
-    transmission_model = await db.get(TransmissionModel, car.transmission_model_id) if car.transmission_model_id else None
-    drive_axle_model = await db.get(DriveAxleModel, car.drive_axle_model_id) if car.drive_axle_model_id else None
-    steering_axle_model = await db.get(SteeringAxleModel, car.steering_axle_model_id) if car.steering_axle_model_id else None
+    async def add_car(session: AsyncSession) -> CarModel:
+        car = CarModel(**row)
+        session.add(car)
+        await session.flush()
+        return car
+
+    try:
+        car = await write_queue.run(db, add_car)
+    except IntegrityError:
+        # VIN занял параллельный запрос между проверкой и вставкой
+        raise HTTPException(status_code=409, detail="Автомобиль с таким VIN уже существует")
+    vin_cache.invalidate(car.vin)
+    _publish_car_created(car.id, row)
 
     return {
         "id": car.id,
         "vin": car.vin,
         "vehicle_model_id": car.vehicle_model_id,
-        "vehicle_model": vehicle_model.name if vehicle_model else "Не указано",
+        "vehicle_model": reference_cache.name(VehicleModel, car.vehicle_model_id, "Не указано"),
         "engine_model_id": car.engine_model_id,
-        "engine_model": engine_model.name if engine_model else "Не указано",
+        "engine_model": reference_cache.name(EngineModel, car.engine_model_id, "Не указано"),
         "engine_number": car.engine_number or "Не указан",
         "transmission_model_id": car.transmission_model_id,
-        "transmission_model": transmission_model.name if transmission_model else "Не указана",
+        "transmission_model": reference_cache.name(TransmissionModel, car.transmission_model_id, "Не указана"),
         "transmission_number": car.transmission_number or "Не указан",
         "drive_axle_model_id": car.drive_axle_model_id,
-        "drive_axle_model": drive_axle_model.name if drive_axle_model else "Не указан",
+        "drive_axle_model": reference_cache.name(DriveAxleModel, car.drive_axle_model_id, "Не указан"),
         "drive_axle_number": car.drive_axle_number or "Не указан",
         "steering_axle_model_id": car.steering_axle_model_id,
-        "steering_axle_model": steering_axle_model.name if steering_axle_model else "Не указан",
+        "steering_axle_model": reference_cache.name(SteeringAxleModel, car.steering_axle_model_id, "Не указан"),
         "steering_axle_number": car.steering_axle_number or "Не указан",
         "delivery_agreement": car.delivery_agreement or "",
         "shipment_date": car.shipment_date.isoformat() if car.shipment_date else "",
         "recipient": car.recipient or "",
         "delivery_address": car.delivery_address or "",
         "equipment": car.equipment or "",
-        "client": client.name if client else "",
-        "service_company": service_company.name if service_company else "",
+        "client": reference_cache.name(Client, car.client_id),
+        "service_company": reference_cache.name(ServiceCompanyModel, car.service_company_id),
+        "service_company_id": car.service_company_id,
+    }
+
+
+# Массовая регистрация машин
+MAX_BULK_CARS = 5000
+# Размер пачки для IN-запросов, чтобы не упереться в лимит параметров SQLite
+IN_CHUNK_SIZE = 900
+
+
+class BulkCarResult(BaseModel):
+    index: int = Field(..., description="Позиция машины в запросе")
+    vin: str = Field(..., description="Заводской номер машины (VIN)")
+    created: bool = Field(..., description="Машина зарегистрирована")
+    id: Optional[int] = Field(None, description="ID созданной машины")
+    detail: Optional[str] = Field(None, description="Причина отказа")
+
+
+class BulkCarResponse(BaseModel):
+    created: int = Field(..., description="Количество зарегистрированных машин")
+    failed: int = Field(..., description="Количество отклонённых машин")
+    results: List[BulkCarResult]
+
+
+@router.post("/bulk", response_model=BulkCarResponse)
+async def create_cars_bulk(
+    payload: List[CarCreateRequest] = Body(..., max_length=MAX_BULK_CARS),
+    user: CurrentUser = Depends(manager_only),
+    db: AsyncSession = Depends(get_db),
+):
+    # Существующие VIN — одним IN-запросом на пачку
+    vins = list({item.vin for item in payload})
+    taken = set()
+    for i in range(0, len(vins), IN_CHUNK_SIZE):
+        result = await db.execute(
+            select(CarModel.vin).where(CarModel.vin.in_(vins[i:i + IN_CHUNK_SIZE]))
+        )
+        taken.update(result.scalars().all())
+
+    existing_refs = await _existing_refs(db, payload)
+
+    results: List[dict] = []
+    rows: List[dict] = []
+    row_positions: List[int] = []
+    for index, item in enumerate(payload):
+        entry = {"index": index, "vin": item.vin, "created": False}
+        results.append(entry)
+        if item.vin in taken:
+            entry["detail"] = "Автомобиль с таким VIN уже существует"
+            continue
+        row, error = _car_row(item, existing_refs)
+        if error:
+            entry["detail"] = error
+            continue
+        # Повтор VIN внутри одного запроса тоже считается дубликатом
+        taken.add(item.vin)
+        rows.append(row)
+        row_positions.append(index)
+
+    async def add_cars(session: AsyncSession) -> List[int]:
+        result = await session.execute(
+            insert(CarModel).returning(CarModel.id, sort_by_parameter_order=True),
+            rows,
+        )
+        return result.scalars().all()
+
+    if rows:
+        try:
+            ids = await write_queue.run(db, add_cars)
+        except IntegrityError:
+            await db.rollback()
+            # Часть VIN заняли параллельные запросы между проверкой и вставкой
+            raise HTTPException(
+                status_code=409, detail="Автомобиль с таким VIN уже существует, повторите запрос"
+            )
+        except SQLAlchemyError:
+            await db.rollback()
+            logger.exception("Ошибка при массовой регистрации машин")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Ошибка при массовой регистрации машин",
+            )
+        for position, row, car_id in zip(row_positions, rows, ids):
+            results[position]["created"] = True
+            results[position]["id"] = car_id
+            vin_cache.invalidate(row["vin"])
+            _publish_car_created(car_id, row)
+
+    return {
+        "created": len(rows),
+        "failed": len(payload) - len(rows),
+        "results": results,
     }
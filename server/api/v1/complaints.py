@@ -1,23 +1,46 @@
-from datetime import datetime
+import logging
+from datetime import date, datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel, Field, field_validator
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
 
-from database import get_db
+from analytics import record_complaints
+from database import get_db, get_read_db
+from events import event_broker, record_audience
+from export import ExportFormat, export_response
+from fast_json import list_response
+from importer import import_csv, open_upload
+from jobs import JobContext, JobStatus, accepted, build_filters, filter_params, job_runner
+from reference_cache import reference_cache
+from pagination import apply_keyset, finalize_page, page_limit, parse_sort
+from security import (
+    CurrentUser,
+    can_access,
+    can_write_for,
+    get_current_user,
+    record_writers,
+    scope_car_records,
+)
+from table_versions import scoped_table_etag
+from write_queue import write_queue
 from models import (
     ComplaintModel,
     CarModel,
     FailureNodeModel,
     RecoveryMethodModel,
     ServiceCompanyModel,
+    VehicleModel,
 )
 
 router = APIRouter(prefix="/complaints", tags=["complaints"])
 
+logger = logging.getLogger("silant.api")
+
 
 class ComplaintResponse(BaseModel):
     id: int
@@ -33,6 +56,7 @@ class ComplaintResponse(BaseModel):
     used_spare_parts: Optional[str]
     date_recovery: Optional[str]
     equipment_downtime: Optional[str]
+    equipment_downtime_days: Optional[int] = None
     service_company: str
     service_company_id: int
     vehicle_model: str
@@ -41,22 +65,21 @@ class ComplaintResponse(BaseModel):
         from_attributes = True
 
 
-def calculate_downtime(date_failure: str, date_recovery: str) -> str:
-    """Вычисляем разницу между датами"""
-    if not date_failure or not date_recovery:
-        return ""
-    
-    try:
-        failure_date = datetime.strptime(date_failure, "%Y-%m-%d").date()
-        recovery_date = datetime.strptime(date_recovery, "%Y-%m-%d").date()
-        
-        if recovery_date < failure_date:
-            return ""
-            
-        downtime_days = (recovery_date - failure_date).days
-        return f"{downtime_days} дней"
-    except (ValueError, TypeError):
-        return ""
+def calculate_downtime(date_failure: Optional[date], date_recovery: Optional[date]) -> Optional[int]:
+    """Вычисляем время простоя в днях"""
+    if not date_failure or not date_recovery or date_recovery < date_failure:
+        return None
+    return (date_recovery - date_failure).days
+
+
+def format_downtime(days: Optional[int]) -> str:
+    return f"{days} дней" if days is not None else ""
+
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d").date()
 
 
 class ComplaintCreateRequest(BaseModel):
@@ -72,216 +95,344 @@ class ComplaintCreateRequest(BaseModel):
     date_recovery: Optional[str] = Field(
         None, description="Дата восстановления (YYYY-MM-DD)"
     )
-    equipment_downtime: Optional[str] = Field("", description="Время простоя техники")
+    equipment_downtime: Optional[str] = Field(
+        "", description="Не используется: время простоя вычисляется по датам"
+    )
     service_company_id: int = Field(..., description="ID сервисной компании")
 
-    @field_validator('date_recovery')
-    @classmethod
-    def validate_dates(cls, v, info):
-        """Валидация: дата восстановления не может быть раньше даты отказа"""
-        if v:
-            data = info.data
-            if 'date_of_failure' in data and data['date_of_failure']:
-                try:
-                    failure_date = datetime.strptime(data['date_of_failure'], "%Y-%m-%d").date()
-                    recovery_date = datetime.strptime(v, "%Y-%m-%d").date()
-                    
-                    if recovery_date < failure_date:
-                        raise ValueError("Дата восстановления не может быть раньше даты отказа")
-                except (ValueError, TypeError):
-                    pass
-        return v
-
-    @field_validator('equipment_downtime')
-    @classmethod
-    def calculate_equipment_downtime(cls, v, info):
-        """Автоматически вычисляет время простоя"""
-        data = info.data
-        date_failure = data.get('date_of_failure')
-        date_recovery = data.get('date_recovery')
-        
-        if date_failure and date_recovery:
-            return calculate_downtime(date_failure, date_recovery)
-        return v or ""
-
-
-@router.get("", response_model=List[ComplaintResponse])
-async def get_complaints(db: AsyncSession = Depends(get_db)):
-    try:
-        result = await db.execute(
-            select(ComplaintModel).options(
-                selectinload(ComplaintModel.car).selectinload(CarModel.vehicle_model),
-                selectinload(ComplaintModel.node_failure),
-                selectinload(ComplaintModel.recovery_method),
-                selectinload(ComplaintModel.service_company),
-            )
-        )
-        complaints = result.scalars().all()
-
-        response_data = []
-        for complaint in complaints:
-            # Пересчитываем downtime при получении данных
-            downtime = calculate_downtime(
-                complaint.date_of_failure, 
-                complaint.date_recovery
-            ) if complaint.date_recovery else complaint.equipment_downtime or ""
-
-            response_data.append(
-                {
-                    "id": complaint.id,
-                    "car_id": complaint.car_id,
-                    "vin": complaint.car.vin if complaint.car else "",
-                    "date_of_failure": complaint.date_of_failure,
-                    "operating_time": complaint.operating_time.isoformat()
-                    if hasattr(complaint.operating_time, "isoformat")
-                    else str(complaint.operating_time or ""),
-                    "node_failure_id": complaint.node_failure_id,
-                    "node_failure": complaint.node_failure.name
-                    if complaint.node_failure
-                    else "",
-                    "description_failure": complaint.description_failure,
-                    "recovery_method_id": complaint.recovery_method_id,
-                    "recovery_method": complaint.recovery_method.name
-                    if complaint.recovery_method
-                    else "",
-                    "used_spare_parts": complaint.used_spare_parts,
-                    "date_recovery": complaint.date_recovery,
-                    "equipment_downtime": downtime, 
-                    "service_company_id": complaint.service_company_id,
-                    "service_company": complaint.service_company.name
-                    if complaint.service_company
-                    else "",
-                    "vehicle_model": complaint.car.vehicle_model.name
-                    if complaint.car and complaint.car.vehicle_model
-                    else "",
-                }
-            )
 
-        return response_data
-    except Exception as e:
+def _complaint_to_dict(complaint: ComplaintModel) -> dict:
+    return {
+        "id": complaint.id,
+        "car_id": complaint.car_id,
+        "vin": complaint.car.vin if complaint.car else "",
+        "date_of_failure": complaint.date_of_failure.isoformat(),
+        "operating_time": str(complaint.operating_time)
+        if complaint.operating_time is not None
+        else "",
+        "node_failure_id": complaint.node_failure_id,
+        "node_failure": complaint.node_failure.name
+        if complaint.node_failure
+        else "",
+        "description_failure": complaint.description_failure,
+        "recovery_method_id": complaint.recovery_method_id,
+        "recovery_method": complaint.recovery_method.name
+        if complaint.recovery_method
+        else "",
+        "used_spare_parts": complaint.used_spare_parts,
+        "date_recovery": complaint.date_recovery.isoformat()
+        if complaint.date_recovery
+        else None,
+        "equipment_downtime": format_downtime(complaint.equipment_downtime),
+        "equipment_downtime_days": complaint.equipment_downtime,
+        "service_company_id": complaint.service_company_id,
+        "service_company": complaint.service_company.name
+        if complaint.service_company
+        else "",
+        "vehicle_model": complaint.car.vehicle_model.name
+        if complaint.car and complaint.car.vehicle_model
+        else "",
+    }
+
+
+# Таблицы, от которых зависит содержимое списка рекламаций (для ETag)
+COMPLAINT_LIST_TABLES = (
+    ComplaintModel,
+    CarModel,
+    FailureNodeModel,
+    RecoveryMethodModel,
+    ServiceCompanyModel,
+    VehicleModel,
+)
+
+COMPLAINT_SORT_FIELDS = {
+    "id": ComplaintModel.id,
+    "date_of_failure": ComplaintModel.date_of_failure,
+}
+
+
+class ComplaintFilters:
+    """Серверные фильтры списка рекламаций"""
+
+    def __init__(
+        self,
+        car_id: Optional[int] = None,
+        node_failure_id: Optional[int] = None,
+        recovery_method_id: Optional[int] = None,
+        service_company_id: Optional[int] = None,
+        date_of_failure_from: Optional[date] = Query(None, description="Дата отказа с"),
+        date_of_failure_to: Optional[date] = Query(None, description="Дата отказа по"),
+        date_recovery_from: Optional[date] = Query(None, description="Дата восстановления с"),
+        date_recovery_to: Optional[date] = Query(None, description="Дата восстановления по"),
+        operating_time_from: Optional[int] = Query(None, description="Наработка от, м/час"),
+        operating_time_to: Optional[int] = Query(None, description="Наработка до, м/час"),
+        downtime_from: Optional[int] = Query(None, description="Простой от, дней"),
+        downtime_to: Optional[int] = Query(None, description="Простой до, дней"),
+    ):
+        self.fk = {
+            ComplaintModel.car_id: car_id,
+            ComplaintModel.node_failure_id: node_failure_id,
+            ComplaintModel.recovery_method_id: recovery_method_id,
+            ComplaintModel.service_company_id: service_company_id,
+        }
+        self.ranges = [
+            (ComplaintModel.date_of_failure, date_of_failure_from, date_of_failure_to),
+            (ComplaintModel.date_recovery, date_recovery_from, date_recovery_to),
+            (ComplaintModel.operating_time, operating_time_from, operating_time_to),
+            (ComplaintModel.equipment_downtime, downtime_from, downtime_to),
+        ]
+
+    def apply(self, stmt):
+        for column, value in self.fk.items():
+            if value is not None:
+                stmt = stmt.where(column == value)
+        for column, value_from, value_to in self.ranges:
+            if value_from is not None:
+                stmt = stmt.where(column >= value_from)
+            if value_to is not None:
+                stmt = stmt.where(column <= value_to)
+        return stmt
+
+
+def _complaints_query():
+    return select(ComplaintModel).options(
+        selectinload(ComplaintModel.car).selectinload(CarModel.vehicle_model),
+        selectinload(ComplaintModel.node_failure),
+        selectinload(ComplaintModel.recovery_method),
+        selectinload(ComplaintModel.service_company),
+    )
+
+
+# Потоковая выгрузка рекламаций
+@router.get("/export")
+async def export_complaints(
+    filters: ComplaintFilters = Depends(),
+    fmt: ExportFormat = Query("csv", alias="format", description="csv или ndjson"),
+    user: CurrentUser = Depends(get_current_user),
+):
+    stmt = scope_car_records(filters.apply(_complaints_query()), ComplaintModel, user).order_by(
+        ComplaintModel.id
+    )
+    return export_response(stmt, _complaint_to_dict, list(ComplaintResponse.model_fields), fmt, "complaints")
+
+
+async def _export_complaints_job(job: JobContext):
+    filters = build_filters(ComplaintFilters, job.params["filters"])
+    stmt = scope_car_records(
+        filters.apply(_complaints_query()), ComplaintModel, job.user
+    ).order_by(ComplaintModel.id)
+    await job.export(
+        stmt,
+        ComplaintModel.id,
+        _complaint_to_dict,
+        list(ComplaintResponse.model_fields),
+        job.params["format"],
+    )
+
+
+job_runner.register("complaints_export", _export_complaints_job)
+
+
+# Выгрузка рекламаций фоновой задачей: результат — через /api/jobs/{id}
+@router.post("/export", response_model=JobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def submit_complaints_export(
+    request: Request,
+    response: Response,
+    filters: ComplaintFilters = Depends(),
+    fmt: ExportFormat = Query("csv", alias="format", description="csv или ndjson"),
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    params = {"filters": filter_params(ComplaintFilters, request), "format": fmt}
+    job = await job_runner.submit(db, "complaints_export", params, user)
+    return accepted(job, response)
+
+
+@router.get(
+    "",
+    response_model=List[ComplaintResponse],
+    dependencies=[Depends(scoped_table_etag(*COMPLAINT_LIST_TABLES))],
+)
+async def get_complaints(
+    response: Response,
+    filters: ComplaintFilters = Depends(),
+    sort: str = Query("id", description="Поле сортировки, '-' в начале — по убыванию"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: Optional[int] = Depends(page_limit),
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    sort_key, sort_column, descending = parse_sort(sort, COMPLAINT_SORT_FIELDS)
+    stmt = apply_keyset(
+        scope_car_records(filters.apply(_complaints_query()), ComplaintModel, user),
+        sort_column,
+        ComplaintModel.id,
+        descending,
+        cursor,
+        limit,
+    )
+    try:
+        result = await db.execute(stmt)
+    except SQLAlchemyError:
+        logger.exception("Ошибка при получении списка рекламаций")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при получении списка рекламаций: {str(e)}",
+            detail="Ошибка при получении списка рекламаций",
         )
+    complaints = finalize_page(result.scalars().all(), limit, sort_key, response)
+    return list_response(
+        [_complaint_to_dict(complaint) for complaint in complaints], response
+    )
 
 
 @router.post("", response_model=ComplaintResponse, status_code=status.HTTP_201_CREATED)
 async def create_complaint(
-    payload: ComplaintCreateRequest, db: AsyncSession = Depends(get_db)
+    payload: ComplaintCreateRequest,
+    user: CurrentUser = Depends(record_writers),
+    db: AsyncSession = Depends(get_db),
 ):
     # Проверка существования связанных объектов
     car = await db.get(CarModel, payload.car_id)
-    if car is None:
+    if car is None or not can_access(user, car.client_id, car.service_company_id):
+        # Чужая машина неотличима от несуществующей
         raise HTTPException(status_code=422, detail="Указан несуществующий car_id")
+    if not can_write_for(user, payload.service_company_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Сервисная компания может вносить только свои записи",
+        )
 
-    node_failure = await db.get(FailureNodeModel, payload.node_failure_id)
+    node_failure = await reference_cache.resolve(
+        db, FailureNodeModel, payload.node_failure_id
+    )
     if node_failure is None:
         raise HTTPException(
             status_code=422, detail="Указан несуществующий node_failure_id"
         )
 
-    recovery_method = await db.get(RecoveryMethodModel, payload.recovery_method_id)
+    recovery_method = await reference_cache.resolve(
+        db, RecoveryMethodModel, payload.recovery_method_id
+    )
     if recovery_method is None:
         raise HTTPException(
             status_code=422, detail="Указан несуществующий recovery_method_id"
         )
 
-    service_company = await db.get(ServiceCompanyModel, payload.service_company_id)
+    service_company = await reference_cache.resolve(
+        db, ServiceCompanyModel, payload.service_company_id
+    )
     if service_company is None:
         raise HTTPException(
             status_code=422, detail="Указана несуществующая сервисная компания"
         )
 
     # Дополнительная валидация дат
-    if payload.date_recovery:
-        try:
-            failure_date = datetime.strptime(payload.date_of_failure, "%Y-%m-%d").date()
-            recovery_date = datetime.strptime(payload.date_recovery, "%Y-%m-%d").date()
-            
-            if recovery_date < failure_date:
-                raise HTTPException(
-                    status_code=422,
-                    detail="Дата восстановления не может быть раньше даты отказа"
-                )
-        except ValueError:
-            raise HTTPException(
-                status_code=422,
-                detail="Неверный формат даты. Используйте YYYY-MM-DD"
-            )
-
     try:
-        car_result = await db.execute(
-            select(CarModel)
-            .options(selectinload(CarModel.vehicle_model))
-            .where(CarModel.id == payload.car_id)
+        failure_date = _parse_date(payload.date_of_failure)
+        recovery_date = _parse_date(payload.date_recovery)
+    except ValueError:
+        raise HTTPException(
+            status_code=422,
+            detail="Неверный формат даты. Используйте YYYY-MM-DD"
         )
-        car = car_result.scalar_one_or_none()
-
-        if not car:
-            raise HTTPException(status_code=404, detail="Car not found")
-
-        # Вычисляем дни простоя техники
-        equipment_downtime = calculate_downtime(
-            payload.date_of_failure, 
-            payload.date_recovery
-        ) if payload.date_recovery else ""
-
-        new_complaint = ComplaintModel(
-            car_id=payload.car_id,
-            date_of_failure=payload.date_of_failure,
-            operating_time=payload.operating_time,
-            node_failure_id=payload.node_failure_id,
-            description_failure=payload.description_failure or "",
-            recovery_method_id=payload.recovery_method_id,
-            used_spare_parts=payload.used_spare_parts or "",
-            date_recovery=payload.date_recovery or None,
-            equipment_downtime=equipment_downtime,  # Сохраняем вычисленное значение
-            service_company_id=payload.service_company_id,
-            vehicle_model=car.vehicle_model.name if car.vehicle_model else "",
+    if failure_date is None:
+        raise HTTPException(status_code=422, detail="Поле 'date_of_failure' обязательно")
+    if recovery_date and recovery_date < failure_date:
+        raise HTTPException(
+            status_code=422,
+            detail="Дата восстановления не может быть раньше даты отказа"
         )
 
-        db.add(new_complaint)
-        await db.flush()
+    try:
+        operating_time = int(payload.operating_time)
+    except ValueError:
+        raise HTTPException(
+            status_code=422, detail="Наработка должна быть целым числом м/час"
+        )
 
-        result = await db.execute(
-            select(ComplaintModel)
-            .options(
-                selectinload(ComplaintModel.car).selectinload(CarModel.vehicle_model),
-                selectinload(ComplaintModel.node_failure),
-                selectinload(ComplaintModel.recovery_method),
-                selectinload(ComplaintModel.service_company),
+    try:
+        # Простой вычисляется один раз при записи
+        equipment_downtime = calculate_downtime(failure_date, recovery_date)
+
+        async def add_complaint(session: AsyncSession) -> ComplaintModel:
+            complaint = ComplaintModel(
+                car_id=payload.car_id,
+                date_of_failure=failure_date,
+                operating_time=operating_time,
+                node_failure_id=payload.node_failure_id,
+                description_failure=payload.description_failure or "",
+                recovery_method_id=payload.recovery_method_id,
+                used_spare_parts=payload.used_spare_parts or "",
+                date_recovery=recovery_date,
+                equipment_downtime=equipment_downtime,
+                service_company_id=payload.service_company_id,
+                vehicle_model=reference_cache.name(VehicleModel, car.vehicle_model_id),
             )
-            .where(ComplaintModel.id == new_complaint.id)
+            session.add(complaint)
+            await record_complaints(
+                session,
+                [
+                    {
+                        "node_failure_id": payload.node_failure_id,
+                        "recovery_method_id": payload.recovery_method_id,
+                        "service_company_id": payload.service_company_id,
+                        "vehicle_model_id": car.vehicle_model_id,
+                        "equipment_downtime": equipment_downtime,
+                    }
+                ],
+            )
+            await session.flush()
+            return complaint
+
+        new_complaint = await write_queue.run(db, add_complaint)
+        event_broker.publish(
+            "complaint",
+            {"action": "created", "id": new_complaint.id, "car_id": car.id, "vin": car.vin},
+            record_audience(car, new_complaint),
         )
-        complaint = result.scalar_one()
-
-        await db.commit()
-
         return {
-            "id": complaint.id,
-            "car_id": complaint.car_id,
+            "id": new_complaint.id,
+            "car_id": new_complaint.car_id,
             "vin": car.vin,
-            "date_of_failure": complaint.date_of_failure,
-            "operating_time": complaint.operating_time,
-            "node_failure_id": complaint.node_failure_id,
+            "date_of_failure": failure_date.isoformat(),
+            "operating_time": str(operating_time),
+            "node_failure_id": new_complaint.node_failure_id,
             "node_failure": node_failure.name,
-            "description_failure": complaint.description_failure,
-            "recovery_method_id": complaint.recovery_method_id,
+            "description_failure": new_complaint.description_failure,
+            "recovery_method_id": new_complaint.recovery_method_id,
             "recovery_method": recovery_method.name,
-            "used_spare_parts": complaint.used_spare_parts,
-            "date_recovery": complaint.date_recovery,
-            "equipment_downtime": equipment_downtime,  # Возвращаем вычисленное значение
+            "used_spare_parts": new_complaint.used_spare_parts,
+            "date_recovery": recovery_date.isoformat() if recovery_date else None,
+            "equipment_downtime": format_downtime(equipment_downtime),
+            "equipment_downtime_days": equipment_downtime,
             "service_company": service_company.name,
-            "service_company_id": complaint.service_company_id,
-            "vehicle_model": complaint.vehicle_model,
+            "service_company_id": new_complaint.service_company_id,
+            "vehicle_model": new_complaint.vehicle_model,
         }
 
-    except Exception as e:
+    except HTTPException:
+        raise
+    except Exception:
         await db.rollback()
-        import traceback
-
-        error_trace = traceback.format_exc()
+        # Подробности — в журнал сервера, клиенту они не нужны
+        logger.exception("Ошибка при создании рекламации")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при создании рекламации: {str(e)}\n{error_trace}",
-        )
\ No newline at end of file
+            detail="Ошибка при создании рекламации",
+        )
+
+
+# Импорт истории рекламаций из CSV
+@router.post("/import")
+async def import_complaints(
+    file: UploadFile = File(..., description="CSV-файл"),
+    user: CurrentUser = Depends(record_writers),
+    db: AsyncSession = Depends(get_db),
+):
+    stream = open_upload(file.file)
+    try:
+        return await import_csv(db, "complaints", stream, user)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    finally:
+        stream.detach()
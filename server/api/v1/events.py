@@ -0,0 +1,74 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from events import EVENTS_MAX_SECONDS, EVENTS_PING_SECONDS, event_broker
+from security import CurrentUser, get_current_user, get_stream_user, issue_stream_ticket
+
+router = APIRouter(tags=["events"])
+
+
+class StreamTicket(BaseModel):
+    ticket: str = Field(..., description="Параметр ticket для GET /api/events")
+    expires_at: int = Field(..., description="Действует до (unix time)")
+
+
+async def _stream(user: CurrentUser, last_event_id: Optional[str]):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + EVENTS_MAX_SECONDS
+    # Подписка создаётся, только когда поток действительно начал отдаваться:
+    # если клиент отключился раньше, подписчик не остаётся висеть у брокера
+    subscriber = event_broker.subscribe(user, last_event_id)
+    try:
+        # Пауза перед переподключением EventSource, мс
+        yield b"retry: 3000\n\n"
+        while True:
+            timeout = min(EVENTS_PING_SECONDS, deadline - loop.time())
+            if timeout <= 0:
+                break
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                # StreamingResponse сам отменяет поток при отключении клиента,
+                # а запись пинга в оборванное соединение завершает его
+                yield b": ping\n\n"
+                continue
+            if event is None:
+                # Клиент не успевал читать: он переподключится с Last-Event-ID
+                break
+            yield event.encoded
+    finally:
+        event_broker.unsubscribe(subscriber)
+
+
+# Билет для EventSource: браузер не передаёт заголовок Authorization, а
+# токен входа в URL попал бы в журналы прокси
+@router.post("/events/ticket", response_model=StreamTicket)
+async def create_stream_ticket(user: CurrentUser = Depends(get_current_user)):
+    ticket, expires_at = issue_stream_ticket(user)
+    return {"ticket": ticket, "expires_at": expires_at}
+
+
+# Поток изменений машин, ТО, рекламаций и справочников (Server-Sent Events)
+@router.get("/events")
+async def get_events(
+    last_event_id: Optional[str] = Header(None),
+    last_event_id_param: Optional[str] = Query(
+        None,
+        alias="last_event_id",
+        description="Last-Event-ID для нового EventSource (заголовок он задать не может)",
+    ),
+    user: CurrentUser = Depends(get_stream_user),
+):
+    return StreamingResponse(
+        _stream(user, last_event_id or last_event_id_param),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx не должен копить поток в буфере
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -0,0 +1,206 @@
+import heapq
+import operator
+from datetime import date
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from pydantic import BaseModel, Field
+from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import get_read_db
+from models import (
+    CarModel,
+    ComplaintModel,
+    FailureNodeModel,
+    RecoveryMethodModel,
+    ServiceCompanyModel,
+    TechMaintenanceExtendModel,
+    TechMaintenanceModel,
+    UserRole,
+)
+from pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, parse_sort
+from reference_cache import reference_cache
+from security import CurrentUser, get_current_user, scope_car_records, scope_cars
+from table_versions import scoped_table_etag
+
+router = APIRouter(prefix="/cars", tags=["cars"])
+
+EventKind = Literal["maintenance", "complaint"]
+
+HISTORY_SORT_FIELDS = {"date": "date"}
+DEFAULT_HISTORY_PAGE_SIZE = 50
+
+# Таблицы, от которых зависит история машины (для ETag)
+HISTORY_TABLES = (
+    CarModel,
+    TechMaintenanceExtendModel,
+    ComplaintModel,
+    TechMaintenanceModel,
+    FailureNodeModel,
+    RecoveryMethodModel,
+    ServiceCompanyModel,
+)
+
+
+class HistoryEvent(BaseModel):
+    kind: EventKind = Field(..., description="ТО или рекламация")
+    id: int = Field(..., description="ID записи ТО или рекламации")
+    date: str = Field(..., description="Дата ТО или дата отказа")
+    service_company_id: int
+    service_company: str
+    # ТО
+    maintenance_type_id: Optional[int] = None
+    maintenance_type: Optional[str] = None
+    order_number: Optional[str] = None
+    order_date: Optional[str] = None
+    # Рекламация
+    operating_time: Optional[int] = None
+    node_failure_id: Optional[int] = None
+    node_failure: Optional[str] = None
+    description_failure: Optional[str] = None
+    recovery_method_id: Optional[int] = None
+    recovery_method: Optional[str] = None
+    used_spare_parts: Optional[str] = None
+    date_recovery: Optional[str] = None
+    equipment_downtime_days: Optional[int] = None
+
+
+def _maintenance_event(m) -> dict:
+    return {
+        "kind": "maintenance",
+        "id": m.id,
+        "date": m.maintenance_date.isoformat(),
+        "service_company_id": m.service_company_id,
+        "service_company": reference_cache.name(ServiceCompanyModel, m.service_company_id),
+        "maintenance_type_id": m.maintenance_type_id,
+        "maintenance_type": reference_cache.name(TechMaintenanceModel, m.maintenance_type_id),
+        "order_number": m.order_number,
+        "order_date": m.order_date.isoformat() if m.order_date else None,
+    }
+
+
+def _complaint_event(c) -> dict:
+    return {
+        "kind": "complaint",
+        "id": c.id,
+        "date": c.date_of_failure.isoformat(),
+        "service_company_id": c.service_company_id,
+        "service_company": reference_cache.name(ServiceCompanyModel, c.service_company_id),
+        "operating_time": c.operating_time,
+        "node_failure_id": c.node_failure_id,
+        "node_failure": reference_cache.name(FailureNodeModel, c.node_failure_id),
+        "description_failure": c.description_failure,
+        "recovery_method_id": c.recovery_method_id,
+        "recovery_method": reference_cache.name(RecoveryMethodModel, c.recovery_method_id),
+        "used_spare_parts": c.used_spare_parts,
+        "date_recovery": c.date_recovery.isoformat() if c.date_recovery else None,
+        "equipment_downtime_days": c.equipment_downtime,
+    }
+
+
+# Вид записи -> (модель, столбец даты, преобразование в событие)
+_SOURCES = {
+    "maintenance": (
+        TechMaintenanceExtendModel,
+        TechMaintenanceExtendModel.maintenance_date,
+        _maintenance_event,
+    ),
+    "complaint": (ComplaintModel, ComplaintModel.date_of_failure, _complaint_event),
+}
+
+
+def _parse_cursor(cursor: str):
+    sort_value, last_id = decode_cursor(cursor)
+    try:
+        event_date, kind = sort_value
+        if kind not in _SOURCES:
+            raise ValueError(kind)
+        return date.fromisoformat(event_date), kind, last_id
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор"
+        )
+
+
+def _after_cursor(kind: str, date_column, id_column, cursor, descending: bool):
+    """Условие «после курсора» в порядке (дата, вид, id) для одной таблицы.
+
+    Условие по дате выделено отдельно, чтобы SQLite искал по индексу
+    (car_id, дата), а не перебирал всю историю машины.
+    """
+    cursor_date, cursor_kind, last_id = cursor
+    before = operator.lt if descending else operator.gt
+    if kind == cursor_kind:
+        return or_(
+            before(date_column, cursor_date),
+            and_(date_column == cursor_date, before(id_column, last_id)),
+        )
+    if before(kind, cursor_kind):
+        return date_column <= cursor_date if descending else date_column >= cursor_date
+    return before(date_column, cursor_date)
+
+
+# История машины: ТО и рекламации одной лентой по дате
+@router.get(
+    "/{vin}/history",
+    response_model=List[HistoryEvent],
+    dependencies=[Depends(scoped_table_etag(*HISTORY_TABLES))],
+)
+async def get_car_history(
+    vin: str,
+    response: Response,
+    sort: str = Query("-date", description="'date' — от старых к новым, '-date' — от новых"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: int = Query(
+        DEFAULT_HISTORY_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"
+    ),
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    _, _, descending = parse_sort(sort, HISTORY_SORT_FIELDS)
+    position = _parse_cursor(cursor) if cursor else None
+
+    # Записи видны по тем же правилам, что в /api/maintenance и /api/complaints
+    # (scope_car_records): сервису — свои записи на любой машине, поэтому
+    # машину по VIN ограничивает только клиенту — его машинами
+    car_query = select(CarModel.id).where(CarModel.vin == vin)
+    if user.role == UserRole.client:
+        car_query = scope_cars(car_query, user)
+    result = await db.execute(car_query)
+    car_id = result.scalar_one_or_none()
+    if car_id is None:
+        raise HTTPException(status_code=404, detail="Машина с указанным VIN не найдена")
+
+    # Из каждой таблицы берётся не больше limit + 1 записей в нужном порядке
+    # (его даёт индекс (car_id, дата)), затем две ленты сливаются
+    streams = []
+    for kind, (model_class, date_column, to_event) in _SOURCES.items():
+        order = (date_column, model_class.id)
+        stmt = scope_car_records(
+            select(model_class)
+            .where(model_class.car_id == car_id)
+            .order_by(*(c.desc() if descending else c.asc() for c in order))
+            .limit(limit + 1),
+            model_class,
+            user,
+        )
+        if position is not None:
+            stmt = stmt.where(
+                _after_cursor(kind, date_column, model_class.id, position, descending)
+            )
+        result = await db.execute(stmt)
+        streams.append([
+            ((getattr(row, date_column.key), kind, row.id), row, to_event)
+            for row in result.scalars().all()
+        ])
+
+    merged = list(heapq.merge(*streams, key=lambda item: item[0], reverse=descending))
+    page = merged[:limit]
+    if len(merged) > limit:
+        (last_date, last_kind, last_id), _, _ = page[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            [last_date.isoformat(), last_kind], last_id
+        )
+    return [to_event(row) for _, row, to_event in page]
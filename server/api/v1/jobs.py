@@ -0,0 +1,80 @@
+from pathlib import Path
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import get_db, get_read_db
+from export import MEDIA_TYPES
+from jobs import JOBS_DIR, SUCCEEDED, JobStatus, job_runner, job_status
+from models import JobModel
+from security import CurrentUser, get_current_user
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+async def _own_job(db: AsyncSession, job_id: int, user: CurrentUser) -> JobModel:
+    # Чужая задача неотличима от несуществующей
+    job = await db.get(JobModel, job_id)
+    if job is None or job.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
+
+
+# Задачи текущего пользователя, новые первыми
+@router.get("", response_model=List[JobStatus])
+async def list_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    result = await db.execute(
+        select(JobModel)
+        .where(JobModel.user_id == user.id)
+        .order_by(JobModel.id.desc())
+        .limit(limit)
+    )
+    return [job_status(job) for job in result.scalars().all()]
+
+
+# Статус и ход выполнения: клиент опрашивает его, пока задача не завершится
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job(
+    job_id: int,
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return job_status(await _own_job(db, job_id, user))
+
+
+@router.post("/{job_id}/cancel", response_model=JobStatus)
+async def cancel_job(
+    job_id: int,
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    job = await _own_job(db, job_id, user)
+    if not await job_runner.cancel(db, job):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Задача уже завершена")
+    await db.refresh(job)
+    return job_status(job)
+
+
+@router.get("/{job_id}/result")
+async def get_job_result(
+    job_id: int,
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    job = await _own_job(db, job_id, user)
+    if job.status != SUCCEEDED or not job.result_file:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Результат ещё не готов")
+    path = JOBS_DIR / job.result_file
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Файл результата удалён")
+    fmt = Path(job.result_file).suffix.lstrip(".")
+    return FileResponse(
+        path, media_type=MEDIA_TYPES.get(fmt), filename=f"{job.kind}-{job.id}.{fmt}"
+    )
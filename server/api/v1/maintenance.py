@@ -1,13 +1,33 @@
+import logging
 from typing import List, Optional
 from datetime import date as _date
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
-from database import get_db
+from analytics import record_maintenance
+from database import get_db, get_read_db
+from events import event_broker, record_audience
+from export import ExportFormat, export_response
+from fast_json import list_response
+from importer import import_csv, open_upload
+from jobs import JobContext, JobStatus, accepted, build_filters, filter_params, job_runner
+from reference_cache import reference_cache
+from pagination import apply_keyset, finalize_page, page_limit, parse_sort
+from security import (
+    CurrentUser,
+    can_access,
+    can_write_for,
+    get_current_user,
+    record_writers,
+    scope_car_records,
+)
+from table_versions import scoped_table_etag
+from write_queue import write_queue
 from models import (
     TechMaintenanceExtendModel,
     CarModel,
@@ -17,6 +37,8 @@ from models import (
 
 router = APIRouter(prefix="/maintenance", tags=["maintenance"])
 
+logger = logging.getLogger("silant.api")
+
 
 class MaintenanceResponse(BaseModel):
     id: int
@@ -31,47 +53,163 @@ class MaintenanceResponse(BaseModel):
     service_company_id: int
 
 
-@router.get("", response_model=List[MaintenanceResponse])
-async def get_maintenance(db: AsyncSession = Depends(get_db)):
-    try:
-        result = await db.execute(
-            select(TechMaintenanceExtendModel).options(
-                selectinload(TechMaintenanceExtendModel.car),
-                selectinload(TechMaintenanceExtendModel.maintenance),
-                selectinload(TechMaintenanceExtendModel.service_company),
-            )
-        )
-        items = result.scalars().all()
+def _maintenance_to_dict(m: TechMaintenanceExtendModel) -> dict:
+    return {
+        "id": m.id,
+        "car_id": m.car_id,
+        "vin": m.car.vin if m.car else "",
+        "maintenance_type_id": m.maintenance.id if m.maintenance else None,
+        "maintenance_type": m.maintenance.name if m.maintenance else "",
+        "maintenance_date": m.maintenance_date.isoformat()
+        if getattr(m, "maintenance_date", None)
+        else None,
+        "order_number": getattr(m, "order_number", None),
+        "order_date": m.order_date.isoformat()
+        if getattr(m, "order_date", None)
+        else None,
+        "service_company": m.service_company.name
+        if m.service_company
+        else "",
+        "service_company_id": m.service_company.id if m.service_company else None,
+    }
+
+
+# Таблицы, от которых зависит содержимое списка ТО (для ETag)
+MAINTENANCE_LIST_TABLES = (
+    TechMaintenanceExtendModel,
+    CarModel,
+    TechMaintenanceModel,
+    ServiceCompanyModel,
+)
+
+MAINTENANCE_SORT_FIELDS = {
+    "id": TechMaintenanceExtendModel.id,
+    "maintenance_date": TechMaintenanceExtendModel.maintenance_date,
+    "order_date": TechMaintenanceExtendModel.order_date,
+}
+
+
+class MaintenanceFilters:
+    """Серверные фильтры списка ТО"""
+
+    def __init__(
+        self,
+        car_id: Optional[int] = None,
+        maintenance_type_id: Optional[int] = None,
+        service_company_id: Optional[int] = None,
+        maintenance_date_from: Optional[_date] = Query(None, description="Дата ТО с"),
+        maintenance_date_to: Optional[_date] = Query(None, description="Дата ТО по"),
+        order_date_from: Optional[_date] = Query(None, description="Дата заказ-наряда с"),
+        order_date_to: Optional[_date] = Query(None, description="Дата заказ-наряда по"),
+    ):
+        self.fk = {
+            TechMaintenanceExtendModel.car_id: car_id,
+            TechMaintenanceExtendModel.maintenance_type_id: maintenance_type_id,
+            TechMaintenanceExtendModel.service_company_id: service_company_id,
+        }
+        self.ranges = [
+            (TechMaintenanceExtendModel.maintenance_date, maintenance_date_from, maintenance_date_to),
+            (TechMaintenanceExtendModel.order_date, order_date_from, order_date_to),
+        ]
+
+    def apply(self, stmt):
+        for column, value in self.fk.items():
+            if value is not None:
+                stmt = stmt.where(column == value)
+        for column, date_from, date_to in self.ranges:
+            if date_from is not None:
+                stmt = stmt.where(column >= date_from)
+            if date_to is not None:
+                stmt = stmt.where(column <= date_to)
+        return stmt
+
+
+def _maintenance_query():
+    return select(TechMaintenanceExtendModel).options(
+        selectinload(TechMaintenanceExtendModel.car),
+        selectinload(TechMaintenanceExtendModel.maintenance),
+        selectinload(TechMaintenanceExtendModel.service_company),
+    )
+
+
+# Потоковая выгрузка ТО
+@router.get("/export")
+async def export_maintenance(
+    filters: MaintenanceFilters = Depends(),
+    fmt: ExportFormat = Query("csv", alias="format", description="csv или ndjson"),
+    user: CurrentUser = Depends(get_current_user),
+):
+    stmt = scope_car_records(filters.apply(_maintenance_query()), TechMaintenanceExtendModel, user).order_by(
+        TechMaintenanceExtendModel.id
+    )
+    return export_response(stmt, _maintenance_to_dict, list(MaintenanceResponse.model_fields), fmt, "maintenance")
+
+
+async def _export_maintenance_job(job: JobContext):
+    filters = build_filters(MaintenanceFilters, job.params["filters"])
+    stmt = scope_car_records(
+        filters.apply(_maintenance_query()), TechMaintenanceExtendModel, job.user
+    ).order_by(TechMaintenanceExtendModel.id)
+    await job.export(
+        stmt,
+        TechMaintenanceExtendModel.id,
+        _maintenance_to_dict,
+        list(MaintenanceResponse.model_fields),
+        job.params["format"],
+    )
+
+
+job_runner.register("maintenance_export", _export_maintenance_job)
 
-        data: List[dict] = []
-        for m in items:
-            data.append(
-                {
-                    "id": m.id,
-                    "car_id": m.car_id,
-                    "vin": m.car.vin if m.car else "",
-                    "maintenance_type_id": m.maintenance.id if m.maintenance else None,
-                    "maintenance_type": m.maintenance.name if m.maintenance else "",
-                    "maintenance_date": m.maintenance_date.isoformat()
-                    if getattr(m, "maintenance_date", None)
-                    else None,
-                    "order_number": getattr(m, "order_number", None),
-                    "order_date": m.order_date.isoformat()
-                    if getattr(m, "order_date", None)
-                    else None,
-                    "service_company": m.service_company.name
-                    if m.service_company
-                    else "",
-                    "service_company_id": m.service_company.id if m.service_company else None,
-                }
-            )
 
-        return data
-    except Exception as e:
+# Выгрузка ТО фоновой задачей: результат — через /api/jobs/{id}
+@router.post("/export", response_model=JobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def submit_maintenance_export(
+    request: Request,
+    response: Response,
+    filters: MaintenanceFilters = Depends(),
+    fmt: ExportFormat = Query("csv", alias="format", description="csv или ndjson"),
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    params = {"filters": filter_params(MaintenanceFilters, request), "format": fmt}
+    job = await job_runner.submit(db, "maintenance_export", params, user)
+    return accepted(job, response)
+
+
+@router.get(
+    "",
+    response_model=List[MaintenanceResponse],
+    dependencies=[Depends(scoped_table_etag(*MAINTENANCE_LIST_TABLES))],
+)
+async def get_maintenance(
+    response: Response,
+    filters: MaintenanceFilters = Depends(),
+    sort: str = Query("id", description="Поле сортировки, '-' в начале — по убыванию"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: Optional[int] = Depends(page_limit),
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    sort_key, sort_column, descending = parse_sort(sort, MAINTENANCE_SORT_FIELDS)
+    stmt = apply_keyset(
+        scope_car_records(filters.apply(_maintenance_query()), TechMaintenanceExtendModel, user),
+        sort_column,
+        TechMaintenanceExtendModel.id,
+        descending,
+        cursor,
+        limit,
+    )
+    try:
+        result = await db.execute(stmt)
+    except SQLAlchemyError:
+        logger.exception("Ошибка при получении списка ТО")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при получении списка ТО: {str(e)}",
+            detail="Ошибка при получении списка ТО",
         )
+    items = finalize_page(result.scalars().all(), limit, sort_key, response)
+    return list_response([_maintenance_to_dict(m) for m in items], response)
 
 
 class MaintenanceCreateRequest(BaseModel):
@@ -87,20 +225,32 @@ class MaintenanceCreateRequest(BaseModel):
     "", response_model=MaintenanceResponse, status_code=status.HTTP_201_CREATED
 )
 async def create_maintenance(
-    payload: MaintenanceCreateRequest, db: AsyncSession = Depends(get_db)
+    payload: MaintenanceCreateRequest,
+    user: CurrentUser = Depends(record_writers),
+    db: AsyncSession = Depends(get_db),
 ):
     # Проверка существования связанных объектов
     car = await db.get(CarModel, payload.car_id)
-    if car is None:
+    if car is None or not can_access(user, car.client_id, car.service_company_id):
+        # Чужая машина неотличима от несуществующей
         raise HTTPException(status_code=422, detail="Указан несуществующий car_id")
+    if not can_write_for(user, payload.service_company_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Сервисная компания может вносить только свои записи",
+        )
 
-    maintenance_type = await db.get(TechMaintenanceModel, payload.maintenance_type_id)
+    maintenance_type = await reference_cache.resolve(
+        db, TechMaintenanceModel, payload.maintenance_type_id
+    )
     if maintenance_type is None:
         raise HTTPException(
             status_code=422, detail="Указан несуществующий maintenance_type_id"
         )
 
-    service_company = await db.get(ServiceCompanyModel, payload.service_company_id)
+    service_company = await reference_cache.resolve(
+        db, ServiceCompanyModel, payload.service_company_id
+    )
     if service_company is None:
         raise HTTPException(
             status_code=422, detail="Указан несуществующий service_company_id"
@@ -124,17 +274,34 @@ async def create_maintenance(
             raise HTTPException(status_code=422, detail="Неверный формат order_date")
 
     # Создание записи ТО
-    maintenance = TechMaintenanceExtendModel(
-        car_id=payload.car_id,
-        maintenance_type_id=payload.maintenance_type_id,
-        maintenance_date=maintenance_dt,
-        order_number=payload.order_number or "",
-        order_date=order_dt,
-        service_company_id=payload.service_company_id,
+    async def add_maintenance(session: AsyncSession) -> TechMaintenanceExtendModel:
+        maintenance = TechMaintenanceExtendModel(
+            car_id=payload.car_id,
+            maintenance_type_id=payload.maintenance_type_id,
+            maintenance_date=maintenance_dt,
+            order_number=payload.order_number or "",
+            order_date=order_dt,
+            service_company_id=payload.service_company_id,
+        )
+        session.add(maintenance)
+        await record_maintenance(
+            session,
+            [
+                {
+                    "maintenance_type_id": payload.maintenance_type_id,
+                    "maintenance_date": maintenance_dt,
+                }
+            ],
+        )
+        await session.flush()
+        return maintenance
+
+    maintenance = await write_queue.run(db, add_maintenance)
+    event_broker.publish(
+        "maintenance",
+        {"action": "created", "id": maintenance.id, "car_id": car.id, "vin": car.vin},
+        record_audience(car, maintenance),
     )
-    db.add(maintenance)
-    await db.commit()
-    await db.refresh(maintenance)
 
     return {
         "id": maintenance.id,
@@ -148,3 +315,19 @@ async def create_maintenance(
         "service_company": service_company.name,
         "service_company_id": service_company.id,
     }
+
+
+# Импорт истории ТО из CSV
+@router.post("/import")
+async def import_maintenance(
+    file: UploadFile = File(..., description="CSV-файл"),
+    user: CurrentUser = Depends(record_writers),
+    db: AsyncSession = Depends(get_db),
+):
+    stream = open_upload(file.file)
+    try:
+        return await import_csv(db, "maintenance", stream, user)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    finally:
+        stream.detach()
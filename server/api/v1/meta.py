@@ -1,16 +1,13 @@
 from fastapi import APIRouter
-from sqlalchemy import text
+from sqlalchemy import inspect
 
-from database import engine
+from database import read_engine
 
 router = APIRouter(tags=["meta"])
 
 
 @router.get("/tables")
 async def get_tables():
-    async with engine.connect() as conn:
-        result = await conn.execute(
-            text("SELECT name FROM sqlite_master WHERE type='table';")
-        )
-        tables = result.fetchall()
-        return {"tables": [table[0] for table in tables]}
+    async with read_engine.connect() as conn:
+        tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+        return {"tables": tables}
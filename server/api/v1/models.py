@@ -5,7 +5,9 @@ from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from database import get_db
+from database import get_db, get_read_db
+from reference_cache import reference_cache
+from table_versions import table_etag
 from models import (
     VehicleModel,
     EngineModel,
@@ -48,15 +50,19 @@ class ModelUpdateRequest(BaseModel):
 
 
 # Модель техники
-@router.get("/vehicle")
-async def list_vehicle_models(db: AsyncSession = Depends(get_db)):
+@router.get("/vehicle", dependencies=[Depends(table_etag(VehicleModel))])
+async def list_vehicle_models(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(VehicleModel))
     items = result.scalars().all()
     return [{"id": m.id, "name": m.name} for m in items]
 
 
-@router.get("/vehicle/{model_id}", response_model=ModelResponse)
-async def get_vehicle_model(model_id: int, db: AsyncSession = Depends(get_db)):
+@router.get(
+    "/vehicle/{model_id}",
+    response_model=ModelResponse,
+    dependencies=[Depends(table_etag(VehicleModel))],
+)
+async def get_vehicle_model(model_id: int, db: AsyncSession = Depends(get_read_db)):
     model = await _get_model_by_id(db, VehicleModel, model_id)
     if not model:
         raise HTTPException(status_code=404, detail="Vehicle model not found")
@@ -77,6 +83,7 @@ async def update_vehicle_model(
         model.description = payload.description
     await db.commit()
     await db.refresh(model)
+    reference_cache.put(VehicleModel, model)
     return {"id": model.id, "name": model.name, "description": model.description}
 
 
@@ -98,19 +105,24 @@ async def delete_vehicle_model(model_id: int, db: AsyncSession = Depends(get_db)
         raise HTTPException(status_code=404, detail="Vehicle model not found")
     await db.delete(model)
     await db.commit()
+    reference_cache.remove(VehicleModel, model_id)
     return {"ok": True}
 
 
 # Модели двигателей
-@router.get("/engine")
-async def list_engine_models(db: AsyncSession = Depends(get_db)):
+@router.get("/engine", dependencies=[Depends(table_etag(EngineModel))])
+async def list_engine_models(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(EngineModel))
     items = result.scalars().all()
     return [{"id": m.id, "name": m.name} for m in items]
 
 
-@router.get("/engine/{model_id}", response_model=ModelResponse)
-async def get_engine_model(model_id: int, db: AsyncSession = Depends(get_db)):
+@router.get(
+    "/engine/{model_id}",
+    response_model=ModelResponse,
+    dependencies=[Depends(table_etag(EngineModel))],
+)
+async def get_engine_model(model_id: int, db: AsyncSession = Depends(get_read_db)):
     model = await _get_model_by_id(db, EngineModel, model_id)
     if not model:
         raise HTTPException(status_code=404, detail="Engine model not found")
@@ -131,6 +143,7 @@ async def update_engine_model(
         model.description = payload.description
     await db.commit()
     await db.refresh(model)
+    reference_cache.put(EngineModel, model)
     return {"id": model.id, "name": model.name, "description": model.description}
 
 
@@ -151,19 +164,24 @@ async def delete_engine_model(model_id: int, db: AsyncSession = Depends(get_db))
         raise HTTPException(status_code=404, detail="Engine model not found")
     await db.delete(model)
     await db.commit()
+    reference_cache.remove(EngineModel, model_id)
     return {"ok": True}
 
 
 # Модели трансмиссии
-@router.get("/transmission")
-async def list_transmission_models(db: AsyncSession = Depends(get_db)):
+@router.get("/transmission", dependencies=[Depends(table_etag(TransmissionModel))])
+async def list_transmission_models(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(TransmissionModel))
     items = result.scalars().all()
     return [{"id": m.id, "name": m.name} for m in items]
 
 
-@router.get("/transmission/{model_id}", response_model=ModelResponse)
-async def get_transmission_model(model_id: int, db: AsyncSession = Depends(get_db)):
+@router.get(
+    "/transmission/{model_id}",
+    response_model=ModelResponse,
+    dependencies=[Depends(table_etag(TransmissionModel))],
+)
+async def get_transmission_model(model_id: int, db: AsyncSession = Depends(get_read_db)):
     model = await _get_model_by_id(db, TransmissionModel, model_id)
     if not model:
         raise HTTPException(status_code=404, detail="Transmission model not found")
@@ -186,6 +204,7 @@ async def update_transmission_model(
         model.description = payload.description
     await db.commit()
     await db.refresh(model)
+    reference_cache.put(TransmissionModel, model)
     return {"id": model.id, "name": model.name, "description": model.description}
 
 
@@ -199,19 +218,24 @@ async def delete_transmission_model(model_id: int, db: AsyncSession = Depends(ge
         raise HTTPException(status_code=404, detail="Transmission model not found")
     await db.delete(model)
     await db.commit()
+    reference_cache.remove(TransmissionModel, model_id)
     return {"ok": True}
 
 
 # Модели ведущего моста
-@router.get("/drive-axle")
-async def list_drive_axle_models(db: AsyncSession = Depends(get_db)):
+@router.get("/drive-axle", dependencies=[Depends(table_etag(DriveAxleModel))])
+async def list_drive_axle_models(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(DriveAxleModel))
     items = result.scalars().all()
     return [{"id": m.id, "name": m.name} for m in items]
 
 
-@router.get("/drive-axle/{model_id}", response_model=ModelResponse)
-async def get_drive_axle_model(model_id: int, db: AsyncSession = Depends(get_db)):
+@router.get(
+    "/drive-axle/{model_id}",
+    response_model=ModelResponse,
+    dependencies=[Depends(table_etag(DriveAxleModel))],
+)
+async def get_drive_axle_model(model_id: int, db: AsyncSession = Depends(get_read_db)):
     model = await _get_model_by_id(db, DriveAxleModel, model_id)
     if not model:
         raise HTTPException(status_code=404, detail="Drive axle model not found")
@@ -234,6 +258,7 @@ async def update_drive_axle_model(
         model.description = payload.description
     await db.commit()
     await db.refresh(model)
+    reference_cache.put(DriveAxleModel, model)
     return {"id": model.id, "name": model.name, "description": model.description}
 
 
@@ -247,19 +272,24 @@ async def delete_drive_axle_model(model_id: int, db: AsyncSession = Depends(get_
         raise HTTPException(status_code=404, detail="Drive axle model not found")
     await db.delete(model)
     await db.commit()
+    reference_cache.remove(DriveAxleModel, model_id)
     return {"ok": True}
 
 
 # Модели управляемого моста
-@router.get("/steering-axle")
-async def list_steering_axle_models(db: AsyncSession = Depends(get_db)):
+@router.get("/steering-axle", dependencies=[Depends(table_etag(SteeringAxleModel))])
+async def list_steering_axle_models(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(SteeringAxleModel))
     items = result.scalars().all()
     return [{"id": m.id, "name": m.name} for m in items]
 
 
-@router.get("/steering-axle/{model_id}", response_model=ModelResponse)
-async def get_steering_axle_model(model_id: int, db: AsyncSession = Depends(get_db)):
+@router.get(
+    "/steering-axle/{model_id}",
+    response_model=ModelResponse,
+    dependencies=[Depends(table_etag(SteeringAxleModel))],
+)
+async def get_steering_axle_model(model_id: int, db: AsyncSession = Depends(get_read_db)):
     model = await _get_model_by_id(db, SteeringAxleModel, model_id)
     if not model:
         raise HTTPException(status_code=404, detail="Steering axle model not found")
@@ -282,6 +312,7 @@ async def update_steering_axle_model(
         model.description = payload.description
     await db.commit()
     await db.refresh(model)
+    reference_cache.put(SteeringAxleModel, model)
     return {"id": model.id, "name": model.name, "description": model.description}
 
 
@@ -295,19 +326,23 @@ async def delete_steering_axle_model(model_id: int, db: AsyncSession = Depends(g
         raise HTTPException(status_code=404, detail="Steering axle model not found")
     await db.delete(model)
     await db.commit()
+    reference_cache.remove(SteeringAxleModel, model_id)
     return {"ok": True}
 
 
 # Метод восстановления
-@router.get("/recovery-method")
-async def list_recovery_method_models(db: AsyncSession = Depends(get_db)):
+@router.get("/recovery-method", dependencies=[Depends(table_etag(RecoveryMethodModel))])
+async def list_recovery_method_models(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(RecoveryMethodModel))
     items = result.scalars().all()
     return [{"id": m.id, "name": m.name} for m in items]
 
 
-@router.get("/recovery-method/{model_id}")
-async def get_recovery_method_model(model_id: int, db: AsyncSession = Depends(get_db)):
+@router.get(
+    "/recovery-method/{model_id}",
+    dependencies=[Depends(table_etag(RecoveryMethodModel))],
+)
+async def get_recovery_method_model(model_id: int, db: AsyncSession = Depends(get_read_db)):
     model = await _get_model_by_id(db, RecoveryMethodModel, model_id)
     if not model:
         raise HTTPException(status_code=404, detail="Recovery method model not found")
@@ -330,19 +365,23 @@ async def update_recovery_method_model(
         model.description = payload.description
     await db.commit()
     await db.refresh(model)
+    reference_cache.put(RecoveryMethodModel, model)
     return {"id": model.id, "name": model.name, "description": model.description}
 
 
 # Модели узла отказа
-@router.get("/failure-node")
-async def list_failure_node_models(db: AsyncSession = Depends(get_db)):
+@router.get("/failure-node", dependencies=[Depends(table_etag(FailureNodeModel))])
+async def list_failure_node_models(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(FailureNodeModel))
     items = result.scalars().all()
     return [{"id": m.id, "name": m.name} for m in items]
 
 
-@router.get("/failure-node/{model_id}")
-async def get_failure_node_model(model_id: int, db: AsyncSession = Depends(get_db)):
+@router.get(
+    "/failure-node/{model_id}",
+    dependencies=[Depends(table_etag(FailureNodeModel))],
+)
+async def get_failure_node_model(model_id: int, db: AsyncSession = Depends(get_read_db)):
     model = await _get_model_by_id(db, FailureNodeModel, model_id)
     if not model:
         raise HTTPException(status_code=404, detail="Failure node model not found")
@@ -365,27 +404,32 @@ async def update_failure_node_model(
         model.description = payload.description
     await db.commit()
     await db.refresh(model)
+    reference_cache.put(FailureNodeModel, model)
     return {"id": model.id, "name": model.name, "description": model.description}
 
 
 # Клиенты
-@router.get("/clients")
-async def list_clients(db: AsyncSession = Depends(get_db)):
+@router.get("/clients", dependencies=[Depends(table_etag(Client))])
+async def list_clients(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(Client))
     items = result.scalars().all()
     return [{"id": c.id, "name": c.name} for c in items]
 
 
 # Cервисные компании
-@router.get("/service-company")
-async def list_service_companies(db: AsyncSession = Depends(get_db)):
+@router.get("/service-company", dependencies=[Depends(table_etag(ServiceCompanyModel))])
+async def list_service_companies(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(ServiceCompanyModel))
     items = result.scalars().all()
     return [{"id": s.id, "name": s.name} for s in items]
 
 
-@router.get("/service-company/{model_id}", response_model=ModelResponse)
-async def get_service_company(model_id: int, db: AsyncSession = Depends(get_db)):
+@router.get(
+    "/service-company/{model_id}",
+    response_model=ModelResponse,
+    dependencies=[Depends(table_etag(ServiceCompanyModel))],
+)
+async def get_service_company(model_id: int, db: AsyncSession = Depends(get_read_db)):
     model = await _get_model_by_id(db, ServiceCompanyModel, model_id)
     if not model:
         raise HTTPException(status_code=404, detail="Service company not found")
@@ -410,19 +454,27 @@ async def update_service_company(
 
     await db.commit()
     await db.refresh(model)
+    reference_cache.put(ServiceCompanyModel, model)
     return {"id": model.id, "name": model.name, "description": model.description}
 
 
 # Техническое обслуживание
-@router.get("/maintenance-types")
-async def list_maintenance_types(db: AsyncSession = Depends(get_db)):
+@router.get(
+    "/maintenance-types",
+    dependencies=[Depends(table_etag(TechMaintenanceModel))],
+)
+async def list_maintenance_types(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(TechMaintenanceModel))
     items = result.scalars().all()
     return [{"id": m.id, "name": m.name} for m in items]
 
 
-@router.get("/maintenance-types/{model_id}", response_model=ModelResponse)
-async def get_maintenance_type(model_id: int, db: AsyncSession = Depends(get_db)):
+@router.get(
+    "/maintenance-types/{model_id}",
+    response_model=ModelResponse,
+    dependencies=[Depends(table_etag(TechMaintenanceModel))],
+)
+async def get_maintenance_type(model_id: int, db: AsyncSession = Depends(get_read_db)):
     model = await _get_model_by_id(db, TechMaintenanceModel, model_id)
     if not model:
         raise HTTPException(status_code=404, detail="Maintenance type not found")
@@ -447,4 +499,5 @@ async def update_maintenance_type(
 
     await db.commit()
     await db.refresh(model)
+    reference_cache.put(TechMaintenanceModel, model)
     return {"id": model.id, "name": model.name, "description": model.description}
@@ -6,6 +6,12 @@ from .models import router as models_router
 from .maintenance import router as maintenance_router
 from .meta import router as meta_router
 from .complaints import router as complaints_router
+from .analytics import router as analytics_router
+from .search import router as search_router
+from .history import router as history_router
+from .bootstrap import router as bootstrap_router
+from .jobs import router as jobs_router
+from .events import router as events_router
 
 api_router = APIRouter(prefix="/api")
 
@@ -15,3 +21,9 @@ api_router.include_router(models_router)
 api_router.include_router(maintenance_router)
 api_router.include_router(meta_router)
 api_router.include_router(complaints_router)
+api_router.include_router(analytics_router)
+api_router.include_router(search_router)
+api_router.include_router(history_router)
+api_router.include_router(bootstrap_router)
+api_router.include_router(jobs_router)
+api_router.include_router(events_router)
@@ -0,0 +1,142 @@
+import re
+from typing import List, Literal, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel, Field
+from sqlalchemy import func, literal_column, table, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import get_read_db
+from migrations import SEARCH_INDEXES, search_document, search_vector
+from models import CarModel, ComplaintModel, UserRole
+from security import CurrentUser, get_current_user, scope_car_records, scope_cars
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+SearchKind = Literal["car", "complaint"]
+
+# Совпадение обрамляется маркерами, фрагмент — до SNIPPET_TOKENS слов
+SNIPPET_TOKENS = 10
+HEADLINE_OPTIONS = f"StartSel=[, StopSel=], MaxWords={SNIPPET_TOKENS}, MinWords=1"
+
+
+class SearchHit(BaseModel):
+    kind: SearchKind = Field(..., description="Что найдено: машина или рекламация")
+    id: int = Field(..., description="ID машины или рекламации")
+    car_id: int = Field(..., description="ID машины")
+    vin: str = Field(..., description="Заводской номер машины (VIN)")
+    snippet: str = Field(..., description="Фрагмент с совпадением, найденное в [ ]")
+
+
+def search_terms(q: str) -> List[str]:
+    """Слова запроса: каждое ищется как префикс, все слова обязательны.
+
+    Слова берутся без знаков препинания, поэтому ввод пользователя не может
+    содержать операторов FTS5 или tsquery; «ENG-123» ищется как «eng*» и «123*».
+    """
+    return re.findall(r"\w+", q)
+
+
+def _rowid(index: str):
+    # Унарный плюс запрещает SQLite искать в индексе FTS по rowid: иначе для
+    # клиента или сервиса планировщик перебирает все их машины по индексу
+    # client_id/service_company_id и для каждой проверяет совпадение
+    return literal_column(f"+{index}.rowid")
+
+
+def _fts5(index: str, model_class, terms: List[str], snippet_column: int) -> Tuple:
+    """SQLite: (источник строк, условие совпадения, фрагмент) по таблице FTS5"""
+    expression = " ".join(f'"{term}"*' for term in terms)
+    return (
+        table(index).join(model_class, model_class.id == _rowid(index)),
+        literal_column(index).op("MATCH")(expression),
+        func.snippet(literal_column(index), snippet_column, "[", "]", "…", SNIPPET_TOKENS),
+    )
+
+
+def _tsvector(index: str, model_class, terms: List[str]) -> Tuple:
+    """PostgreSQL: то же по GIN-индексу to_tsvector (миграция 7)"""
+    table_name, columns = SEARCH_INDEXES[index]
+    query = func.to_tsquery(
+        literal_column("'simple'"), " & ".join(f"'{term}':*" for term in terms)
+    )
+    # Для префиксов PostgreSQL сильно завышает число совпадений и под LIMIT
+    # выбирает полный просмотр таблицы (1,5 с на 100 000 машин вместо 6 мс).
+    # Совпадения из индекса материализуются до соединения и LIMIT
+    hits = (
+        select(model_class.id)
+        .where(literal_column(search_vector(columns, table_name)).op("@@")(query))
+        .cte(f"{index}_hits")
+        .prefix_with("MATERIALIZED")
+    )
+    return (
+        hits.join(model_class, model_class.id == hits.c.id),
+        true(),  # совпадение уже отобрано в hits
+        func.ts_headline(
+            literal_column("'simple'"),
+            literal_column(search_document(columns, table_name)),
+            query,
+            HEADLINE_OPTIONS,
+        ),
+    )
+
+
+def _search_clauses(
+    db: AsyncSession, index: str, model_class, terms: List[str], snippet_column: int
+):
+    if db.get_bind().dialect.name == "postgresql":
+        return _tsvector(index, model_class, terms)
+    return _fts5(index, model_class, terms, snippet_column)
+
+
+# Поиск по VIN, заводским номерам агрегатов, адресу и описанию отказа
+@router.get("", response_model=List[SearchHit])
+async def search(
+    q: str = Query(..., min_length=2, max_length=100, description="Строка поиска"),
+    kind: Optional[SearchKind] = Query(None, description="Искать только машины или только рекламации"),
+    limit: int = Query(20, ge=1, le=100, description="Не больше результатов каждого вида"),
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    terms = search_terms(q)
+    if not terms:
+        return []
+
+    hits = []
+    if kind in (None, "car"):
+        source, matches, snippet = _search_clauses(db, "car_search", CarModel, terms, -1)
+        stmt = (
+            select(CarModel.id, CarModel.vin, snippet)
+            .select_from(source)
+            .where(matches)
+            .limit(limit)
+        )
+        result = await db.execute(scope_cars(stmt, user))
+        hits += [
+            {"kind": "car", "id": car_id, "car_id": car_id, "vin": vin, "snippet": snippet}
+            for car_id, vin, snippet in result.all()
+        ]
+
+    if kind in (None, "complaint"):
+        source, matches, snippet = _search_clauses(
+            db, "complaint_search", ComplaintModel, terms, 0
+        )
+        stmt = (
+            select(ComplaintModel.id, ComplaintModel.car_id, CarModel.vin, snippet)
+            .select_from(source.join(CarModel, CarModel.id == ComplaintModel.car_id))
+            .where(matches)
+            .limit(limit)
+        )
+        if user.role == UserRole.client:
+            # Машина уже в соединении: условие на неё дешевле подзапроса по
+            # всем машинам клиента в scope_car_records
+            stmt = scope_cars(stmt, user)
+        else:
+            stmt = scope_car_records(stmt, ComplaintModel, user)
+        result = await db.execute(stmt)
+        hits += [
+            {"kind": "complaint", "id": complaint_id, "car_id": car_id, "vin": vin, "snippet": snippet}
+            for complaint_id, car_id, vin, snippet in result.all()
+        ]
+    return hits
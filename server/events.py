@@ -0,0 +1,138 @@
+"""Лента изменений для Server-Sent Events (GET /api/events).
+
+Обработчики создания машин, ТО и рекламаций и изменения справочников после
+коммита публикуют короткое событие. Рассылка идёт в памяти процесса: у
+каждого подписчика своя очередь на SILANT_EVENTS_QUEUE_SIZE событий, и
+подписчик получает только то, что его роль видит в списках.
+
+Клиент, который не успевает читать и переполнил очередь, отключается: память
+сервера не растёт из-за одного медленного соединения. Переподключившись с
+заголовком Last-Event-ID, клиент получит пропущенное из последних
+SILANT_EVENTS_BACKLOG событий, а если столько не сохранилось — событие reset
+(перечитать списки целиком).
+
+При нескольких процессах uvicorn подписчик видит изменения только своего
+процесса.
+"""
+import asyncio
+import os
+import secrets
+from collections import deque
+from typing import Deque, NamedTuple, Optional, Set
+
+from fast_json import dumps
+from metrics import events_dropped, events_subscribers
+from security import CurrentUser, can_access
+
+EVENTS_QUEUE_SIZE = int(os.getenv("SILANT_EVENTS_QUEUE_SIZE", "256"))
+EVENTS_BACKLOG = int(os.getenv("SILANT_EVENTS_BACKLOG", "1024"))
+# Пинг держит соединение открытым через прокси и выявляет оборванных клиентов
+EVENTS_PING_SECONDS = float(os.getenv("SILANT_EVENTS_PING_SECONDS", "15"))
+# Поток закрывается через столько секунд, и клиент переподключается с
+# Last-Event-ID. Иначе открытые потоки не дают uvicorn завершиться по SIGTERM
+EVENTS_MAX_SECONDS = float(os.getenv("SILANT_EVENTS_MAX_SECONDS", "60"))
+
+# Номера событий действуют в пределах одного запуска
+EPOCH = secrets.token_hex(4)
+
+
+class Audience(NamedTuple):
+    """Кому видна запись: клиенту машины и сервисной компании"""
+
+    client_id: Optional[int]
+    service_company_id: Optional[int]
+
+
+class Event(NamedTuple):
+    seq: int
+    audience: Optional[Audience]  # None — всем
+    encoded: bytes
+
+
+def _visible(user: CurrentUser, audience: Optional[Audience]) -> bool:
+    return audience is None or can_access(user, *audience)
+
+
+def _encode(seq: int, name: str, data: dict) -> bytes:
+    return (
+        f"id: {EPOCH}-{seq}\nevent: {name}\ndata: ".encode()
+        + dumps(data)
+        + b"\n\n"
+    )
+
+
+RESET = Event(0, None, b"event: reset\ndata: {}\n\n")
+
+
+class Subscriber:
+    __slots__ = ("user", "queue")
+
+    def __init__(self, user: CurrentUser, queue_size: int):
+        self.user = user
+        # None в очереди — сигнал закрыть поток
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+
+
+class EventBroker:
+    def __init__(self, queue_size: int, backlog: int):
+        self.queue_size = queue_size
+        self._subscribers: Set[Subscriber] = set()
+        self._backlog: Deque[Event] = deque(maxlen=backlog)
+        self._seq = 0
+
+    def publish(self, name: str, data: dict, audience: Optional[Audience] = None) -> None:
+        self._seq += 1
+        event = Event(self._seq, audience, _encode(self._seq, name, data))
+        self._backlog.append(event)
+        for subscriber in list(self._subscribers):
+            if not _visible(subscriber.user, audience):
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def subscribe(self, user: CurrentUser, last_event_id: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(user, self.queue_size)
+        if last_event_id:
+            missed = self._missed(user, last_event_id)
+            if missed is None or len(missed) >= self.queue_size:
+                subscriber.queue.put_nowait(RESET)
+            else:
+                for event in missed:
+                    subscriber.queue.put_nowait(event)
+        self._subscribers.add(subscriber)
+        events_subscribers.inc()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+            events_subscribers.dec()
+
+    def _missed(self, user: CurrentUser, last_event_id: str):
+        """События после last_event_id; None — их уже нет в истории"""
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != EPOCH or not seq.isdigit():
+            return None
+        seq = int(seq)
+        oldest = self._backlog[0].seq if self._backlog else self._seq + 1
+        if seq + 1 < oldest:
+            return None
+        return [e for e in self._backlog if e.seq > seq and _visible(user, e.audience)]
+
+    def _drop(self, subscriber: Subscriber) -> None:
+        # Очередь освобождается сразу, а поток закроется, дочитав None
+        self.unsubscribe(subscriber)
+        events_dropped.inc()
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+
+event_broker = EventBroker(EVENTS_QUEUE_SIZE, EVENTS_BACKLOG)
+
+
+def record_audience(car, record) -> Audience:
+    # ТО и рекламации: клиенту — по его машине, сервису — по своей записи
+    return Audience(car.client_id, record.service_company_id)
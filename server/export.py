@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+from typing import Callable, Literal, Sequence
+
+from fastapi.responses import StreamingResponse
+
+from database import ReadSessionLocal
+
+ExportFormat = Literal["csv", "ndjson"]
+
+# Сколько строк читается из курсора БД за один раз
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def export_header(fields: Sequence[str], fmt: str) -> bytes:
+    if fmt != "csv":
+        return b""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=fields, extrasaction="ignore")
+    # BOM нужен, чтобы Excel корректно открыл кириллицу
+    buf.write("\ufeff")
+    writer.writeheader()
+    return buf.getvalue().encode("utf-8")
+
+
+def encode_rows(rows, to_dict: Callable, fields: Sequence[str], fmt: str) -> bytes:
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=fields, extrasaction="ignore")
+        writer.writerows(to_dict(obj) for obj in rows)
+        return buf.getvalue().encode("utf-8")
+    return "".join(
+        json.dumps(to_dict(obj), ensure_ascii=False) + "\n" for obj in rows
+    ).encode("utf-8")
+
+
+async def _iter_export(stmt, to_dict: Callable, fields: Sequence[str], fmt: str):
+    # Сессия открывается внутри генератора: она должна жить,
+    # пока ответ передаётся клиенту, а не до выхода из обработчика
+    async with ReadSessionLocal() as session:
+        header = export_header(fields, fmt)
+        if header:
+            yield header
+
+        result = await session.stream(
+            stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for partition in result.scalars().partitions():
+            chunk = encode_rows(partition, to_dict, fields, fmt)
+            # Отпускаем объекты пачки, чтобы память не росла вместе с таблицей.
+            # Не expunge_all: он подменяет карту идентичности, на которую
+            # опирается потоковый результат, и следующая пачка падает
+            for obj in partition:
+                session.expunge(obj)
+            yield chunk
+
+
+def export_response(
+    stmt, to_dict: Callable, fields: Sequence[str], fmt: ExportFormat, filename: str
+) -> StreamingResponse:
+    """Потоковая выгрузка результата запроса в CSV или NDJSON"""
+    return StreamingResponse(
+        _iter_export(stmt, to_dict, fields, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{fmt}"'
+        },
+    )
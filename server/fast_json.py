@@ -0,0 +1,55 @@
+"""Быстрая отдача списков без pydantic.
+
+Обычно список проходит через response_model: FastAPI валидирует каждую
+строку моделью из schemas.py и только потом кодирует JSON. Словари строк
+(_car_to_dict и т.п.) уже имеют форму схемы, поэтому при SILANT_FAST_JSON=1
+они кодируются в байты сразу — orjson, если он установлен, иначе
+стандартным json. Схема OpenAPI и содержимое ответа не меняются.
+"""
+import json
+import os
+from typing import Any, List
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # необязательная зависимость
+    orjson = None
+
+FAST_JSON = os.getenv("SILANT_FAST_JSON", "0") == "1"
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _handler_headers(response: Response) -> dict:
+    # Возвращённый Response не наследует заголовки, выставленные обработчиком
+    # и зависимостями (X-Next-Cursor, ETag), поэтому они переносятся явно
+    return {
+        name: value
+        for name, value in response.headers.items()
+        if name != "content-length"
+    }
+
+
+def list_response(rows: List[dict], response: Response):
+    """Строки списка: при FAST_JSON — готовый ответ, иначе — для response_model"""
+    if not FAST_JSON:
+        return rows
+    return FastJSONResponse(rows, headers=_handler_headers(response))
+
+
+def encoded_response(body: bytes, response: Response) -> Response:
+    """Ответ из заранее закодированного JSON"""
+    return Response(body, media_type="application/json", headers=_handler_headers(response))
@@ -0,0 +1,407 @@
+"""Потоковый импорт истории ТО и рекламаций из CSV.
+
+Файл читается и записывается пачками фиксированного размера, поэтому
+память не зависит от размера файла. Чтение и разбор CSV идут в потоке, а не
+в цикле событий. VIN каждой пачки разрешаются одним IN-запросом, справочники —
+по кэшу справочников; id, которых нет в кэше, дочитываются одним IN-запросом
+на таблицу.
+Ошибочные строки попадают в отчёт и не прерывают импорт. Если пачка не
+записалась, её строки повторяются по одной: отклоняются только те, что не
+проходят в БД, каждая со своей ошибкой.
+
+Колонки совпадают с выгрузкой /export, для справочников можно указать
+либо *_id, либо наименование. Запуск из консоли:
+
+    py importer.py maintenance work_orders.csv
+"""
+import asyncio
+import csv
+import io
+import itertools
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from analytics import record_complaints, record_maintenance
+from models import (
+    CarModel,
+    ComplaintModel,
+    FailureNodeModel,
+    RecoveryMethodModel,
+    ServiceCompanyModel,
+    TechMaintenanceExtendModel,
+    TechMaintenanceModel,
+    VehicleModel,
+)
+from reference_cache import reference_cache
+from security import CurrentUser, can_access, can_write_for
+
+IMPORT_BATCH_SIZE = 1000
+# Сколько ошибок возвращается в отчёте; остальные только подсчитываются
+MAX_REPORTED_ERRORS = 1000
+
+REQUIRED_COLUMNS = {
+    "maintenance": {"vin", "maintenance_date", "order_date"},
+    "complaints": {"vin", "date_of_failure", "operating_time"},
+}
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self):
+        self.processed = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def add_error(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "processed": self.processed,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+class CarRef:
+    __slots__ = ("id", "vehicle_model_id", "client_id", "service_company_id")
+
+    def __init__(
+        self, car_id: int, vehicle_model_id: int, client_id: int, service_company_id: int
+    ):
+        self.id = car_id
+        self.vehicle_model_id = vehicle_model_id
+        self.client_id = client_id
+        self.service_company_id = service_company_id
+
+
+def _parse_date(row: dict, field: str, required: bool = True) -> Optional[date]:
+    value = (row.get(field) or "").strip()
+    if not value:
+        if required:
+            raise RowError(f"Не заполнено поле {field}")
+        return None
+    for fmt in ("%Y-%m-%d", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise RowError(f"Неверный формат даты в поле {field}: {value}")
+
+
+def _parse_int(row: dict, field: str) -> int:
+    value = (row.get(field) or "").strip()
+    try:
+        return int(value)
+    except ValueError:
+        raise RowError(f"Поле {field} должно быть целым числом: {value}")
+
+
+def _raw_id(row: dict, field: str) -> Optional[int]:
+    try:
+        return int((row.get(f"{field}_id") or "").strip())
+    except ValueError:
+        return None
+
+
+def _ref_id(
+    row: dict, field: str, model_class: type, default: Optional[int] = None
+) -> int:
+    """Id справочника из колонки '<field>_id' или по наименованию в '<field>'"""
+    raw_id = (row.get(f"{field}_id") or "").strip()
+    if raw_id:
+        try:
+            model_id = int(raw_id)
+        except ValueError:
+            raise RowError(f"Поле {field}_id должно быть целым числом: {raw_id}")
+        if reference_cache.get(model_class, model_id) is None:
+            raise RowError(f"Указан несуществующий {field}_id: {model_id}")
+        return model_id
+
+    name = (row.get(field) or "").strip()
+    if name:
+        model_id = reference_cache.id_by_name(model_class, name)
+        if model_id is None:
+            raise RowError(f"Неизвестное значение {field}: {name}")
+        return model_id
+
+    if default is not None:
+        return default
+    raise RowError(f"Не заполнено поле {field}")
+
+
+ORDER_NUMBER_LENGTH = TechMaintenanceExtendModel.order_number.type.length
+
+
+def _maintenance_row(row: dict, car: CarRef) -> dict:
+    order_number = (row.get("order_number") or "").strip()
+    if len(order_number) > ORDER_NUMBER_LENGTH:
+        raise RowError(
+            f"Номер заказ-наряда длиннее {ORDER_NUMBER_LENGTH} символов: {order_number}"
+        )
+    return {
+        "car_id": car.id,
+        "maintenance_type_id": _ref_id(row, "maintenance_type", TechMaintenanceModel),
+        "maintenance_date": _parse_date(row, "maintenance_date"),
+        "order_number": order_number,
+        "order_date": _parse_date(row, "order_date"),
+        "service_company_id": _ref_id(
+            row, "service_company", ServiceCompanyModel, car.service_company_id
+        ),
+    }
+
+
+def _complaint_row(row: dict, car: CarRef) -> dict:
+    failure_date = _parse_date(row, "date_of_failure")
+    recovery_date = _parse_date(row, "date_recovery", required=False)
+    if recovery_date and recovery_date < failure_date:
+        raise RowError("Дата восстановления не может быть раньше даты отказа")
+    return {
+        "car_id": car.id,
+        "date_of_failure": failure_date,
+        "operating_time": _parse_int(row, "operating_time"),
+        "node_failure_id": _ref_id(row, "node_failure", FailureNodeModel),
+        "description_failure": (row.get("description_failure") or "").strip(),
+        "recovery_method_id": _ref_id(row, "recovery_method", RecoveryMethodModel),
+        "used_spare_parts": (row.get("used_spare_parts") or "").strip(),
+        "date_recovery": recovery_date,
+        "equipment_downtime": (recovery_date - failure_date).days
+        if recovery_date
+        else None,
+        "vehicle_model": reference_cache.name(VehicleModel, car.vehicle_model_id),
+        "service_company_id": _ref_id(
+            row, "service_company", ServiceCompanyModel, car.service_company_id
+        ),
+    }
+
+
+async def _record_maintenance(db: AsyncSession, rows: List[dict], cars: List[CarRef]) -> None:
+    await record_maintenance(db, rows)
+
+
+async def _record_complaints(db: AsyncSession, rows: List[dict], cars: List[CarRef]) -> None:
+    await record_complaints(
+        db,
+        (
+            dict(row, vehicle_model_id=car.vehicle_model_id)
+            for row, car in zip(rows, cars)
+        ),
+    )
+
+
+# Вид импорта -> (таблица, построение строки, обновление сводок аналитики)
+IMPORTERS = {
+    "maintenance": (TechMaintenanceExtendModel, _maintenance_row, _record_maintenance),
+    "complaints": (ComplaintModel, _complaint_row, _record_complaints),
+}
+
+# Вид импорта -> справочники строки: поле -> модель
+REFERENCE_FIELDS = {
+    "maintenance": {
+        "maintenance_type": TechMaintenanceModel,
+        "service_company": ServiceCompanyModel,
+    },
+    "complaints": {
+        "node_failure": FailureNodeModel,
+        "recovery_method": RecoveryMethodModel,
+        "service_company": ServiceCompanyModel,
+    },
+}
+
+
+async def _resolve_vins(
+    db: AsyncSession, cars: Dict[str, Optional[CarRef]], vins: Iterable[str]
+) -> None:
+    missing = list({vin for vin in vins if vin and vin not in cars})
+    if not missing:
+        return
+    result = await db.execute(
+        select(
+            CarModel.vin,
+            CarModel.id,
+            CarModel.vehicle_model_id,
+            CarModel.client_id,
+            CarModel.service_company_id,
+        ).where(CarModel.vin.in_(missing))
+    )
+    for vin, car_id, vehicle_model_id, client_id, service_company_id in result.all():
+        cars[vin] = CarRef(car_id, vehicle_model_id, client_id, service_company_id)
+    for vin in missing:
+        cars.setdefault(vin, None)
+
+
+async def _ensure_refs(
+    db: AsyncSession, kind: str, batch: List[Tuple[int, dict]], cars: Iterable[CarRef]
+) -> None:
+    """Id справочников пачки, которых нет в кэше (например, добавленные в обход
+    API), дочитываются из БД — по одному IN-запросу на таблицу"""
+    for field, model_class in REFERENCE_FIELDS[kind].items():
+        await reference_cache.ensure(db, model_class, (_raw_id(row, field) for _, row in batch))
+    if kind == "complaints":
+        # Модель техники копируется в рекламацию по машине
+        await reference_cache.ensure(db, VehicleModel, (car.vehicle_model_id for car in cars))
+
+
+def _check_scope(user: Optional[CurrentUser], vin: str, car: CarRef, record: dict) -> None:
+    """Строка импорта от имени пользователя: машина в его области видимости,
+    сервисная компания вносит только свои записи"""
+    if user is None:
+        return
+    if not can_access(user, car.client_id, car.service_company_id):
+        # Чужая машина неотличима от несуществующей
+        raise RowError(f"Машина с VIN {vin} не найдена")
+    if not can_write_for(user, record["service_company_id"]):
+        raise RowError("Сервисная компания может импортировать только свои записи")
+
+
+async def _insert(
+    db: AsyncSession, kind: str, rows: List[dict], row_cars: List[CarRef]
+) -> None:
+    model_class, _, record_summaries = IMPORTERS[kind]
+    await db.execute(insert(model_class), rows)
+    await record_summaries(db, rows, row_cars)
+    await db.commit()
+
+
+def _write_error(e: Exception) -> str:
+    # У ошибок SQLAlchemy текст драйвера — без SQL и параметров
+    return f"Ошибка записи: {getattr(e, 'orig', None) or e}"
+
+
+async def _flush(
+    db: AsyncSession,
+    kind: str,
+    batch: List[Tuple[int, dict]],
+    cars: Dict[str, Optional[CarRef]],
+    report: ImportReport,
+    user: Optional[CurrentUser] = None,
+) -> None:
+    _, build_row, _ = IMPORTERS[kind]
+    vins = {(row.get("vin") or "").strip() for _, row in batch}
+    await _resolve_vins(db, cars, vins)
+    await _ensure_refs(db, kind, batch, (cars[vin] for vin in vins if cars.get(vin)))
+
+    rows = []
+    lines = []
+    row_cars = []
+    for line, row in batch:
+        vin = (row.get("vin") or "").strip()
+        car = cars.get(vin)
+        if car is None:
+            report.add_error(line, f"Машина с VIN {vin or '—'} не найдена")
+            continue
+        try:
+            record = build_row(row, car)
+            _check_scope(user, vin, car, record)
+        except RowError as e:
+            report.add_error(line, str(e))
+            continue
+        rows.append(record)
+        lines.append(line)
+        row_cars.append(car)
+
+    if not rows:
+        return
+    try:
+        await _insert(db, kind, rows, row_cars)
+        imported = len(rows)
+    except Exception:
+        # Пачка не записалась: строки повторяются по одной, чтобы отклонить
+        # только ошибочные, с их собственной ошибкой
+        await db.rollback()
+        imported = 0
+        for line, record, car in zip(lines, rows, row_cars):
+            try:
+                await _insert(db, kind, [record], [car])
+            except Exception as e:
+                await db.rollback()
+                report.add_error(line, _write_error(e))
+            else:
+                imported += 1
+    report.imported += imported
+
+
+def _read_batch(reader: csv.DictReader) -> List[Tuple[int, dict]]:
+    """Следующая пачка строк с номерами строк файла; пустая — файл прочитан"""
+    return [
+        (reader.line_num, row) for row in itertools.islice(reader, IMPORT_BATCH_SIZE)
+    ]
+
+
+def _detect_delimiter(header: str) -> str:
+    # Excel в русской локали сохраняет CSV с разделителем ";"
+    return ";" if header.count(";") > header.count(",") else ","
+
+
+async def import_csv(
+    db: AsyncSession, kind: str, stream: TextIO, user: Optional[CurrentUser] = None
+) -> dict:
+    """Импортирует CSV-поток в таблицу ТО ('maintenance') или рекламаций ('complaints').
+
+    С user строки ограничиваются его областью видимости; без него (консоль)
+    импортируется всё.
+    """
+    # Чтение файла и разбор CSV блокируют, поэтому идут в потоке
+    header = await asyncio.to_thread(stream.readline)
+    reader = csv.DictReader(
+        itertools.chain([header], stream), delimiter=_detect_delimiter(header)
+    )
+    reader.fieldnames = [name.strip() for name in (reader.fieldnames or [])]
+    missing = REQUIRED_COLUMNS[kind] - set(reader.fieldnames)
+    if missing:
+        raise ValueError(f"В файле нет обязательных колонок: {', '.join(sorted(missing))}")
+
+    report = ImportReport()
+    # Карта VIN -> машина ограничена размером парка, а не размером файла
+    cars: Dict[str, Optional[CarRef]] = {}
+    while True:
+        batch = await asyncio.to_thread(_read_batch, reader)
+        if not batch:
+            return report.as_dict()
+        report.processed += len(batch)
+        await _flush(db, kind, batch, cars, report, user)
+
+
+def open_upload(file) -> TextIO:
+    """Текстовый поток поверх загруженного файла (BOM от Excel пропускается)"""
+    return io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+
+
+async def main(kind: str, path: str):
+    from database import AsyncSessionLocal, engine
+
+    async with AsyncSessionLocal() as session:
+        await reference_cache.load(session)
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            report = await import_csv(session, kind, f)
+    await engine.dispose()
+
+    print(
+        f"Обработано строк: {report['processed']}, "
+        f"импортировано: {report['imported']}, с ошибками: {report['failed']}"
+    )
+    for error in report["errors"]:
+        print(f"  строка {error['line']}: {error['error']}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Импорт ТО и рекламаций из CSV")
+    parser.add_argument("kind", choices=sorted(IMPORTERS))
+    parser.add_argument("path")
+    args = parser.parse_args()
+    asyncio.run(main(args.kind, args.path))
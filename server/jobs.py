@@ -0,0 +1,404 @@
+"""Фоновые задачи: тяжёлые выгрузки и пересчёты вне HTTP-запроса.
+
+Задача — строка таблицы jobs. POST создаёт её в статусе queued и сразу
+возвращает id, а выполняют задачи SILANT_JOB_WORKERS исполнителей. Данные
+они читают через отдельный пул соединений (database.job_engine), поэтому
+выгрузка на сотни тысяч строк не занимает соединения интерактивных
+запросов. Ход выполнения пишется в таблицу не чаще раза в секунду, файл
+результата — в каталог SILANT_JOBS_DIR.
+
+Задачу можно отменить, пока она ждёт или выполняется: статус меняется в
+таблице, а выгрузка останавливается после текущей пачки строк (задача из
+другого процесса — при следующей записи хода выполнения).
+
+Задачу забирает один исполнитель: условный UPDATE из queued в running
+записывает его id в claimed_by, и пока задача выполняется, процесс раз в
+JOB_HEARTBEAT_INTERVAL обновляет heartbeat_at своих задач. При остановке
+процесс возвращает свои задачи в очередь; задачи процесса, который упал,
+возвращают другие процессы (или он сам после перезапуска), когда сигнала нет
+дольше SILANT_JOB_STALE_SECONDS. Результаты старше
+SILANT_JOB_RETENTION_HOURS удаляются вместе с файлами.
+"""
+import asyncio
+import inspect
+import json
+import logging
+import os
+import secrets
+import socket
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from fastapi import Request, Response
+from pydantic import BaseModel, Field, TypeAdapter
+from sqlalchemy import delete, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal, JOB_WORKERS, JobSessionLocal
+from export import encode_rows, export_header
+from models import JobModel, UserRole
+from security import CurrentUser
+
+JOBS_DIR = Path(os.getenv("SILANT_JOBS_DIR", "./jobs"))
+JOB_RETENTION = timedelta(hours=float(os.getenv("SILANT_JOB_RETENTION_HOURS", "24")))
+# Строк в пачке выгрузки. Пачка разбирается в цикле событий, поэтому чем она
+# меньше, тем чаще между пачками успевают интерактивные запросы
+JOB_BATCH_SIZE = int(os.getenv("SILANT_JOB_BATCH_SIZE", "200"))
+# Как часто ход выполнения записывается в таблицу, секунд
+JOB_PROGRESS_INTERVAL = 1.0
+# Как часто исполнитель подтверждает, что его задачи живы, и ищет брошенные
+JOB_HEARTBEAT_INTERVAL = 10.0
+# Задача running без сигнала дольше этого срока считается брошенной
+JOB_STALE_AFTER = timedelta(seconds=float(os.getenv("SILANT_JOB_STALE_SECONDS", "60")))
+
+logger = logging.getLogger("silant.jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobStatus(BaseModel):
+    id: int
+    kind: str = Field(..., description="Вид задачи")
+    status: str = Field(..., description="queued, running, succeeded, failed или cancelled")
+    progress: int = Field(..., description="Обработано строк")
+    total: Optional[int] = Field(None, description="Всего строк, когда известно")
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result_url: Optional[str] = Field(None, description="Файл результата, когда задача выполнена")
+
+
+def job_status(job: JobModel) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "total": job.total,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "result_url": f"/api/jobs/{job.id}/result" if job.result_file else None,
+    }
+
+
+def accepted(job: JobModel, response: Response) -> dict:
+    """Ответ 202 на постановку задачи: статус и адрес для опроса"""
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return job_status(job)
+
+
+class JobContext:
+    """Что видит обработчик задачи: параметры, пользователь, файл и ход выполнения"""
+
+    def __init__(self, job: JobModel):
+        self.id = job.id
+        self.owner = job.claimed_by
+        self.params = json.loads(job.params)
+        scope = self.params["user"]
+        self.user = CurrentUser(
+            job.user_id, UserRole(scope["role"]), scope["client_id"], scope["service_company_id"]
+        )
+        self.progress = 0
+        self.result_file: Optional[str] = None
+        # Отмена из этого же процесса; проверяется между пачками, а не
+        # прерывает запрос к БД на полпути
+        self.cancel_requested = False
+        self._saved_at = 0.0
+
+    async def set_total(self, total: int) -> None:
+        await _save_progress(self.id, self.owner, total=total)
+
+    async def advance(self, count: int) -> None:
+        if self.cancel_requested:
+            raise JobCancelled()
+        self.progress += count
+        now = asyncio.get_running_loop().time()
+        if now - self._saved_at >= JOB_PROGRESS_INTERVAL:
+            self._saved_at = now
+            await _save_progress(self.id, self.owner, progress=self.progress)
+
+    async def export(self, stmt, id_column, to_dict: Callable, fields, fmt: str) -> None:
+        """Выгрузка в файл результата — то же содержимое, что у GET .../export.
+
+        Строки читаются пачками по id, каждая пачка — в своей короткой
+        транзакции: выгрузка не держит блокировку чтения SQLite и снимок
+        PostgreSQL всё время своей работы.
+        """
+        self.result_file = f"{self.id}.{fmt}"
+        async with JobSessionLocal() as session:
+            result = await session.execute(
+                select(func.count()).select_from(stmt.order_by(None).subquery())
+            )
+            total = result.scalar_one()
+        await self.set_total(total)
+
+        # Запись в файл уходит в поток, чтобы не останавливать цикл событий
+        with open(JOBS_DIR / self.result_file, "wb") as f:
+            await asyncio.to_thread(f.write, export_header(fields, fmt))
+            last_id = None
+            while True:
+                page = stmt if last_id is None else stmt.where(id_column > last_id)
+                async with JobSessionLocal() as session:
+                    result = await session.execute(page.limit(JOB_BATCH_SIZE))
+                    rows = result.scalars().all()
+                    chunk = encode_rows(rows, to_dict, fields, fmt)
+                if not rows:
+                    break
+                await asyncio.to_thread(f.write, chunk)
+                last_id = rows[-1].id
+                await self.advance(len(rows))
+
+
+Handler = Callable[[JobContext], Awaitable[None]]
+
+
+async def _save_progress(job_id: int, owner: str, **values) -> None:
+    # Условие по статусу и владельцу: исполнитель не перезапишет отменённую
+    # задачу и задачу, которую после потери сигнала забрал другой
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(JobModel)
+            .where(
+                JobModel.id == job_id,
+                JobModel.status == RUNNING,
+                JobModel.claimed_by == owner,
+            )
+            .values(**values)
+        )
+        await session.commit()
+    if result.rowcount == 0:
+        raise JobCancelled()
+
+
+def _remove_result(result_file: Optional[str]) -> None:
+    if result_file:
+        (JOBS_DIR / result_file).unlink(missing_ok=True)
+
+
+class JobRunner:
+    def __init__(self, workers: int):
+        self.workers = workers
+        # Уникален для каждого запуска: после перезапуска процесс не считает
+        # своими задачи, взятые до него
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"[-64:]
+        self._handlers: Dict[str, Handler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._running: Dict[int, JobContext] = {}
+
+    def register(self, kind: str, handler: Handler) -> None:
+        self._handlers[kind] = handler
+
+    async def start(self) -> None:
+        JOBS_DIR.mkdir(parents=True, exist_ok=True)
+        self._queue = asyncio.Queue()
+        await self._requeue_stale()
+        async with AsyncSessionLocal() as session:
+            # Ждущие задачи, в том числе чужие: забирает тот, чей UPDATE сработает
+            result = await session.execute(
+                select(JobModel.id).where(JobModel.status == QUEUED).order_by(JobModel.id)
+            )
+            for job_id in result.scalars():
+                self._queue.put_nowait(job_id)
+        await self._cleanup()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self) -> None:
+        tasks = self._workers + ([self._heartbeat] if self._heartbeat else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._heartbeat = None
+        self._running.clear()
+        # Прерванные задачи этого процесса сразу возвращаются в очередь, не
+        # дожидаясь, пока их сигнал устареет
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(JobModel)
+                .where(JobModel.status == RUNNING, JobModel.claimed_by == self.worker_id)
+                .values(status=QUEUED, claimed_by=None, heartbeat_at=None)
+            )
+            await session.commit()
+
+    async def _requeue_stale(self) -> None:
+        """Возвращает в очередь задачи исполнителей, от которых давно нет сигнала"""
+        stale = datetime.now() - JOB_STALE_AFTER
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                update(JobModel)
+                .where(
+                    JobModel.status == RUNNING,
+                    # Без сигнала — задачи, взятые до миграции 10
+                    or_(JobModel.heartbeat_at < stale, JobModel.heartbeat_at.is_(None)),
+                )
+                .values(status=QUEUED, claimed_by=None, heartbeat_at=None)
+                .returning(JobModel.id)
+            )
+            job_ids = result.scalars().all()
+            await session.commit()
+        if job_ids:
+            logger.warning("Брошенные задачи снова в очереди: %s", job_ids)
+            if self._workers:
+                for job_id in job_ids:
+                    self._queue.put_nowait(job_id)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+            try:
+                if self._running:
+                    async with AsyncSessionLocal() as session:
+                        await session.execute(
+                            update(JobModel)
+                            .where(
+                                JobModel.id.in_(list(self._running)),
+                                JobModel.status == RUNNING,
+                                JobModel.claimed_by == self.worker_id,
+                            )
+                            .values(heartbeat_at=datetime.now())
+                        )
+                        await session.commit()
+                await self._requeue_stale()
+            except Exception:
+                logger.exception("Сигнал жизни фоновых задач")
+
+    async def submit(self, db: AsyncSession, kind: str, params: dict, user: CurrentUser) -> JobModel:
+        scope = {
+            "role": user.role.value,
+            "client_id": user.client_id,
+            "service_company_id": user.service_company_id,
+        }
+        job = JobModel(
+            kind=kind,
+            status=QUEUED,
+            user_id=user.id,
+            params=json.dumps({**params, "user": scope}, ensure_ascii=False),
+            progress=0,
+            created_at=datetime.now(),
+        )
+        db.add(job)
+        await db.commit()
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def cancel(self, db: AsyncSession, job: JobModel) -> bool:
+        """Отменяет ждущую или выполняющуюся задачу; False — она уже завершена"""
+        result = await db.execute(
+            update(JobModel)
+            .where(JobModel.id == job.id, JobModel.status.in_(ACTIVE))
+            .values(status=CANCELLED, finished_at=datetime.now())
+        )
+        await db.commit()
+        if result.rowcount == 0:
+            return False
+        context = self._running.get(job.id)
+        if context is not None:
+            context.cancel_requested = True
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                # Ошибка записи статуса не должна останавливать исполнителя
+                logger.exception("Фоновая задача %s", job_id)
+
+    async def _run(self, job_id: int) -> None:
+        async with AsyncSessionLocal() as session:
+            # Задачу забирает тот, чей UPDATE сработал: её мог взять другой
+            # процесс или отменить пользователь, пока она ждала в очереди
+            now = datetime.now()
+            result = await session.execute(
+                update(JobModel)
+                .where(JobModel.id == job_id, JobModel.status == QUEUED)
+                .values(
+                    status=RUNNING,
+                    claimed_by=self.worker_id,
+                    heartbeat_at=now,
+                    started_at=now,
+                    progress=0,
+                    total=None,
+                )
+            )
+            await session.commit()
+            if result.rowcount == 0:
+                return
+            job = await session.get(JobModel, job_id)
+
+        context = JobContext(job)
+        self._running[job_id] = context
+        try:
+            await self._handlers[job.kind](context)
+        except JobCancelled:
+            _remove_result(context.result_file)
+            return
+        except Exception as e:
+            _remove_result(context.result_file)
+            values = {"status": FAILED, "error": str(e) or type(e).__name__}
+        else:
+            values = {"status": SUCCEEDED, "result_file": context.result_file}
+
+        finally:
+            self._running.pop(job_id, None)
+
+        try:
+            await _save_progress(
+                job_id,
+                context.owner,
+                progress=context.progress,
+                finished_at=datetime.now(),
+                **values,
+            )
+        except JobCancelled:
+            _remove_result(context.result_file)
+        await self._cleanup()
+
+    @staticmethod
+    async def _cleanup() -> None:
+        expired = datetime.now() - JOB_RETENTION
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                delete(JobModel)
+                .where(JobModel.finished_at < expired)
+                .returning(JobModel.result_file)
+            )
+            files = result.scalars().all()
+            await session.commit()
+        for result_file in files:
+            _remove_result(result_file)
+
+
+job_runner = JobRunner(JOB_WORKERS)
+
+
+def filter_params(filters_class: type, request: Request) -> dict:
+    """Параметры фильтров из строки запроса — в таком виде они хранятся у задачи"""
+    names = inspect.signature(filters_class).parameters
+    return {name: value for name, value in request.query_params.items() if name in names}
+
+
+def build_filters(filters_class: type, params: dict):
+    """Фильтры из сохранённых параметров, с теми же преобразованиями типов, что у FastAPI"""
+    return filters_class(**{
+        name: TypeAdapter(parameter.annotation).validate_python(params.get(name))
+        for name, parameter in inspect.signature(filters_class).parameters.items()
+    })
@@ -1,23 +1,57 @@
+import logging
 import uvicorn
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
+from fastapi.middleware.gzip import GZipMiddleware
+from database import engine, AsyncSessionLocal, dispose_engines
+from migrations import upgrade
+from reference_cache import reference_cache
+from metrics import CONTENT_TYPE, MetricsMiddleware, registry, setup_db_metrics
+from query_stats import (
+    QUERY_COUNT_HEADER,
+    QUERY_TIME_HEADER,
+    QueryStatsMiddleware,
+)
+from security import check_secret_key
+from write_queue import GROUP_COMMIT, write_queue
+from jobs import job_runner
 from api.v1.router import api_router
 
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # необязательная зависимость, без неё — только gzip
+    BrotliMiddleware = None
+
+logger = logging.getLogger("silant.migrations")
+
+# Ответы меньше этого размера не сжимаются: выигрыш не окупает CPU
+COMPRESS_MINIMUM_SIZE = 1024
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    check_secret_key()
     try:
+        # Миграции выполняют DDL, только если схема отстаёт от актуальной версии
         async with engine.begin() as conn:
-            # await conn.run_sync(Base.metadata.drop_all)
-            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(upgrade)
 
-    except Exception as e:
-        print(f"Ошибка при создании таблиц: {e}")
+    except Exception:
+        logger.exception("Ошибка при миграции схемы")
         raise
+
+    # Справочники загружаются в память один раз при старте
+    async with AsyncSessionLocal() as session:
+        await reference_cache.load(session)
+    if GROUP_COMMIT:
+        await write_queue.start()
+    await job_runner.start()
     yield
 
-    await engine.dispose()
+    await job_runner.stop()
+    await write_queue.stop()
+    await dispose_engines()
 
 
 app = FastAPI(title="Silant API", version="1.0.0", lifespan=lifespan)
@@ -28,7 +62,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", QUERY_COUNT_HEADER, QUERY_TIME_HEADER],
 )
+if BrotliMiddleware is not None:
+    # Клиентам без поддержки br отвечает gzip
+    app.add_middleware(BrotliMiddleware, quality=4, minimum_size=COMPRESS_MINIMUM_SIZE)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MINIMUM_SIZE, compresslevel=6)
+app.add_middleware(QueryStatsMiddleware)
+# Добавляется последним, чтобы в замер попадало и время CORS-обработки
+app.add_middleware(MetricsMiddleware)
+setup_db_metrics()
 
 # Подключаем роутер
 app.include_router(api_router)
@@ -37,6 +81,10 @@ app.include_router(api_router)
 def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     return {"message": "Тест"}
@@ -0,0 +1,319 @@
+"""Метрики приложения в текстовом формате Prometheus.
+
+Реестр — обычные словари в памяти процесса: запись метрики сводится к
+сложению и bisect по границам корзин, без блокировок и внешних зависимостей.
+HTTP-метрики снимает ASGI-middleware, метрики БД — события движков
+SQLAlchemy. Метки маршрута берутся из шаблона пути (/api/cars/{vin}),
+а не из самого URL, чтобы число рядов не росло с числом машин.
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import event
+
+from query_stats import record_statement
+
+# Границы корзин гистограмм, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(tuple(zip(self.label_names, key)))} {value}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+
+class CallbackGauge:
+    """Gauge, значения которого вычисляются в момент выгрузки"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], collect: Callable):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._collect = collect
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(tuple(zip(self.label_names, key)))} {value}"
+            for key, value in self._collect()
+        ]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # метки -> [счётчики корзин (последняя — +Inf), сумма, количество]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        series = self._values.get(label_values)
+        if series is None:
+            series = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            labels = tuple(zip(self.label_names, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(
+    Counter("silant_http_requests_total", "HTTP-запросы по маршруту и коду ответа",
+            ("method", "route", "status"))
+)
+http_latency = registry.register(
+    Histogram("silant_http_request_duration_seconds", "Время обработки HTTP-запроса",
+              ("method", "route"))
+)
+http_in_flight = registry.register(
+    Gauge("silant_http_requests_in_flight", "Запросы в обработке", ("method",))
+)
+http_exceptions = registry.register(
+    Counter("silant_http_exceptions_total", "Необработанные исключения по маршруту",
+            ("method", "route"))
+)
+db_statements = registry.register(
+    Histogram("silant_db_statement_duration_seconds", "Время выполнения SQL-выражений",
+              ("engine", "operation"))
+)
+db_errors = registry.register(
+    Counter("silant_db_errors_total", "Ошибки выполнения SQL-выражений", ("engine",))
+)
+db_connection_hold = registry.register(
+    Histogram("silant_db_connection_hold_duration_seconds",
+              "Время удержания соединения: от выдачи из пула до возврата", ("engine",))
+)
+db_pool_wait = registry.register(
+    Histogram("silant_db_pool_wait_duration_seconds",
+              "Ожидание соединения из пула, включая открытие нового", ("engine",))
+)
+group_commit_batch = registry.register(
+    Histogram("silant_group_commit_batch_size", "Записей в одной групповой транзакции",
+              buckets=BATCH_BUCKETS)
+)
+events_subscribers = registry.register(
+    Gauge("silant_events_subscribers", "Открытые потоки /api/events")
+)
+events_dropped = registry.register(
+    Counter("silant_events_dropped_total", "Потоки событий, закрытые из-за переполнения очереди")
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """ASGI-middleware, считающее запросы, время ответа и запросы в обработке"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            http_exceptions.inc(method, _route(scope))
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec(method)
+            route = _route(scope)
+            http_latency.observe(elapsed, method, route)
+            http_requests.inc(method, route, str(status_code))
+
+
+def _route(scope) -> str:
+    # FastAPI кладёт найденный маршрут в scope при маршрутизации
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+def instrument_engine(async_engine, name: str) -> None:
+    """Подписывает метрики БД на события движка и его пула"""
+    sync_engine = async_engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        db_statements.observe(elapsed, name, _operation(statement))
+        record_statement(elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _on_error(exception_context):
+        db_errors.inc(name)
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_started"):
+            conn.info["metrics_started"].pop()
+
+    @event.listens_for(sync_engine.pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["metrics_checkout"] = time.perf_counter()
+
+    @event.listens_for(sync_engine.pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("metrics_checkout", None)
+        if started is not None:
+            db_connection_hold.observe(time.perf_counter() - started, name)
+
+    _time_pool_wait(sync_engine.pool, name)
+
+
+def _time_pool_wait(pool, name: str) -> None:
+    """Замеряет ожидание соединения в пуле.
+
+    У пула нет события до выдачи соединения, поэтому оборачивается его
+    _do_get — метод, в котором пул ждёт свободное соединение или открывает
+    новое. engine.dispose() заменяет пул новым (recreate): обёртка
+    переносится и на него, как SQLAlchemy переносит подписки на события.
+    """
+    do_get = pool._do_get
+    recreate = pool.recreate
+
+    def _timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started, name)
+
+    def _recreate():
+        new_pool = recreate()
+        _time_pool_wait(new_pool, name)
+        return new_pool
+
+    pool._do_get = _timed_do_get
+    pool.recreate = _recreate
+
+
+def register_pool_gauges(engines: Dict[str, object]) -> None:
+    """Размер и загрузка пулов соединений, снимаются при каждой выгрузке"""
+
+    def collect(attribute: str):
+        def values():
+            result = []
+            for name, async_engine in engines.items():
+                pool = async_engine.sync_engine.pool
+                getter = getattr(pool, attribute, None)
+                if getter is not None:
+                    result.append(((name,), getter()))
+            return result
+        return values
+
+    registry.register(CallbackGauge(
+        "silant_db_pool_size", "Размер пула соединений", ("engine",), collect("size")))
+    registry.register(CallbackGauge(
+        "silant_db_pool_checked_out", "Соединения, выданные из пула", ("engine",), collect("checkedout")))
+    registry.register(CallbackGauge(
+        "silant_db_pool_overflow", "Соединения сверх размера пула", ("engine",), collect("overflow")))
+
+
+def setup_db_metrics() -> None:
+    from database import engine, job_engine, read_engine
+
+    engines = {"write": engine}
+    if read_engine is not engine:
+        engines["read"] = read_engine
+    if job_engine is not engine:
+        engines["jobs"] = job_engine
+    for name, async_engine in engines.items():
+        instrument_engine(async_engine, name)
+    register_pool_gauges(engines)
@@ -0,0 +1,439 @@
+"""Версионные миграции схемы БД.
+
+Каждая миграция — функция, получающая синхронное соединение внутри общей
+транзакции. Применённые версии записываются в таблицу schema_migrations;
+если схема актуальна, при старте приложения DDL не выполняется вовсе.
+
+Новые миграции добавляются в конец списка MIGRATIONS и должны корректно
+отрабатывать и на старой БД, и на свежей, созданной миграцией 1 по текущим
+моделям.
+"""
+import logging
+import secrets
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, text
+
+import models  # noqa: F401  регистрирует таблицы в Base.metadata
+from database import Base, engine
+
+logger = logging.getLogger("silant.migrations")
+
+version_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _create_indexes(conn, indexes) -> None:
+    for name, table, columns in indexes:
+        conn.execute(
+            text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+        )
+
+
+def _0001_initial_schema(conn) -> None:
+    Base.metadata.create_all(conn)
+
+
+COMPLAINT_INDEXES = [
+    ("ix_complaint_model_car_id_date", "complaint_model", ["car_id", "date_of_failure"]),
+    ("ix_complaint_model_node_failure_id", "complaint_model", ["node_failure_id"]),
+    ("ix_complaint_model_recovery_method_id", "complaint_model", ["recovery_method_id"]),
+    ("ix_complaint_model_service_company_id", "complaint_model", ["service_company_id"]),
+    ("ix_complaint_model_date_of_failure", "complaint_model", ["date_of_failure"]),
+]
+
+
+def _0002_fk_and_date_indexes(conn) -> None:
+    _create_indexes(
+        conn,
+        [
+            ("ix_car_model_vehicle_model_id", "car_model", ["vehicle_model_id"]),
+            ("ix_car_model_engine_model_id", "car_model", ["engine_model_id"]),
+            ("ix_car_model_transmission_model_id", "car_model", ["transmission_model_id"]),
+            ("ix_car_model_drive_axle_model_id", "car_model", ["drive_axle_model_id"]),
+            ("ix_car_model_steering_axle_model_id", "car_model", ["steering_axle_model_id"]),
+            ("ix_car_model_client_id", "car_model", ["client_id"]),
+            ("ix_car_model_service_company_id", "car_model", ["service_company_id"]),
+            ("ix_car_model_shipment_date", "car_model", ["shipment_date"]),
+            (
+                "ix_tech_maintenance_extend_model_car_id_date",
+                "tech_maintenance_extend_model",
+                ["car_id", "maintenance_date"],
+            ),
+            (
+                "ix_tech_maintenance_extend_model_maintenance_type_id",
+                "tech_maintenance_extend_model",
+                ["maintenance_type_id"],
+            ),
+            (
+                "ix_tech_maintenance_extend_model_service_company_id",
+                "tech_maintenance_extend_model",
+                ["service_company_id"],
+            ),
+            (
+                "ix_tech_maintenance_extend_model_maintenance_date",
+                "tech_maintenance_extend_model",
+                ["maintenance_date"],
+            ),
+            (
+                "ix_tech_maintenance_extend_model_order_date",
+                "tech_maintenance_extend_model",
+                ["order_date"],
+            ),
+        ]
+        + COMPLAINT_INDEXES,
+    )
+
+
+def _0003_typed_complaint_columns(conn) -> None:
+    columns = {
+        c["name"]: c["type"] for c in inspect(conn).get_columns("complaint_model")
+    }
+    if isinstance(columns["equipment_downtime"], Integer):
+        # Свежая БД: таблица уже создана по текущей модели
+        return
+
+    # SQLite не умеет менять тип столбца, поэтому таблица пересобирается
+    for name, _, _ in COMPLAINT_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    conn.execute(text("ALTER TABLE complaint_model RENAME TO complaint_model_old"))
+    conn.execute(
+        text(
+            """
+            CREATE TABLE complaint_model (
+                id INTEGER NOT NULL,
+                car_id INTEGER NOT NULL,
+                date_of_failure DATE NOT NULL,
+                operating_time INTEGER,
+                node_failure_id INTEGER NOT NULL,
+                description_failure VARCHAR(255),
+                recovery_method_id INTEGER NOT NULL,
+                used_spare_parts VARCHAR(255),
+                date_recovery DATE,
+                equipment_downtime INTEGER,
+                vehicle_model VARCHAR(255),
+                service_company_id INTEGER NOT NULL,
+                PRIMARY KEY (id),
+                FOREIGN KEY(car_id) REFERENCES car_model (id),
+                FOREIGN KEY(node_failure_id) REFERENCES failure_node_model (id),
+                FOREIGN KEY(recovery_method_id) REFERENCES recovery_method_model (id),
+                FOREIGN KEY(service_company_id) REFERENCES service_company_model (id)
+            )
+            """
+        )
+    )
+    # Наработка переносится только если это целое число; простой
+    # пересчитывается по датам, а не разбирается из строки "N дней"
+    conn.execute(
+        text(
+            """
+            INSERT INTO complaint_model (
+                id, car_id, date_of_failure, operating_time, node_failure_id,
+                description_failure, recovery_method_id, used_spare_parts,
+                date_recovery, equipment_downtime, vehicle_model, service_company_id
+            )
+            SELECT
+                id,
+                car_id,
+                substr(trim(date_of_failure), 1, 10),
+                CASE
+                    WHEN trim(operating_time) <> ''
+                         AND trim(operating_time) NOT GLOB '*[^0-9]*'
+                    THEN CAST(trim(operating_time) AS INTEGER)
+                END,
+                node_failure_id,
+                description_failure,
+                recovery_method_id,
+                used_spare_parts,
+                NULLIF(substr(trim(date_recovery), 1, 10), ''),
+                CASE
+                    WHEN julianday(substr(date_recovery, 1, 10))
+                         >= julianday(substr(date_of_failure, 1, 10))
+                    THEN CAST(
+                        julianday(substr(date_recovery, 1, 10))
+                        - julianday(substr(date_of_failure, 1, 10)) AS INTEGER
+                    )
+                END,
+                vehicle_model,
+                service_company_id
+            FROM complaint_model_old
+            """
+        )
+    )
+    conn.execute(text("DROP TABLE complaint_model_old"))
+    _create_indexes(conn, COMPLAINT_INDEXES)
+
+
+def _0004_analytics_summaries(conn) -> None:
+    from analytics import rebuild_summaries
+
+    models.ComplaintSummaryModel.__table__.create(conn, checkfirst=True)
+    models.MaintenanceSummaryModel.__table__.create(conn, checkfirst=True)
+    rebuild_summaries(conn)
+
+
+def _0005_role_scope_indexes(conn) -> None:
+    # Составные индексы покрывают и одиночные по тем же первым столбцам
+    for name in (
+        "ix_car_model_client_id",
+        "ix_car_model_service_company_id",
+        "ix_tech_maintenance_extend_model_service_company_id",
+        "ix_complaint_model_service_company_id",
+    ):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    _create_indexes(
+        conn,
+        [
+            ("ix_car_model_client_id_shipment_date", "car_model", ["client_id", "shipment_date"]),
+            (
+                "ix_car_model_service_company_id_shipment_date",
+                "car_model",
+                ["service_company_id", "shipment_date"],
+            ),
+            (
+                "ix_tech_maintenance_extend_model_service_company_id_date",
+                "tech_maintenance_extend_model",
+                ["service_company_id", "maintenance_date"],
+            ),
+            (
+                "ix_complaint_model_service_company_id_date",
+                "complaint_model",
+                ["service_company_id", "date_of_failure"],
+            ),
+        ],
+    )
+
+
+def _0006_hash_user_passwords(conn) -> None:
+    from security import hash_password, is_password_hash
+
+    users = conn.execute(text("SELECT id, password FROM users")).all()
+    for user_id, password in users:
+        if not is_password_hash(password):
+            conn.execute(
+                text("UPDATE users SET password = :password WHERE id = :id"),
+                {"password": hash_password(password), "id": user_id},
+            )
+
+
+# Полнотекстовые индексы: индекс -> (таблица, столбцы). В SQLite это таблицы
+# FTS5, содержимое которых берётся из самой таблицы (content=), а поддерживают
+# их триггеры, поэтому в синхроне остаются и записи через API, и массовые
+# вставки, и импорт. В PostgreSQL — GIN-индексы по tsvector от тех же столбцов.
+SEARCH_INDEXES = {
+    "car_search": (
+        "car_model",
+        [
+            "vin",
+            "engine_number",
+            "transmission_number",
+            "drive_axle_number",
+            "steering_axle_number",
+            "delivery_address",
+        ],
+    ),
+    "complaint_search": ("complaint_model", ["description_failure"]),
+}
+
+# Индексы префиксов длиной 2–4 символа: подсказки при вводе не перебирают
+# все термы с таким началом
+SEARCH_PREFIX_LENGTHS = "2 3 4"
+
+
+def _create_search_index(conn, name: str, table: str, columns) -> None:
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5("
+        f"{cols}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='{SEARCH_PREFIX_LENGTHS}')"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {name}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {name}(rowid, {cols}) VALUES (new.id, {new}); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {name}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {name}({name}, rowid, {cols}) VALUES ('delete', old.id, {old}); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {name}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {name}({name}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {name}(rowid, {cols}) VALUES (new.id, {new}); END"
+    ))
+    # Индексируем уже существующие строки
+    conn.execute(text(f"INSERT INTO {name}({name}) VALUES ('rebuild')"))
+
+
+def search_document(columns, table: str = "") -> str:
+    """Текст документа для поиска в PostgreSQL.
+
+    Дефис и слеш заменяются пробелами: иначе «ENG-123» разбирается в «eng» и
+    число «-123», и поиск по «123» не находит номер. В выражении индекса
+    допустимы только неизменяемые функции, поэтому coalesce и ||, а не concat_ws.
+    """
+    prefix = f"{table}." if table else ""
+    text_sql = " || ' ' || ".join(f"coalesce({prefix}{c}, '')" for c in columns)
+    return f"translate({text_sql}, '-/', '  ')"
+
+
+def search_vector(columns, table: str = "") -> str:
+    """Выражение GIN-индекса; запрос должен повторять его, иначе индекс не используется"""
+    return f"to_tsvector('simple', {search_document(columns, table)})"
+
+
+def _0007_search_indexes(conn) -> None:
+    for name, (table, columns) in SEARCH_INDEXES.items():
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {table} "
+                f"USING gin ({search_vector(columns)})"
+            ))
+        else:
+            _create_search_index(conn, name, table, columns)
+
+
+def _0008_jobs(conn) -> None:
+    models.JobModel.__table__.create(conn, checkfirst=True)
+
+
+# Таблицы, из версий которых собираются ETag списков и справочников
+VERSIONED_TABLES = (
+    "car_model",
+    "tech_maintenance_extend_model",
+    "complaint_model",
+    "clients",
+    "vehicle_model",
+    "engine_model",
+    "transmission_model",
+    "drive_axle_model",
+    "steering_axle_model",
+    "tech_maintenance_model",
+    "recovery_method_model",
+    "failure_node_model",
+    "service_company_model",
+)
+
+
+def _0009_table_versions(conn) -> None:
+    versions = models.TableVersionModel.__table__
+    versions.create(conn, checkfirst=True)
+    existing = set(conn.execute(select(versions.c.table_name)).scalars())
+    for table in VERSIONED_TABLES:
+        if table in existing:
+            continue
+        # Случайное начальное значение: после пересоздания БД (seed.py) версии
+        # не совпадут с тегами, которые клиенты получили до него
+        conn.execute(
+            versions.insert().values(table_name=table, version=secrets.randbelow(2 ** 30))
+        )
+
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            "CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$ "
+            "BEGIN UPDATE table_versions SET version = version + 1 "
+            "WHERE table_name = TG_TABLE_NAME; RETURN NULL; END $$ LANGUAGE plpgsql"
+        ))
+        for table in VERSIONED_TABLES:
+            # Один раз на выражение, а не на строку: массовая вставка — одно обновление
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_version ON {table}"))
+            conn.execute(text(
+                f"CREATE TRIGGER {table}_version "
+                f"AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                f"FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()"
+            ))
+        return
+
+    # В SQLite триггеры только построчные
+    for table in VERSIONED_TABLES:
+        for suffix, operation in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE")):
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} "
+                f"AFTER {operation} ON {table} BEGIN "
+                f"UPDATE table_versions SET version = version + 1 "
+                f"WHERE table_name = '{table}'; END"
+            ))
+
+
+def _0010_job_heartbeat(conn) -> None:
+    # На свежей БД столбцы уже создала миграция 1 по текущей модели
+    existing = {column["name"] for column in inspect(conn).get_columns("jobs")}
+    for column in ("claimed_by", "heartbeat_at"):
+        if column not in existing:
+            column_type = models.JobModel.__table__.c[column].type.compile(conn.dialect)
+            conn.execute(text(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}"))
+
+
+# (версия, описание, функция миграции)
+MIGRATIONS = [
+    (1, "Начальная схема", _0001_initial_schema),
+    (2, "Индексы по внешним ключам и датам", _0002_fk_and_date_indexes),
+    (3, "Типизированные даты и наработка в рекламациях", _0003_typed_complaint_columns),
+    (4, "Сводные таблицы аналитики", _0004_analytics_summaries),
+    (5, "Индексы для выборок по ролям", _0005_role_scope_indexes),
+    (6, "Хэширование паролей пользователей", _0006_hash_user_passwords),
+    (7, "Полнотекстовый поиск", _0007_search_indexes),
+    (8, "Фоновые задачи", _0008_jobs),
+    (9, "Версии таблиц для ETag", _0009_table_versions),
+    (10, "Владелец и сигнал жизни фоновых задач", _0010_job_heartbeat),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn) -> int:
+    if not inspect(conn).has_table(schema_migrations.name):
+        return 0
+    return conn.execute(select(func.max(schema_migrations.c.version))).scalar() or 0
+
+
+def upgrade(conn) -> int:
+    """Применяет недостающие миграции и возвращает итоговую версию схемы"""
+    version = current_version(conn)
+    if version >= LATEST_VERSION:
+        return version
+
+    version_metadata.create_all(conn)
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        migrate(conn)
+        conn.execute(
+            schema_migrations.insert().values(
+                version=number, description=description, applied_at=datetime.now()
+            )
+        )
+        logger.info("Применена миграция %s: %s", number, description)
+    return LATEST_VERSION
+
+
+def reset(conn) -> None:
+    """Удаляет все таблицы вместе с историей миграций"""
+    if conn.dialect.name == "sqlite":
+        # Триггеры поиска удаляются вместе со своими таблицами
+        for name in SEARCH_INDEXES:
+            conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    Base.metadata.drop_all(conn)
+    version_metadata.drop_all(conn)
+    logger.info("Таблицы и история миграций удалены")
+
+
+async def main():
+    async with engine.begin() as conn:
+        version = await conn.run_sync(upgrade)
+    await engine.dispose()
+    logger.info("Версия схемы: %s", version)
+
+
+if __name__ == "__main__":
+    import asyncio
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(main())
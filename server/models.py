@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, CheckConstraint, Enum
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, CheckConstraint, Enum, Index, Text
 from sqlalchemy.orm import relationship
 from database import Base
 from enum import Enum as PyEnum
 
+# Все связи объявлены с lazy="raise": в асинхронной сессии скрытый запрос при
+# обращении к атрибуту невозможен, поэтому связи загружаются явно
+# (selectinload/joinedload), а обращение к незагруженной — исключение
+
 # Модель "Роль пользователя"
 class UserRole(str, PyEnum):
     no_auth = "no_auth"
@@ -19,7 +23,7 @@ class Client(Base):
     password = Column(String(255), nullable=False)
     name = Column(String(255), nullable=False)
 
-    cars = relationship("CarModel", back_populates="client")
+    cars = relationship("CarModel", back_populates="client", lazy="raise")
 
 # Модели "Справочник"
 class VehicleModel(Base):
@@ -29,7 +33,7 @@ class VehicleModel(Base):
     name = Column(String(255), unique=True, nullable=False)
     description = Column(String, nullable=True)
 
-    cars = relationship("CarModel", back_populates="vehicle_model")
+    cars = relationship("CarModel", back_populates="vehicle_model", lazy="raise")
 
 class EngineModel(Base):
     __tablename__ = "engine_model"
@@ -38,7 +42,7 @@ class EngineModel(Base):
     name = Column(String(255), unique=True, nullable=False)
     description = Column(String, nullable=True)
 
-    cars = relationship("CarModel", back_populates="engine_model")
+    cars = relationship("CarModel", back_populates="engine_model", lazy="raise")
 
 class TransmissionModel(Base):
     __tablename__ = "transmission_model"
@@ -47,7 +51,7 @@ class TransmissionModel(Base):
     name = Column(String(255), unique=True, nullable=False)
     description = Column(String, nullable=True)
 
-    cars = relationship("CarModel", back_populates="transmission_model")
+    cars = relationship("CarModel", back_populates="transmission_model", lazy="raise")
 
 class DriveAxleModel(Base):
     __tablename__ = "drive_axle_model"
@@ -56,7 +60,7 @@ class DriveAxleModel(Base):
     name = Column(String(255), unique=True, nullable=False)
     description = Column(String, nullable=True)
 
-    cars = relationship("CarModel", back_populates="drive_axle_model")
+    cars = relationship("CarModel", back_populates="drive_axle_model", lazy="raise")
 
 class SteeringAxleModel(Base):
     __tablename__ = "steering_axle_model"
@@ -65,7 +69,7 @@ class SteeringAxleModel(Base):
     name = Column(String(255), unique=True, nullable=False)
     description = Column(String, nullable=True)
 
-    cars = relationship("CarModel", back_populates="steering_axle_model")
+    cars = relationship("CarModel", back_populates="steering_axle_model", lazy="raise")
 
 class TechMaintenanceModel(Base):
     __tablename__ = "tech_maintenance_model"
@@ -74,7 +78,7 @@ class TechMaintenanceModel(Base):
     name = Column(String(255), unique=True, nullable=False)
     description = Column(String, nullable=True)
 
-    maintenance_extend = relationship("TechMaintenanceExtendModel", back_populates="maintenance")
+    maintenance_extend = relationship("TechMaintenanceExtendModel", back_populates="maintenance", lazy="raise")
 
 class RecoveryMethodModel(Base):
     __tablename__ = "recovery_method_model"
@@ -83,7 +87,7 @@ class RecoveryMethodModel(Base):
     name = Column(String(255), unique=True, nullable=False)
     description = Column(String, nullable=True)
 
-    complaints = relationship("ComplaintModel", back_populates="recovery_method")
+    complaints = relationship("ComplaintModel", back_populates="recovery_method", lazy="raise")
 
 class FailureNodeModel(Base):
     __tablename__ = "failure_node_model"
@@ -92,7 +96,7 @@ class FailureNodeModel(Base):
     name = Column(String(255), unique=True, nullable=False)
     description = Column(String, nullable=True)
 
-    complaints = relationship("ComplaintModel", back_populates="node_failure")
+    complaints = relationship("ComplaintModel", back_populates="node_failure", lazy="raise")
 
 class ServiceCompanyModel(Base):
     __tablename__ = "service_company_model"
@@ -101,9 +105,9 @@ class ServiceCompanyModel(Base):
     name = Column(String(255), unique=True, nullable=False)
     description = Column(String, nullable=True)
 
-    maintenance_extend = relationship("TechMaintenanceExtendModel", back_populates="service_company")
-    cars = relationship("CarModel", back_populates="service_company_model")
-    complaints = relationship("ComplaintModel", back_populates="service_company")
+    maintenance_extend = relationship("TechMaintenanceExtendModel", back_populates="service_company", lazy="raise")
+    cars = relationship("CarModel", back_populates="service_company_model", lazy="raise")
+    complaints = relationship("ComplaintModel", back_populates="service_company", lazy="raise")
 
 # Модель "Машина"
 class CarModel(Base):
@@ -111,17 +115,17 @@ class CarModel(Base):
 
     id = Column(Integer, primary_key=True)
     vin = Column(String(17), unique=True, nullable=False)
-    vehicle_model_id = Column(Integer, ForeignKey("vehicle_model.id"), nullable=False)
-    engine_model_id = Column(Integer, ForeignKey("engine_model.id"), nullable=False)
+    vehicle_model_id = Column(Integer, ForeignKey("vehicle_model.id"), nullable=False, index=True)
+    engine_model_id = Column(Integer, ForeignKey("engine_model.id"), nullable=False, index=True)
     engine_number = Column(String(255), nullable=False)
-    transmission_model_id = Column(Integer, ForeignKey("transmission_model.id"), nullable=False)
+    transmission_model_id = Column(Integer, ForeignKey("transmission_model.id"), nullable=False, index=True)
     transmission_number = Column(String(255), nullable=False)
-    drive_axle_model_id = Column(Integer, ForeignKey("drive_axle_model.id"), nullable=False)
+    drive_axle_model_id = Column(Integer, ForeignKey("drive_axle_model.id"), nullable=False, index=True)
     drive_axle_number = Column(String(255), nullable=False)
-    steering_axle_model_id = Column(Integer, ForeignKey("steering_axle_model.id"), nullable=False)
+    steering_axle_model_id = Column(Integer, ForeignKey("steering_axle_model.id"), nullable=False, index=True)
     steering_axle_number = Column(String(255), nullable=False)
     delivery_agreement = Column(String(255))
-    shipment_date = Column(Date, nullable=False)
+    shipment_date = Column(Date, nullable=False, index=True)
     recipient = Column(String(255))
     delivery_address = Column(String(255))
     equipment = Column(String(255))
@@ -129,18 +133,21 @@ class CarModel(Base):
     service_company_id = Column(Integer, ForeignKey("service_company_model.id"), nullable=False)
 
     # Relationships
-    vehicle_model = relationship("VehicleModel", back_populates="cars")
-    engine_model = relationship("EngineModel", back_populates="cars")
-    transmission_model = relationship("TransmissionModel", back_populates="cars")
-    drive_axle_model = relationship("DriveAxleModel", back_populates="cars")
-    steering_axle_model = relationship("SteeringAxleModel", back_populates="cars")
-    client = relationship("Client", back_populates="cars")
-    service_company_model = relationship("ServiceCompanyModel", back_populates="cars")
-    maintenance_extend = relationship("TechMaintenanceExtendModel", back_populates="car")
-    complaints = relationship("ComplaintModel", back_populates="car")
+    vehicle_model = relationship("VehicleModel", back_populates="cars", lazy="raise")
+    engine_model = relationship("EngineModel", back_populates="cars", lazy="raise")
+    transmission_model = relationship("TransmissionModel", back_populates="cars", lazy="raise")
+    drive_axle_model = relationship("DriveAxleModel", back_populates="cars", lazy="raise")
+    steering_axle_model = relationship("SteeringAxleModel", back_populates="cars", lazy="raise")
+    client = relationship("Client", back_populates="cars", lazy="raise")
+    service_company_model = relationship("ServiceCompanyModel", back_populates="cars", lazy="raise")
+    maintenance_extend = relationship("TechMaintenanceExtendModel", back_populates="car", lazy="raise")
+    complaints = relationship("ComplaintModel", back_populates="car", lazy="raise")
 
     __table_args__ = (
         CheckConstraint('LENGTH(vin) = 17', name='check_vin_length'),
+        # Выборки машин клиента и сервисной компании (ограничение по роли)
+        Index("ix_car_model_client_id_shipment_date", "client_id", "shipment_date"),
+        Index("ix_car_model_service_company_id_shipment_date", "service_company_id", "shipment_date"),
     )
 
 # Модель "ТО"
@@ -149,15 +156,25 @@ class TechMaintenanceExtendModel(Base):
 
     id = Column(Integer, primary_key=True)
     car_id = Column(Integer, ForeignKey("car_model.id"), nullable=False)
-    maintenance_type_id = Column(Integer, ForeignKey("tech_maintenance_model.id"), nullable=False)
-    maintenance_date = Column(Date, nullable=False)
+    maintenance_type_id = Column(Integer, ForeignKey("tech_maintenance_model.id"), nullable=False, index=True)
+    maintenance_date = Column(Date, nullable=False, index=True)
     order_number = Column(String(10))
-    order_date = Column(Date, nullable=False)
+    order_date = Column(Date, nullable=False, index=True)
     service_company_id = Column(Integer, ForeignKey("service_company_model.id"), nullable=False)
 
-    car = relationship("CarModel", back_populates="maintenance_extend")
-    maintenance = relationship("TechMaintenanceModel", back_populates="maintenance_extend")
-    service_company = relationship("ServiceCompanyModel", back_populates="maintenance_extend")
+    car = relationship("CarModel", back_populates="maintenance_extend", lazy="raise")
+    maintenance = relationship("TechMaintenanceModel", back_populates="maintenance_extend", lazy="raise")
+    service_company = relationship("ServiceCompanyModel", back_populates="maintenance_extend", lazy="raise")
+
+    __table_args__ = (
+        # История ТО конкретной машины в хронологическом порядке
+        Index("ix_tech_maintenance_extend_model_car_id_date", "car_id", "maintenance_date"),
+        Index(
+            "ix_tech_maintenance_extend_model_service_company_id_date",
+            "service_company_id",
+            "maintenance_date",
+        ),
+    )
 
 # Модель "Рекламация"
 class ComplaintModel(Base):
@@ -165,21 +182,29 @@ class ComplaintModel(Base):
 
     id = Column(Integer, primary_key=True)
     car_id = Column(Integer, ForeignKey("car_model.id"), nullable=False)
-    date_of_failure = Column(String(255), nullable=False)
-    operating_time = Column(String(255), nullable=False)  # Changed from Date to String
-    node_failure_id = Column(Integer, ForeignKey("failure_node_model.id"), nullable=False)
+    date_of_failure = Column(Date, nullable=False, index=True)
+    # Наработка, м/час; NULL только у старых записей с нечисловым значением
+    operating_time = Column(Integer)
+    node_failure_id = Column(Integer, ForeignKey("failure_node_model.id"), nullable=False, index=True)
     description_failure = Column(String(255))
-    recovery_method_id = Column(Integer, ForeignKey("recovery_method_model.id"), nullable=False)
+    recovery_method_id = Column(Integer, ForeignKey("recovery_method_model.id"), nullable=False, index=True)
     used_spare_parts = Column(String(255))
-    date_recovery = Column(String(255))
-    equipment_downtime = Column(String(255))
+    date_recovery = Column(Date)
+    # Время простоя в днях, вычисляется при записи
+    equipment_downtime = Column(Integer)
     vehicle_model = Column(String(255))
     service_company_id = Column(Integer, ForeignKey("service_company_model.id"), nullable=False)
 
-    car = relationship("CarModel", back_populates="complaints")
-    node_failure = relationship("FailureNodeModel", back_populates="complaints")
-    recovery_method = relationship("RecoveryMethodModel", back_populates="complaints")
-    service_company = relationship("ServiceCompanyModel", back_populates="complaints")
+    car = relationship("CarModel", back_populates="complaints", lazy="raise")
+    node_failure = relationship("FailureNodeModel", back_populates="complaints", lazy="raise")
+    recovery_method = relationship("RecoveryMethodModel", back_populates="complaints", lazy="raise")
+    service_company = relationship("ServiceCompanyModel", back_populates="complaints", lazy="raise")
+
+    __table_args__ = (
+        # История рекламаций конкретной машины в хронологическом порядке
+        Index("ix_complaint_model_car_id_date", "car_id", "date_of_failure"),
+        Index("ix_complaint_model_service_company_id_date", "service_company_id", "date_of_failure"),
+    )
 
 
 class User(Base):
@@ -193,5 +218,59 @@ class User(Base):
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=True)
     service_company_id = Column(Integer, ForeignKey("service_company_model.id"), nullable=True)
 
-    client = relationship("Client")
-    service_company = relationship("ServiceCompanyModel")
\ No newline at end of file
+    client = relationship("Client", lazy="raise")
+    service_company = relationship("ServiceCompanyModel", lazy="raise")
+
+
+# Сводные таблицы аналитики, обновляются при записи рекламаций и ТО
+class ComplaintSummaryModel(Base):
+    __tablename__ = "complaint_summary"
+
+    # Разрез: node_failure, recovery_method, service_company или vehicle_model
+    dimension = Column(String(32), primary_key=True)
+    key_id = Column(Integer, primary_key=True)
+    failure_count = Column(Integer, nullable=False, default=0)
+    downtime_days_total = Column(Integer, nullable=False, default=0)
+    # Количество рекламаций с известным временем простоя
+    downtime_count = Column(Integer, nullable=False, default=0)
+
+
+class MaintenanceSummaryModel(Base):
+    __tablename__ = "maintenance_summary"
+
+    maintenance_type_id = Column(Integer, ForeignKey("tech_maintenance_model.id"), primary_key=True)
+    month = Column(String(7), primary_key=True)  # YYYY-MM
+    maintenance_count = Column(Integer, nullable=False, default=0)
+
+
+# Фоновые задачи (jobs.py): выгрузки и пересчёты вне HTTP-запроса
+class JobModel(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(64), nullable=False)
+    # queued, running, succeeded, failed или cancelled
+    status = Column(String(16), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    params = Column(Text, nullable=False)  # JSON
+    progress = Column(Integer, nullable=False, default=0)
+    total = Column(Integer)
+    # Файл результата относительно каталога задач
+    result_file = Column(String(255))
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    # Исполнитель, взявший задачу, и время его последнего сигнала. Задачу
+    # без сигнала дольше SILANT_JOB_STALE_SECONDS снова ставят в очередь
+    claimed_by = Column(String(64))
+    heartbeat_at = Column(DateTime)
+
+
+# Версии таблиц для ETag (table_versions.py). Увеличиваются триггерами БД при
+# любой записи: через API, импортом, seed.py или из другого процесса
+class TableVersionModel(Base):
+    __tablename__ = "table_versions"
+
+    table_name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,140 @@
+import base64
+import json
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy import and_, or_
+
+from query_stats import skip_budget
+
+# Размер страницы списочных эндпоинтов по умолчанию и максимальный
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def page_limit(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    all_rows: bool = Query(
+        False, alias="all", description="Весь список одним ответом, без пагинации"
+    ),
+) -> Optional[int]:
+    """Размер страницы; None — весь список, только если он запрошен явно"""
+    if all_rows:
+        skip_budget()
+        return None
+    return limit
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    """Кодирует позицию последней строки страницы в непрозрачный курсор"""
+    if isinstance(sort_value, date):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return sort_value, int(row_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор"
+        )
+
+
+def parse_sort(sort: str, allowed: Dict[str, Any]) -> Tuple[str, Any, bool]:
+    """Разбирает параметр сортировки вида 'field' или '-field'"""
+    descending = sort.startswith("-")
+    key = sort.lstrip("-")
+    if key not in allowed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Недопустимое поле сортировки: {key}. "
+            f"Допустимые значения: {', '.join(allowed)}",
+        )
+    return key, allowed[key], descending
+
+
+def apply_keyset(
+    stmt,
+    sort_column,
+    id_column,
+    descending: bool,
+    cursor: Optional[str],
+    limit: Optional[int],
+):
+    """Добавляет к запросу сортировку и условие keyset-пагинации.
+
+    Сортировка всегда дополняется первичным ключом, чтобы порядок был
+    однозначным и курсор указывал ровно на одну строку.
+    """
+    if sort_column is id_column:
+        order = [id_column.desc() if descending else id_column.asc()]
+    else:
+        order = (
+            [sort_column.desc(), id_column.desc()]
+            if descending
+            else [sort_column.asc(), id_column.asc()]
+        )
+    stmt = stmt.order_by(*order)
+
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        if sort_column is id_column:
+            cond = id_column < last_id if descending else id_column > last_id
+        else:
+            sort_value = _coerce(sort_column, sort_value)
+            if descending:
+                cond = or_(
+                    sort_column < sort_value,
+                    and_(sort_column == sort_value, id_column < last_id),
+                )
+            else:
+                cond = or_(
+                    sort_column > sort_value,
+                    and_(sort_column == sort_value, id_column > last_id),
+                )
+        stmt = stmt.where(cond)
+
+    if limit is not None:
+        # Запрашиваем на одну строку больше, чтобы узнать, есть ли следующая страница
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
+
+def _coerce(column, value):
+    python_type = None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        pass
+    if python_type is date and isinstance(value, str):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор"
+            )
+    return value
+
+
+def finalize_page(
+    rows: Sequence[Any],
+    limit: Optional[int],
+    sort_attr: str,
+    response: Response,
+) -> List[Any]:
+    """Отрезает лишнюю строку и выставляет заголовок со следующим курсором"""
+    if limit is None or len(rows) <= limit:
+        return list(rows)
+    page = list(rows[:limit])
+    last = page[-1]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+        getattr(last, sort_attr), last.id
+    )
+    return page
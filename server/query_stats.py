@@ -0,0 +1,174 @@
+"""Учёт SQL-запросов в пределах одного HTTP-запроса.
+
+Статистика запроса хранится в contextvar: SQLAlchemy выполняет драйвер в
+greenlet с тем же контекстом, поэтому события движка (см. metrics.py)
+попадают в статистику именно того запроса, который их вызвал.
+
+SILANT_QUERY_DEBUG=1 — число запросов и время БД в заголовках ответа.
+SILANT_QUERY_STRICT=1 (для разработки и тестов) — превышение бюджета
+маршрута превращается в ответ 500, без него только пишется в лог. Ленивая
+загрузка связей запрещена всегда (lazy="raise" в models.py).
+"""
+import json
+import logging
+import os
+from contextvars import ContextVar
+from typing import Optional
+
+QUERY_DEBUG = os.getenv("SILANT_QUERY_DEBUG", "0") == "1"
+QUERY_STRICT = os.getenv("SILANT_QUERY_STRICT", "0") == "1"
+
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+QUERY_TIME_HEADER = "X-DB-Time-Ms"
+
+logger = logging.getLogger("silant.sql")
+
+# (метод, шаблон пути) -> допустимое число SQL-выражений на запрос.
+# Списки: версии таблиц для ETag, основной запрос и по одному selectinload
+# на каждую связь (для страницы; у всего списка, all=true, бюджета нет).
+# Массовая регистрация машин бюджета не имеет: число запросов растёт с
+# размером пачки (VIN проверяются частями по IN_CHUNK_SIZE).
+ROUTE_QUERY_BUDGETS = {
+    ("POST", "/api/login"): 1,
+    ("GET", "/api/cars/{vin}"): 1,
+    # Версии таблиц, машина и по запросу на ТО и рекламации
+    ("GET", "/api/cars/{vin}/history"): 4,
+    ("GET", "/api/cars"): 9,
+    ("POST", "/api/cars"): 3,
+    ("GET", "/api/maintenance"): 5,
+    ("POST", "/api/maintenance"): 4,
+    ("GET", "/api/complaints"): 7,
+    ("POST", "/api/complaints"): 3,
+    ("GET", "/api/analytics/failures/{dimension}"): 1,
+    ("GET", "/api/analytics/maintenance"): 1,
+    ("GET", "/api/tables"): 1,
+    # Справочники берутся из кэша в памяти, из БД — только версии таблиц
+    ("GET", "/api/bootstrap"): 1,
+    # По запросу на машины и на рекламации
+    ("GET", "/api/search"): 2,
+    # Фоновые задачи: постановка — одна вставка, отмена — чтение, UPDATE и
+    # перечитывание статуса
+    ("POST", "/api/cars/export"): 1,
+    ("POST", "/api/maintenance/export"): 1,
+    ("POST", "/api/complaints/export"): 1,
+    ("POST", "/api/analytics/rebuild"): 1,
+    ("GET", "/api/jobs"): 1,
+    ("GET", "/api/jobs/{job_id}"): 1,
+    ("POST", "/api/jobs/{job_id}/cancel"): 3,
+    ("GET", "/api/jobs/{job_id}/result"): 1,
+    # Токен проверяется без БД, события приходят из памяти процесса
+    ("GET", "/api/events"): 0,
+    ("POST", "/api/events/ticket"): 0,
+}
+# Справочники /api/models/*: чтение — версия таблицы и строки, изменение —
+# чтение, проверка ссылок и запись
+DIRECTORY_READ_BUDGET = 2
+DIRECTORY_WRITE_BUDGET = 4
+
+
+class RequestQueryStats:
+    __slots__ = ("count", "duration", "unbudgeted")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.unbudgeted = False
+
+
+_current: ContextVar[Optional[RequestQueryStats]] = ContextVar(
+    "request_query_stats", default=None
+)
+
+
+def current_stats() -> Optional[RequestQueryStats]:
+    return _current.get()
+
+
+def record_statement(elapsed: float) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+
+
+def skip_budget() -> None:
+    """Снимает бюджет с текущего запроса: число запросов растёт с объёмом
+    ответа (весь список без пагинации — selectinload делит IN на части)"""
+    stats = _current.get()
+    if stats is not None:
+        stats.unbudgeted = True
+
+
+def route_budget(method: str, route: Optional[str]) -> Optional[int]:
+    if route is None:
+        return None
+    budget = ROUTE_QUERY_BUDGETS.get((method, route))
+    if budget is None and route.startswith("/api/models/"):
+        budget = DIRECTORY_READ_BUDGET if method == "GET" else DIRECTORY_WRITE_BUDGET
+    return budget
+
+
+class QueryStatsMiddleware:
+    """Считает SQL-выражения каждого запроса и сверяет их с бюджетом маршрута"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = _current.set(stats)
+        method = scope["method"]
+        replaced = False
+
+        async def send_wrapper(message):
+            nonlocal replaced
+            if replaced:
+                return
+            if message["type"] == "http.response.start":
+                # Ответ ещё не отправлен, все запросы обработчика уже выполнены
+                route = getattr(scope.get("route"), "path", None)
+                budget = route_budget(method, route)
+                if budget is not None and not stats.unbudgeted and stats.count > budget:
+                    error = (
+                        f"{method} {route}: {stats.count} SQL-запросов "
+                        f"при бюджете {budget}"
+                    )
+                    logger.warning(error)
+                    if QUERY_STRICT:
+                        replaced = True
+                        await _send_error(send, f"Превышен бюджет SQL-запросов: {error}")
+                        return
+                if QUERY_DEBUG:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (QUERY_COUNT_HEADER.lower().encode(), str(stats.count).encode()),
+                        (QUERY_TIME_HEADER.lower().encode(), f"{stats.duration * 1000:.2f}".encode()),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "%s %s: %d SQL-запросов, %.2f мс",
+                    method, scope["path"], stats.count, stats.duration * 1000,
+                )
+
+
+async def _send_error(send, detail: str) -> None:
+    body = json.dumps({"detail": detail}, ensure_ascii=False).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 500,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
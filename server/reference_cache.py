@@ -0,0 +1,194 @@
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from models import (
+    VehicleModel,
+    EngineModel,
+    TransmissionModel,
+    DriveAxleModel,
+    SteeringAxleModel,
+    TechMaintenanceModel,
+    FailureNodeModel,
+    RecoveryMethodModel,
+    ServiceCompanyModel,
+    Client,
+    TableVersionModel,
+)
+from events import event_broker
+from query_stats import skip_budget
+
+# Справочники, которые держим в памяти процесса
+REFERENCE_MODELS = (
+    VehicleModel,
+    EngineModel,
+    TransmissionModel,
+    DriveAxleModel,
+    SteeringAxleModel,
+    TechMaintenanceModel,
+    FailureNodeModel,
+    RecoveryMethodModel,
+    ServiceCompanyModel,
+    Client,
+)
+
+
+class RefEntry(NamedTuple):
+    id: int
+    name: str
+    description: Optional[str]
+
+
+class ReferenceCache:
+    """Кэш справочников в памяти процесса.
+
+    Загружается при старте приложения и обновляется обработчиками
+    PUT/DELETE справочников после коммита. Для каждой таблицы запоминается
+    её версия в БД (table_versions) на момент загрузки: справочник, изменённый
+    другим процессом, перечитывается при следующем условном GET (sync).
+    Общий `version` растёт при любом изменении кэша, но не при дочитывании
+    промахов; изменения через API публикуются событием directory в /api/events.
+    """
+
+    def __init__(self):
+        self._tables: Dict[type, Dict[int, RefEntry]] = {}
+        self._by_name: Dict[type, Dict[str, int]] = {}
+        # Версия таблицы в БД, с которой загружен справочник
+        self._loaded: Dict[type, Optional[int]] = {}
+        self.version = 0
+
+    @staticmethod
+    def _entry(obj) -> RefEntry:
+        return RefEntry(obj.id, obj.name, getattr(obj, "description", None))
+
+    def _bump(self) -> None:
+        self.version += 1
+
+    async def load(self, db: AsyncSession) -> None:
+        for model_class in REFERENCE_MODELS:
+            await self.reload(db, model_class)
+
+    async def reload(
+        self, db: AsyncSession, model_class: type, version: Optional[int] = None
+    ) -> None:
+        if version is None:
+            # Версия читается до строк: изменение между запросами лишь
+            # вызовет ещё одно перечитывание, но не потеряется
+            result = await db.execute(
+                select(TableVersionModel.version).where(
+                    TableVersionModel.table_name == model_class.__tablename__
+                )
+            )
+            version = result.scalar_one_or_none()
+        result = await db.execute(select(model_class))
+        self._tables[model_class] = {
+            obj.id: self._entry(obj) for obj in result.scalars().all()
+        }
+        self._by_name[model_class] = {
+            entry.name: entry.id for entry in self._tables[model_class].values()
+        }
+        self._loaded[model_class] = version
+        self._bump()
+
+    async def sync(self, db: AsyncSession, versions: Dict[str, int]) -> None:
+        """Перечитывает справочники, версия которых в БД отличается от загруженной"""
+        for model_class in REFERENCE_MODELS:
+            version = versions.get(model_class.__tablename__)
+            if version is not None and version != self._loaded.get(model_class):
+                # Разовое перечитывание после изменения не считается в бюджет запроса
+                skip_budget()
+                await self.reload(db, model_class, version)
+
+    def put(self, model_class: type, obj) -> None:
+        """Изменение справочника через API (после коммита)"""
+        self._store(model_class, obj)
+        self._bump()
+        self._publish(model_class, obj.id, "updated")
+
+    def remove(self, model_class: type, model_id: int) -> None:
+        old = self._tables.get(model_class, {}).pop(model_id, None)
+        if old is not None:
+            self._by_name.get(model_class, {}).pop(old.name, None)
+        self._bump()
+        self._publish(model_class, model_id, "deleted")
+
+    def _publish(self, model_class: type, model_id: int, action: str) -> None:
+        event_broker.publish(
+            "directory",
+            {
+                "action": action,
+                "table": model_class.__tablename__,
+                "id": model_id,
+                "version": self.version,
+            },
+        )
+
+    def _store(self, model_class: type, obj) -> None:
+        table = self._tables.setdefault(model_class, {})
+        names = self._by_name.setdefault(model_class, {})
+        old = table.get(obj.id)
+        if old is not None:
+            names.pop(old.name, None)
+        entry = self._entry(obj)
+        table[obj.id] = entry
+        names[entry.name] = entry.id
+
+    def get(self, model_class: type, model_id: Optional[int]) -> Optional[RefEntry]:
+        if model_id is None:
+            return None
+        return self._tables.get(model_class, {}).get(model_id)
+
+    def entries(self, model_class: type) -> List[RefEntry]:
+        """Все записи справочника в порядке id"""
+        table = self._tables.get(model_class, {})
+        return [table[model_id] for model_id in sorted(table)]
+
+    def name(self, model_class: type, model_id: Optional[int], default: str = "") -> str:
+        entry = self.get(model_class, model_id)
+        return entry.name if entry else default
+
+    def id_by_name(self, model_class: type, name: str) -> Optional[int]:
+        return self._by_name.get(model_class, {}).get(name)
+
+    async def resolve(
+        self, db: AsyncSession, model_class: type, model_id: Optional[int]
+    ) -> Optional[RefEntry]:
+        """Возвращает запись справочника, обращаясь к БД только при промахе.
+
+        Промах бывает для несуществующих id или строк, добавленных в обход API
+        (например, seed.py); найденная в БД запись сразу попадает в кэш.
+        """
+        if model_id is None:
+            return None
+        entry = self.get(model_class, model_id)
+        if entry is not None:
+            return entry
+        obj = await db.get(model_class, model_id)
+        if obj is None:
+            return None
+        # Дочитанная строка — промах кэша, а не изменение: событие не нужно
+        self._store(model_class, obj)
+        return self.get(model_class, model_id)
+
+    async def ensure(
+        self, db: AsyncSession, model_class: type, ids: Iterable[Optional[int]]
+    ) -> Set[int]:
+        """Проверяет набор id сразу и возвращает существующие.
+
+        Отсутствующие в кэше id дочитываются одним запросом с IN.
+        """
+        wanted = {i for i in ids if i is not None}
+        table = self._tables.get(model_class, {})
+        missing = [i for i in wanted if i not in table]
+        if missing:
+            result = await db.execute(
+                select(model_class).where(model_class.id.in_(missing))
+            )
+            for obj in result.scalars().all():
+                self._store(model_class, obj)
+            table = self._tables.get(model_class, {})
+        return {i for i in wanted if i in table}
+
+
+reference_cache = ReferenceCache()
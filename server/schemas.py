@@ -13,6 +13,10 @@ class LoginResponse(BaseModel):
     username: str
     role: str
     name: str | None = None
+    client_id: int | None = None
+    service_company_id: int | None = None
+    token: str = Field(..., description="Токен для заголовка Authorization: Bearer")
+    expires_at: int = Field(..., description="Окончание действия токена (unix time)")
 
     class Config:
         from_attributes = True
@@ -0,0 +1,248 @@
+"""Аутентификация и ограничение выборок ролью пользователя.
+
+Пароли хранятся в виде scrypt-хэша. Проверка намеренно медленная, поэтому
+выполняется в пуле потоков и не блокирует цикл событий.
+
+При входе выдаётся подписанный HMAC-SHA256 токен со сроком действия,
+в котором записаны id пользователя, роль и id клиента/сервисной компании.
+Токен проверяется без обращения к БД.
+
+Клиент видит только свои машины и их историю, сервисная компания — машины,
+которые она обслуживает, и записи, которые она внесла, менеджер — всё.
+Условия добавляются в SQL-запрос, поэтому объём выборки и ответа зависит
+от того, что пользователь вправе видеть, а не от размера всего парка.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from typing import NamedTuple, Optional, Tuple
+
+from fastapi import Depends, Header, HTTPException, Query, status
+from sqlalchemy import false
+from sqlalchemy.future import select
+
+from models import CarModel, UserRole
+
+# Режим разработки: допускает запуск без SILANT_SECRET_KEY
+DEBUG = os.getenv("SILANT_DEBUG", "0") == "1"
+# Ключ подписи токенов; без него ключ генерируется при старте и токены
+# перестают действовать после перезапуска (и не совпадают между процессами)
+SECRET_KEY = os.getenv("SILANT_SECRET_KEY") or secrets.token_urlsafe(32)
+TOKEN_TTL_SECONDS = int(os.getenv("SILANT_TOKEN_TTL_SECONDS", str(12 * 3600)))
+# Билет потока событий: передаётся в URL, поэтому живёт недолго и годится
+# только для GET /api/events
+STREAM_TICKET_TTL_SECONDS = int(os.getenv("SILANT_STREAM_TICKET_TTL_SECONDS", "60"))
+API_AUDIENCE = "api"
+STREAM_AUDIENCE = "events"
+
+# Параметры scrypt: ~16 МиБ памяти и десятки миллисекунд на проверку
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_PREFIX = "scrypt"
+
+
+logger = logging.getLogger("silant.auth")
+
+
+def check_secret_key() -> None:
+    """Проверка при старте приложения: без ключа подписи работает только режим разработки"""
+    if os.getenv("SILANT_SECRET_KEY"):
+        return
+    if not DEBUG:
+        raise RuntimeError(
+            "Не задан SILANT_SECRET_KEY; для разработки можно запустить с SILANT_DEBUG=1"
+        )
+    logger.warning(
+        "SILANT_SECRET_KEY не задан: токены подписываются случайным ключом "
+        "и перестанут действовать после перезапуска"
+    )
+
+
+class CurrentUser(NamedTuple):
+    id: int
+    role: UserRole
+    client_id: Optional[int]
+    service_company_id: Optional[int]
+
+
+def hash_password(password: str) -> str:
+    salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(
+        password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P
+    )
+    return "$".join(
+        [SCRYPT_PREFIX, str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P), salt.hex(), digest.hex()]
+    )
+
+
+def is_password_hash(value: str) -> bool:
+    return value.startswith(SCRYPT_PREFIX + "$")
+
+
+def verify_password(password: str, stored: str) -> bool:
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        expected = bytes.fromhex(digest)
+        actual = hashlib.scrypt(
+            password.encode(), salt=bytes.fromhex(salt), n=int(n), r=int(r), p=int(p)
+        )
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+# Хэш для проверки при неизвестном логине, чтобы время ответа не выдавало,
+# существует ли пользователь
+DUMMY_PASSWORD_HASH = hash_password(secrets.token_urlsafe(16))
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(SECRET_KEY.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(
+    user, ttl: int = TOKEN_TTL_SECONDS, audience: str = API_AUDIENCE
+) -> Tuple[str, int]:
+    """Токен для пользователя и время окончания его действия (unix time)"""
+    expires_at = int(time.time()) + ttl
+    payload = _b64encode(
+        json.dumps(
+            {
+                "sub": user.id,
+                "role": UserRole(user.role or UserRole.no_auth).value,
+                "cid": user.client_id,
+                "sid": user.service_company_id,
+                "exp": expires_at,
+                "aud": audience,
+            },
+            separators=(",", ":"),
+        ).encode()
+    )
+    return f"{payload}.{_sign(payload)}", expires_at
+
+
+def issue_stream_ticket(user: CurrentUser) -> Tuple[str, int]:
+    return issue_token(user, STREAM_TICKET_TTL_SECONDS, STREAM_AUDIENCE)
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def verify_token(token: str, audience: str = API_AUDIENCE) -> CurrentUser:
+    payload, _, signature = token.partition(".")
+    if not signature or not hmac.compare_digest(signature, _sign(payload)):
+        raise _unauthorized("Недействительный токен")
+    try:
+        data = json.loads(_b64decode(payload))
+        user = CurrentUser(data["sub"], UserRole(data["role"]), data["cid"], data["sid"])
+        expires_at = data["exp"]
+        # Токены, выданные до появления билетов, — для API
+        token_audience = data.get("aud", API_AUDIENCE)
+    except (ValueError, KeyError, TypeError):
+        raise _unauthorized("Недействительный токен")
+    if token_audience != audience:
+        raise _unauthorized("Недействительный токен")
+    if expires_at < time.time():
+        raise _unauthorized("Срок действия токена истёк, войдите заново")
+    return user
+
+
+async def get_current_user(authorization: Optional[str] = Header(None)) -> CurrentUser:
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise _unauthorized("Требуется авторизация")
+    return verify_token(token.strip())
+
+
+async def get_stream_user(
+    authorization: Optional[str] = Header(None),
+    ticket: Optional[str] = Query(
+        None, description="Билет из POST /api/events/ticket, если клиент не может передать заголовок"
+    ),
+) -> CurrentUser:
+    """То же для потоков: браузерный EventSource не отправляет Authorization,
+    поэтому в URL передаётся короткоживущий билет, а не сам токен"""
+    if ticket:
+        return verify_token(ticket, STREAM_AUDIENCE)
+    return await get_current_user(authorization)
+
+
+def require_roles(*roles: UserRole):
+    """Зависимость: текущий пользователь с одной из ролей, иначе 403"""
+
+    async def dependency(user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+        if user.role not in roles:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав")
+        return user
+
+    return dependency
+
+
+# ТО и рекламации вносят сервисные компании (только по своим машинам) и менеджер
+record_writers = require_roles(UserRole.service, UserRole.manager)
+
+
+def can_access(
+    user: CurrentUser, client_id: Optional[int], service_company_id: Optional[int]
+) -> bool:
+    """То же условие, что в scope_cars, для уже прочитанной машины или записи"""
+    if user.role == UserRole.manager:
+        return True
+    if user.role == UserRole.client:
+        return user.client_id is not None and user.client_id == client_id
+    if user.role == UserRole.service:
+        return (
+            user.service_company_id is not None
+            and user.service_company_id == service_company_id
+        )
+    return False
+
+
+def can_write_for(user: CurrentUser, service_company_id: Optional[int]) -> bool:
+    """Сервисная компания вносит ТО и рекламации только от своего имени"""
+    return user.role != UserRole.service or user.service_company_id == service_company_id
+
+
+def scope_cars(stmt, user: CurrentUser):
+    """Ограничивает выборку машин тем, что доступно пользователю"""
+    if user.role == UserRole.manager:
+        return stmt
+    if user.role == UserRole.client and user.client_id is not None:
+        return stmt.where(CarModel.client_id == user.client_id)
+    if user.role == UserRole.service and user.service_company_id is not None:
+        return stmt.where(CarModel.service_company_id == user.service_company_id)
+    return stmt.where(false())
+
+
+def scope_car_records(stmt, model_class: type, user: CurrentUser):
+    """То же для ТО и рекламаций: клиенту — по его машинам, сервису — по своим записям"""
+    if user.role == UserRole.manager:
+        return stmt
+    if user.role == UserRole.client and user.client_id is not None:
+        return stmt.where(
+            model_class.car_id.in_(
+                select(CarModel.id).where(CarModel.client_id == user.client_id)
+            )
+        )
+    if user.role == UserRole.service and user.service_company_id is not None:
+        return stmt.where(model_class.service_company_id == user.service_company_id)
+    return stmt.where(false())
@@ -1,12 +1,18 @@
 import random
-from datetime import datetime, timedelta
+from datetime import date, timedelta
+
+from sqlalchemy import insert, text
+
 from models import (
     CarModel, VehicleModel, EngineModel, TransmissionModel, 
     DriveAxleModel, SteeringAxleModel, Client, ServiceCompanyModel,
     TechMaintenanceModel, RecoveryMethodModel, FailureNodeModel,
     TechMaintenanceExtendModel, ComplaintModel, User, UserRole
 )
-from database import engine, AsyncSessionLocal, Base
+from database import engine, AsyncSessionLocal
+from migrations import reset, upgrade
+from analytics import rebuild_summaries
+from security import hash_password
 
 # Список данных для заполнения
 VEHICLE_MODELS = [
@@ -114,18 +120,30 @@ RECOVERY_METHODS = [
 USERS = [
     {"username": "admin", "password": "admin123", "role": UserRole.manager},
     {"username": "service1", "password": "service123", "role": UserRole.service, "service_company": "Сервис 1"},
-    {"username": "client1", "password": "client123", "role": UserRole.client, "client": "ООО 'Ромашка'"}
+    {"username": "client1", "password": "client123", "role": UserRole.client, "client": "ООО 'СтройДорМаш'"}
 ]
 
+# Параметры генератора: при одинаковых seed и масштабе база получается
+# одинаковой при каждом запуске, даты отсчитываются от фиксированной даты
+DEFAULT_SEED = 42
+DEFAULT_CARS = 50
+BASE_DATE = date(2025, 6, 30)
+# Размер пачки машин, записываемой одним executemany
+SEED_BATCH_SIZE = 5000
+
+CITIES = ['Москва', 'Санкт-Петербург', 'Казань', 'Екатеринбург', 'Новосибирск']
+EQUIPMENT = ['Стандарт', 'Комфорт', 'Люкс']
+
 # Функция для генерации VIN
-def generate_vin():
+def generate_vin(rng, index):
+    # Случайный префикс и порядковый номер машины: VIN уникален на любом масштабе
     letters = 'ABCDEFGHJKLMNPRSTUVWXYZ'
     digits = '0123456789'
-    return ''.join(random.choices(letters + digits, k=17))
+    return ''.join(rng.choices(letters + digits, k=7)) + f"{index:010d}"
 
 # Функция для генерации номера двигателя/трансмиссии
-def generate_serial_number(prefix):
-    return f"{prefix}-{random.randint(10000, 99999)}"
+def generate_serial_number(rng, prefix):
+    return f"{prefix}-{rng.randint(10000, 99999)}"
 
 # Функция для заполнения справочников
 async def seed_reference_data(session):
@@ -198,7 +216,7 @@ async def seed_users(session, ref_data):
     for user_data in USERS:
         user = User(
             username=user_data['username'],
-            password=user_data['password'],
+            password=hash_password(user_data['password']),
             role=user_data['role']
         )
         
@@ -248,97 +266,127 @@ async def seed_maintenance_data(session, ref_data):
         'recovery_methods': recovery_methods
     }
 
-async def seed_cars(session, ref_data):
-    cars = []
-    for i in range(50):  # Create 50 cars
-        client = random.choice(ref_data['clients'])
-        service_company = random.choice(ref_data['service_companies'])
-        
-        car = CarModel(
-            vin=generate_vin(),
-            vehicle_model_id=random.choice(ref_data['vehicle_models']).id,
-            engine_model_id=random.choice(ref_data['engine_models']).id,
-            engine_number=generate_serial_number("ENG"),
-            transmission_model_id=random.choice(ref_data['transmission_models']).id,
-            transmission_number=generate_serial_number("TR"),
-            drive_axle_model_id=random.choice(ref_data['drive_axle_models']).id,
-            drive_axle_number=generate_serial_number("DA"),
-            steering_axle_model_id=random.choice(ref_data['steering_axle_models']).id,
-            steering_axle_number=generate_serial_number("SA"),
-            delivery_agreement=f"Договор №{random.randint(1000, 9999)} от {datetime.now().strftime('%d.%m.%Y')}",
-            shipment_date=datetime.now() - timedelta(days=random.randint(1, 365)),
-            recipient=client.name,
-            delivery_address=f"г. {random.choice(['Москва', 'Санкт-Петербург', 'Казань', 'Екатеринбург', 'Новосибирск'])}",
-            equipment=f"Комплектация {random.choice(['Стандарт', 'Комфорт', 'Люкс'])}",
-            client_id=client.id,
-            service_company_id=service_company.id
-        )
-        session.add(car)
-        cars.append(car)
-    
-    await session.commit()
-    return cars
+def _ids(objects):
+    return [obj.id for obj in objects]
 
-async def seed_maintenance_records(session, ref_data, cars):
-    maintenance_records = []
-    
+
+def generate_cars(rng, ref_ids, first_id, count):
+    rows = []
+    for car_id in range(first_id, first_id + count):
+        client_id = rng.choice(ref_ids['clients'])
+        agreement_date = BASE_DATE - timedelta(days=rng.randint(366, 730))
+        rows.append({
+            'id': car_id,
+            'vin': generate_vin(rng, car_id),
+            'vehicle_model_id': rng.choice(ref_ids['vehicle_models']),
+            'engine_model_id': rng.choice(ref_ids['engine_models']),
+            'engine_number': generate_serial_number(rng, "ENG"),
+            'transmission_model_id': rng.choice(ref_ids['transmission_models']),
+            'transmission_number': generate_serial_number(rng, "TR"),
+            'drive_axle_model_id': rng.choice(ref_ids['drive_axle_models']),
+            'drive_axle_number': generate_serial_number(rng, "DA"),
+            'steering_axle_model_id': rng.choice(ref_ids['steering_axle_models']),
+            'steering_axle_number': generate_serial_number(rng, "SA"),
+            'delivery_agreement': f"Договор №{rng.randint(1000, 9999)} от {agreement_date.strftime('%d.%m.%Y')}",
+            'shipment_date': BASE_DATE - timedelta(days=rng.randint(1, 365)),
+            'recipient': ref_ids['client_names'][client_id],
+            'delivery_address': f"г. {rng.choice(CITIES)}",
+            'equipment': f"Комплектация {rng.choice(EQUIPMENT)}",
+            'client_id': client_id,
+            'service_company_id': rng.choice(ref_ids['service_companies']),
+        })
+    return rows
+
+
+def generate_maintenance_records(rng, ref_ids, cars):
+    rows = []
     for car in cars:
-        # Create 1-3 maintenance records per car
-        for _ in range(random.randint(1, 3)):
-            maintenance_date = datetime.now() - timedelta(days=random.randint(1, 180))
-            order_date = maintenance_date - timedelta(days=random.randint(1, 30))
-            
-            record = TechMaintenanceExtendModel(
-                car_id=car.id,
-                maintenance_type_id=random.choice(ref_data['maintenance_types']).id,
-                maintenance_date=maintenance_date,
-                order_number=f"ORD-{random.randint(1000, 9999)}",
-                order_date=order_date,
-                service_company_id=car.service_company_id
-            )
-            session.add(record)
-            maintenance_records.append(record)
-    
-    await session.commit()
-    return maintenance_records
+        # 1-3 ТО на машину
+        for _ in range(rng.randint(1, 3)):
+            maintenance_date = BASE_DATE - timedelta(days=rng.randint(1, 180))
+            rows.append({
+                'car_id': car['id'],
+                'maintenance_type_id': rng.choice(ref_ids['maintenance_types']),
+                'maintenance_date': maintenance_date,
+                'order_number': f"ORD-{rng.randint(1000, 9999)}",
+                'order_date': maintenance_date - timedelta(days=rng.randint(1, 30)),
+                'service_company_id': car['service_company_id'],
+            })
+    return rows
 
-async def seed_complaints(session, ref_data, cars):
-    complaints = []
-    
+
+def generate_complaints(rng, ref_ids, cars):
+    rows = []
     for car in cars:
-        # Create 0-2 complaints per car
-        for _ in range(random.randint(0, 2)):
-            failure_date = datetime.now() - timedelta(days=random.randint(1, 365))
-            recovery_date = failure_date + timedelta(days=random.randint(1, 14))
-            
-            complaint = ComplaintModel(
-                car_id=car.id,
-                date_of_failure=failure_date.strftime("%Y-%m-%d"),
-                operating_time=datetime.now() - timedelta(days=random.randint(30, 365)),
-                node_failure_id=random.choice(ref_data['failure_nodes']).id,
-                description_failure=f"Неисправность в узле {random.choice(FAILURE_NODES)}",
-                recovery_method_id=random.choice(ref_data['recovery_methods']).id,
-                used_spare_parts=random.choice(["Да", "Нет"]),
-                date_recovery=recovery_date.strftime("%Y-%m-%d"),
-                equipment_downtime=str((recovery_date - failure_date).days) + " дней",
-                vehicle_model=car.vehicle_model.name,
-                service_company_id=car.service_company_id
-            )
-            session.add(complaint)
-            complaints.append(complaint)
-    
-    await session.commit()
-    return complaints
-    
-    await session.commit()
+        # 0-2 рекламации на машину
+        for _ in range(rng.randint(0, 2)):
+            failure_date = BASE_DATE - timedelta(days=rng.randint(1, 365))
+            downtime = rng.randint(1, 14)
+            rows.append({
+                'car_id': car['id'],
+                'date_of_failure': failure_date,
+                'operating_time': rng.randint(100, 5000),
+                'node_failure_id': rng.choice(ref_ids['failure_nodes']),
+                'description_failure': f"Неисправность в узле {rng.choice(FAILURE_NODES)}",
+                'recovery_method_id': rng.choice(ref_ids['recovery_methods']),
+                'used_spare_parts': rng.choice(["Да", "Нет"]),
+                'date_recovery': failure_date + timedelta(days=downtime),
+                'equipment_downtime': downtime,
+                'vehicle_model': ref_ids['vehicle_model_names'][car['vehicle_model_id']],
+                'service_company_id': car['service_company_id'],
+            })
+    return rows
+
+
+async def seed_facts(ref_data, cars_count, seed, bind=engine):
+    """Машины, ТО и рекламации пачками через Core executemany.
+
+    Машины получают id явно, поэтому ТО и рекламации пачки генерируются
+    сразу, без чтения вставленных строк обратно; каждая пачка — отдельная
+    транзакция, и журнал SQLite не растёт с масштабом. bind — движок другой
+    базы (тесты заполняют ею и SQLite, и PostgreSQL).
+    """
+    rng = random.Random(seed)
+    ref_ids = {key: _ids(objects) for key, objects in ref_data.items()}
+    ref_ids['client_names'] = {c.id: c.name for c in ref_data['clients']}
+    ref_ids['vehicle_model_names'] = {m.id: m.name for m in ref_data['vehicle_models']}
+
+    totals = {'cars': 0, 'maintenance': 0, 'complaints': 0}
+    async with bind.connect() as conn:
+        for first_id in range(1, cars_count + 1, SEED_BATCH_SIZE):
+            count = min(SEED_BATCH_SIZE, cars_count - first_id + 1)
+            cars = generate_cars(rng, ref_ids, first_id, count)
+            maintenance = generate_maintenance_records(rng, ref_ids, cars)
+            complaints = generate_complaints(rng, ref_ids, cars)
+
+            await conn.execute(insert(CarModel), cars)
+            await conn.execute(insert(TechMaintenanceExtendModel), maintenance)
+            if complaints:
+                await conn.execute(insert(ComplaintModel), complaints)
+            await conn.commit()
+
+            totals['cars'] += len(cars)
+            totals['maintenance'] += len(maintenance)
+            totals['complaints'] += len(complaints)
+            print(f"  {totals['cars']}/{cars_count} cars")
+    return totals
+
+
+def sync_id_sequences(conn):
+    """PostgreSQL: машины вставлены с явными id, счётчик serial сдвигается за них"""
+    if conn.dialect.name != "postgresql":
+        return
+    conn.execute(text(
+        "SELECT setval(pg_get_serial_sequence('car_model', 'id'), max(id)) FROM car_model"
+    ))
 
 # Основная функция
 
-async def main():
+async def main(cars_count=DEFAULT_CARS, seed=DEFAULT_SEED):
     # Create all tables
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(reset)
+        await conn.run_sync(upgrade)
     
     # Fill with data
     async with AsyncSessionLocal() as session:
@@ -351,18 +399,33 @@ async def main():
         
         print("Creating users...")
         await seed_users(session, ref_data)
-        
-        print("Creating cars...")
-        cars = await seed_cars(session, ref_data)
-        
-        print("Creating maintenance records...")
-        await seed_maintenance_records(session, ref_data, cars)
-        
-        print("Creating complaints...")
-        await seed_complaints(session, ref_data, cars)
-        
-        print("Data has been successfully populated!")
+
+    print(f"Creating {cars_count} cars with maintenance and complaints (seed={seed})...")
+    totals = await seed_facts(ref_data, cars_count, seed)
+
+    print("Rebuilding analytics summaries...")
+    async with engine.begin() as conn:
+        await conn.run_sync(sync_id_sequences)
+        await conn.run_sync(rebuild_summaries)
+    await engine.dispose()
+
+    print(
+        f"Data has been successfully populated: {totals['cars']} cars, "
+        f"{totals['maintenance']} maintenance records, {totals['complaints']} complaints"
+    )
 
 if __name__ == "__main__":
+    import argparse
     import asyncio
-    asyncio.run(main())
+
+    parser = argparse.ArgumentParser(description="Заполнение базы тестовыми данными")
+    parser.add_argument(
+        "--cars", type=int, default=DEFAULT_CARS,
+        help="количество машин; ТО и рекламации создаются пропорционально (например, 100000)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=DEFAULT_SEED,
+        help="зерно генератора: одинаковые --seed и --cars дают одинаковую базу",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.cars, args.seed))
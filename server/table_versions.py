@@ -0,0 +1,99 @@
+"""Версии таблиц и условные GET-запросы.
+
+Версии хранятся в таблице table_versions, а увеличивают их триггеры БД
+(миграция 9) при любой записи в таблицу: через API, импорт, seed.py, из
+другого процесса uvicorn или другого экземпляра приложения. ETag списка
+собирается из версий таблиц, попадающих в ответ, и области видимости
+пользователя. Версии читаются одним запросом по первичному ключу на каждый
+условный GET, поэтому на If-None-Match с совпадающим тегом отвечается 304 без
+запроса строк.
+
+Версия видна другим соединениям вместе с данными, в том же коммите. В
+PostgreSQL пишущие в одну таблицу транзакции по очереди обновляют строку её
+версии; триггер там срабатывает раз на выражение, а не на строку.
+"""
+import hashlib
+from typing import Dict, Iterable, Optional
+
+from fastapi import Depends, Header, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import get_read_db
+from models import TableVersionModel
+from reference_cache import reference_cache
+from security import CurrentUser, get_current_user
+
+
+async def read_versions(db: AsyncSession, model_classes: Iterable[type]) -> Dict[str, int]:
+    names = [m.__tablename__ for m in model_classes]
+    result = await db.execute(
+        select(TableVersionModel.table_name, TableVersionModel.version).where(
+            TableVersionModel.table_name.in_(names)
+        )
+    )
+    return dict(result.all())
+
+
+async def current_etag(db: AsyncSession, model_classes, scope: tuple = ()) -> str:
+    versions = await read_versions(db, model_classes)
+    # Справочник, изменённый в обход этого процесса, перечитывается в кэш до
+    # ответа, иначе под новым тегом ушли бы старые наименования
+    await reference_cache.sync(db, versions)
+    key = repr((sorted(versions.items()), scope)).encode()
+    # Слабый тег: gzip-представление того же ответа отличается побайтно
+    return f'W/"{hashlib.blake2b(key, digest_size=8).hexdigest()}"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def _conditional(response: Response, etag: str, if_none_match: Optional[str], private: bool):
+    headers = {
+        "ETag": etag,
+        # Браузер хранит ответ, но перед использованием сверяет тег с сервером
+        "Cache-Control": "private, no-cache" if private else "no-cache",
+    }
+    if private:
+        headers["Vary"] = "Authorization"
+    if _matches(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
+
+def table_etag(*model_classes: type):
+    """Зависимость для справочников: ETag по версиям таблиц, 304 при совпадении"""
+
+    async def dependency(
+        response: Response,
+        if_none_match: Optional[str] = Header(None),
+        db: AsyncSession = Depends(get_read_db),
+    ) -> None:
+        _conditional(response, await current_etag(db, model_classes), if_none_match, False)
+
+    return dependency
+
+
+def scoped_table_etag(*model_classes: type):
+    """То же для ответов, зависящих от пользователя и его роли"""
+
+    async def dependency(
+        response: Response,
+        if_none_match: Optional[str] = Header(None),
+        user: CurrentUser = Depends(get_current_user),
+        db: AsyncSession = Depends(get_read_db),
+    ) -> None:
+        scope = (user.id, user.role.value, user.client_id, user.service_company_id)
+        etag = await current_etag(db, model_classes, scope)
+        _conditional(response, etag, if_none_match, True)
+
+    return dependency
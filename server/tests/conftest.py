@@ -0,0 +1,121 @@
+"""Общие фикстуры: засеянная база во временном каталоге и запущенное приложение.
+
+Модули сервера читают переменные окружения при импорте, поэтому окружение
+задаётся здесь, до сбора тестовых модулей.
+
+Код, который различает SQLite и PostgreSQL (поиск, сводки аналитики, seed.py),
+проверяется на обеих СУБД через фикстуру backend_engine. PostgreSQL
+подключается, если задан SILANT_TEST_POSTGRES_URL (например,
+postgresql://postgres@localhost:5432/silant): рядом с указанной базой
+создаётся и после тестов удаляется база <имя>_test. Без него эти тесты идут
+только на SQLite.
+"""
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVER_DIR))
+
+WORKDIR = Path(tempfile.mkdtemp(prefix="silant-tests-"))
+os.environ["SILANT_DATABASE_URL"] = f"sqlite+aiosqlite:///{WORKDIR / 'silant.db'}"
+os.environ["SILANT_JOBS_DIR"] = str(WORKDIR / "jobs")
+os.environ["SILANT_DEBUG"] = "1"
+os.environ["SILANT_QUERY_DEBUG"] = "1"
+os.environ["SILANT_QUERY_STRICT"] = "1"
+# Поток событий закрывается сразу после начала: тест ждёт конца ответа
+os.environ["SILANT_EVENTS_MAX_SECONDS"] = "0.1"
+
+# Машин в тестовой базе: ТО и рекламации создаются пропорционально
+TEST_CARS = 50
+
+POSTGRES_URL = os.getenv("SILANT_TEST_POSTGRES_URL")
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _workdir():
+    yield WORKDIR
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+async def _postgres_admin(url, *statements: str) -> None:
+    """CREATE/DROP DATABASE вне транзакции"""
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(url, isolation_level="AUTOCOMMIT")
+    try:
+        async with engine.connect() as conn:
+            for statement in statements:
+                await conn.execute(text(statement))
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture(scope="module", params=["sqlite", "postgresql"])
+async def backend_engine(request):
+    """Движок чистой базы после всех миграций — по очереди на каждой СУБД"""
+    from sqlalchemy.engine import make_url
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from migrations import reset, upgrade
+
+    admin_url = None
+    if request.param == "sqlite":
+        url = f"sqlite+aiosqlite:///{WORKDIR / f'{request.module.__name__}.db'}"
+    else:
+        if not POSTGRES_URL:
+            pytest.skip("SILANT_TEST_POSTGRES_URL не задан")
+        admin_url = make_url(POSTGRES_URL).set(drivername="postgresql+asyncpg")
+        name = f"{admin_url.database}_test"
+        await _postgres_admin(
+            admin_url, f'DROP DATABASE IF EXISTS "{name}"', f'CREATE DATABASE "{name}"'
+        )
+        url = admin_url.set(database=name)
+
+    engine = create_async_engine(url)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(reset)
+            await conn.run_sync(upgrade)
+        yield engine
+    finally:
+        await engine.dispose()
+        if admin_url is not None:
+            await _postgres_admin(admin_url, f'DROP DATABASE IF EXISTS "{admin_url.database}_test"')
+
+
+@pytest.fixture(scope="session")
+async def app():
+    import seed
+    from main import app
+
+    await seed.main(TEST_CARS)
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+@pytest.fixture(scope="session")
+async def client(app):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+async def manager(client):
+    """Заголовки менеджера: он видит все записи и может всё"""
+    response = await client.post("/api/login", json={"username": "admin", "password": "admin123"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['token']}"}
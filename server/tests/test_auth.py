@@ -0,0 +1,141 @@
+"""Пользователь определяется только подписанным токеном, а списки ограничены его ролью."""
+import pytest
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal
+from models import CarModel, User
+
+pytestmark = pytest.mark.anyio
+
+LISTS = ["/api/cars", "/api/maintenance", "/api/complaints"]
+
+
+async def _login(client, username: str, password: str) -> dict:
+    response = await client.post("/api/login", json={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+@pytest.mark.parametrize("path", LISTS)
+async def test_list_requires_token(client, path):
+    assert (await client.get(path)).status_code == 401
+
+
+@pytest.mark.parametrize("path", LISTS)
+async def test_client_supplied_user_id_is_ignored(client, path):
+    # Заголовок из ранней версии API не заменяет токен
+    assert (await client.get(path, headers={"X-User-Id": "1"})).status_code == 401
+
+
+async def test_forged_token_is_rejected(client, manager):
+    token = manager["Authorization"]
+    payload, _, signature = token.rpartition(".")
+    forged = f"{payload}.{'A' * len(signature)}"
+    response = await client.get("/api/cars", headers={"Authorization": forged})
+    assert response.status_code == 401
+
+
+async def test_client_sees_only_own_cars(app, client):
+    headers = await _login(client, "client1", "client123")
+    async with AsyncSessionLocal() as db:
+        client_id = (
+            await db.execute(select(User.client_id).where(User.username == "client1"))
+        ).scalar_one()
+        own = set(
+            (await db.execute(select(CarModel.vin).where(CarModel.client_id == client_id)))
+            .scalars()
+            .all()
+        )
+
+    assert own
+    response = await client.get("/api/cars", params={"all": "true"}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert {car["vin"] for car in response.json()} == own
+
+
+WRITES = ["/api/maintenance", "/api/complaints"]
+
+
+async def _service_cars(service_company_id: int):
+    """Машина, которую обслуживает сервисная компания, и чужая машина"""
+    async with AsyncSessionLocal() as db:
+        own = (
+            await db.execute(
+                select(CarModel).where(CarModel.service_company_id == service_company_id).limit(1)
+            )
+        ).scalar_one()
+        other = (
+            await db.execute(
+                select(CarModel).where(CarModel.service_company_id != service_company_id).limit(1)
+            )
+        ).scalar_one()
+    return own, other
+
+
+def _record(path: str, car_id: int, service_company_id: int) -> dict:
+    if path == "/api/maintenance":
+        return {
+            "car_id": car_id,
+            "maintenance_type_id": 1,
+            "maintenance_date": "2025-03-10",
+            "order_number": "A-1",
+            "order_date": "2025-03-01",
+            "service_company_id": service_company_id,
+        }
+    return {
+        "car_id": car_id,
+        "date_of_failure": "2025-04-01",
+        "operating_time": "1200",
+        "node_failure_id": 1,
+        "recovery_method_id": 1,
+        "date_recovery": "2025-04-05",
+        "service_company_id": service_company_id,
+    }
+
+
+@pytest.fixture(scope="module")
+async def service(app, client):
+    headers = await _login(client, "service1", "service123")
+    async with AsyncSessionLocal() as db:
+        service_company_id = (
+            await db.execute(select(User.service_company_id).where(User.username == "service1"))
+        ).scalar_one()
+    own, other = await _service_cars(service_company_id)
+    return headers, service_company_id, own, other
+
+
+@pytest.mark.parametrize("path", WRITES)
+async def test_record_create_requires_token(client, service, path):
+    _, service_company_id, car, _ = service
+    response = await client.post(path, json=_record(path, car.id, service_company_id))
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("path", WRITES)
+async def test_client_cannot_create_records(client, service, path):
+    headers = await _login(client, "client1", "client123")
+    _, service_company_id, car, _ = service
+    response = await client.post(
+        path, json=_record(path, car.id, service_company_id), headers=headers
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("path", WRITES)
+async def test_service_writes_only_own_records(client, service, path):
+    headers, service_company_id, own, other = service
+    # Чужая машина
+    response = await client.post(
+        path, json=_record(path, other.id, service_company_id), headers=headers
+    )
+    assert response.status_code == 422
+    # Запись от имени другой сервисной компании
+    response = await client.post(
+        path, json=_record(path, own.id, other.service_company_id), headers=headers
+    )
+    assert response.status_code == 403
+
+    response = await client.post(
+        path, json=_record(path, own.id, service_company_id), headers=headers
+    )
+    assert response.status_code == 201, response.text
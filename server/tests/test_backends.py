@@ -0,0 +1,138 @@
+"""Код с ветками по СУБД: одинаковый результат на SQLite и PostgreSQL.
+
+Поиск (FTS5 и to_tsvector), upsert сводок аналитики (on_conflict_do_update
+диалекта) и сдвиг счётчика id после seed.py.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+import seed
+from analytics import COMPLAINT_DIMENSIONS, record_complaints, record_maintenance
+from api.v1.search import search
+from models import (
+    CarModel,
+    ComplaintModel,
+    ComplaintSummaryModel,
+    MaintenanceSummaryModel,
+    UserRole,
+)
+from security import CurrentUser
+
+pytestmark = pytest.mark.anyio
+
+FACT_CARS = 20
+
+
+@pytest.fixture(scope="module")
+async def facts(backend_engine):
+    """Справочники и машины с ТО и рекламациями, как их создаёт seed.py"""
+    async with AsyncSession(backend_engine, expire_on_commit=False) as session:
+        ref_data = await seed.seed_reference_data(session)
+        ref_data.update(await seed.seed_maintenance_data(session, ref_data))
+    await seed.seed_facts(ref_data, FACT_CARS, seed.DEFAULT_SEED, bind=backend_engine)
+    return {key: seed._ids(objects) for key, objects in ref_data.items()}
+
+
+@pytest.fixture
+async def db(backend_engine, facts):
+    """Сессия теста; всё, что он записал, откатывается"""
+    async with AsyncSession(backend_engine, expire_on_commit=False) as session:
+        yield session
+        await session.rollback()
+
+
+def _user(role: UserRole, client_id=None, service_company_id=None):
+    return CurrentUser(1, role, client_id, service_company_id)
+
+
+async def _search(db, q: str, user, kind=None):
+    return await search(q=q, kind=kind, limit=20, user=user, db=db)
+
+
+async def test_search_finds_car_by_vin_prefix(db):
+    vin = (await db.execute(select(CarModel.vin).order_by(CarModel.id).limit(1))).scalar_one()
+    hits = await _search(db, vin[:8], _user(UserRole.manager), kind="car")
+
+    assert vin in [hit["vin"] for hit in hits if hit["kind"] == "car"]
+    assert all("[" in hit["snippet"] for hit in hits)
+
+
+async def test_search_finds_complaint_by_description(db):
+    result = await db.execute(
+        select(ComplaintModel.id, ComplaintModel.description_failure).order_by(ComplaintModel.id)
+    )
+    complaint_id, description = result.first()
+    # Последнее слово — название узла, ищется его начало
+    word = description.split()[-1]
+    hits = await _search(db, word[:4], _user(UserRole.manager), kind="complaint")
+
+    assert complaint_id in [hit["id"] for hit in hits]
+    assert all(hit["kind"] == "complaint" for hit in hits)
+
+
+async def test_search_is_scoped_to_client(db):
+    car = (await db.execute(select(CarModel).order_by(CarModel.id).limit(1))).scalar_one()
+    own = await _search(db, car.vin[:8], _user(UserRole.client, client_id=car.client_id))
+    other = await _search(db, car.vin[:8], _user(UserRole.client, client_id=-1))
+
+    assert car.vin in [hit["vin"] for hit in own]
+    assert other == []
+
+
+async def test_record_complaints_accumulates(db, facts):
+    complaint = {field: 1 for field in COMPLAINT_DIMENSIONS.values()}
+    complaint["node_failure_id"] = facts["failure_nodes"][0]
+    # Первый вызов вставляет строку сводки, второй попадает в on_conflict_do_update
+    await record_complaints(db, [{**complaint, "equipment_downtime": 3}, complaint])
+    await record_complaints(db, [{**complaint, "equipment_downtime": 5}])
+
+    summary = (
+        await db.execute(
+            select(ComplaintSummaryModel).where(
+                ComplaintSummaryModel.dimension == "node_failure",
+                ComplaintSummaryModel.key_id == facts["failure_nodes"][0],
+            )
+        )
+    ).scalar_one()
+    assert (summary.failure_count, summary.downtime_days_total, summary.downtime_count) == (3, 8, 2)
+
+
+async def test_record_maintenance_accumulates(db, facts):
+    type_id = facts["maintenance_types"][0]
+    record = {"maintenance_type_id": type_id, "maintenance_date": date(2030, 1, 15)}
+    await record_maintenance(db, [record, {**record, "maintenance_date": date(2030, 1, 20)}])
+    await record_maintenance(db, [record])
+
+    count = (
+        await db.execute(
+            select(MaintenanceSummaryModel.maintenance_count).where(
+                MaintenanceSummaryModel.maintenance_type_id == type_id,
+                MaintenanceSummaryModel.month == "2030-01",
+            )
+        )
+    ).scalar_one()
+    assert count == 3
+
+
+async def test_sync_id_sequences_after_explicit_ids(db):
+    # seed.py вставляет машины с явными id; без сдвига счётчика PostgreSQL
+    # выдал бы новой машине id 1 и вставка нарушила бы первичный ключ
+    await db.run_sync(lambda session: seed.sync_id_sequences(session.connection()))
+    template = (await db.execute(select(CarModel).order_by(CarModel.id).limit(1))).scalar_one()
+    car = CarModel(
+        vin="SEQUENCE000000001",
+        **{
+            column: getattr(template, column)
+            for column in CarModel.__table__.columns.keys()
+            if column not in ("id", "vin")
+        },
+    )
+    db.add(car)
+    await db.flush()
+
+    assert car.id == FACT_CARS + 1
+    assert (await db.execute(select(func.max(CarModel.id)))).scalar_one() == car.id
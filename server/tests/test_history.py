@@ -0,0 +1,134 @@
+"""История машины: слияние ТО и рекламаций и обход по курсору совпадают с
+полным перебором записей, а записи видны по тем же правилам, что в списках."""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal
+from models import CarModel, ComplaintModel, ServiceCompanyModel, TechMaintenanceExtendModel, User
+from pagination import NEXT_CURSOR_HEADER
+
+pytestmark = pytest.mark.anyio
+
+PAGE_SIZE = 3
+# Дат в истории; на каждую — по нескольку ТО и рекламаций обеих компаний
+DAYS = 4
+PER_DAY = 3
+START = date(2024, 3, 1)
+
+
+def _copy(row, **values):
+    columns = [c for c in type(row).__table__.columns.keys() if c != "id"]
+    return type(row)(**{**{c: getattr(row, c) for c in columns}, **values})
+
+
+async def _login(client, username: str, password: str) -> dict:
+    response = await client.post("/api/login", json={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+@pytest.fixture(scope="module")
+async def history(app, client):
+    """Машина чужой для service1 компании, на которой service1 тоже вёл записи.
+
+    Возвращает (VIN, заголовки service1, его сервисная компания).
+    """
+    headers = await _login(client, "service1", "service123")
+    async with AsyncSessionLocal() as db:
+        own = (
+            await db.execute(select(User.service_company_id).where(User.username == "service1"))
+        ).scalar_one()
+        other = (
+            await db.execute(
+                select(ServiceCompanyModel.id)
+                .where(ServiceCompanyModel.id != own)
+                .order_by(ServiceCompanyModel.id)
+                .limit(1)
+            )
+        ).scalar_one()
+        first = {}
+        for model_class in (CarModel, TechMaintenanceExtendModel, ComplaintModel):
+            first[model_class] = (
+                await db.execute(select(model_class).order_by(model_class.id).limit(1))
+            ).scalar_one()
+
+        car = _copy(first[CarModel], vin="HISTORY0000000001", service_company_id=other)
+        db.add(car)
+        await db.flush()
+        for day in range(DAYS):
+            for n in range(PER_DAY):
+                company = own if n % 2 == 0 else other
+                when = START + timedelta(days=day)
+                db.add(
+                    _copy(
+                        first[TechMaintenanceExtendModel],
+                        car_id=car.id,
+                        maintenance_date=when,
+                        order_date=when,
+                        service_company_id=company,
+                    )
+                )
+                db.add(
+                    _copy(
+                        first[ComplaintModel],
+                        car_id=car.id,
+                        date_of_failure=when,
+                        date_recovery=when,
+                        equipment_downtime=0,
+                        service_company_id=company,
+                    )
+                )
+        await db.commit()
+        return car.vin, headers, own
+
+
+async def _expected(vin: str, descending: bool, service_company_id=None) -> list:
+    """Все записи машины, упорядоченные перебором по (дата, вид, id)"""
+    events = []
+    async with AsyncSessionLocal() as db:
+        car_id = (await db.execute(select(CarModel.id).where(CarModel.vin == vin))).scalar_one()
+        for kind, model_class, date_column in (
+            ("maintenance", TechMaintenanceExtendModel, TechMaintenanceExtendModel.maintenance_date),
+            ("complaint", ComplaintModel, ComplaintModel.date_of_failure),
+        ):
+            stmt = select(date_column, model_class.id).where(model_class.car_id == car_id)
+            if service_company_id is not None:
+                stmt = stmt.where(model_class.service_company_id == service_company_id)
+            events += [(day, kind, id_) for day, id_ in (await db.execute(stmt)).all()]
+    return [(kind, id_) for _, kind, id_ in sorted(events, reverse=descending)]
+
+
+async def _walk(client, headers, vin: str, sort: str) -> list:
+    events, cursor = [], None
+    while True:
+        params = {"sort": sort, "limit": PAGE_SIZE}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get(f"/api/cars/{vin}/history", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page) <= PAGE_SIZE
+        events += [(event["kind"], event["id"]) for event in page]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return events
+
+
+@pytest.mark.parametrize("sort", ["date", "-date"])
+async def test_history_pages_match_brute_force(client, manager, history, sort):
+    vin, _, _ = history
+    expected = await _expected(vin, sort.startswith("-"))
+    assert len(expected) == 2 * DAYS * PER_DAY
+
+    assert await _walk(client, manager, vin, sort) == expected
+
+
+@pytest.mark.parametrize("sort", ["date", "-date"])
+async def test_service_sees_own_records_on_other_company_car(client, history, sort):
+    vin, headers, own = history
+    expected = await _expected(vin, sort.startswith("-"), service_company_id=own)
+    assert expected
+
+    assert await _walk(client, headers, vin, sort) == expected
@@ -0,0 +1,58 @@
+"""Импорт CSV: ошибки строк попадают в отчёт, справочники вне кэша дочитываются."""
+import pytest
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal
+from models import CarModel, TechMaintenanceExtendModel, TechMaintenanceModel
+from reference_cache import reference_cache
+
+pytestmark = pytest.mark.anyio
+
+HEADER = "vin;maintenance_type_id;maintenance_date;order_number;order_date\n"
+
+
+@pytest.fixture(scope="module")
+async def car(app):
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(CarModel).order_by(CarModel.id).limit(1))).scalar_one()
+
+
+async def _import(client, headers, body: str) -> dict:
+    files = {"file": ("maintenance.csv", body.encode("utf-8-sig"), "text/csv")}
+    response = await client.post("/api/maintenance/import", files=files, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_long_order_number_is_rejected(client, manager, car):
+    body = HEADER + f"{car.vin};1;2025-05-01;{'1' * 11};2025-04-30\n"
+    report = await _import(client, manager, body)
+
+    assert (report["imported"], report["failed"]) == (0, 1)
+    assert "Номер заказ-наряда" in report["errors"][0]["error"]
+    assert report["errors"][0]["line"] == 2
+
+
+async def test_reference_id_missing_from_cache_is_loaded(client, manager, car):
+    # Вид ТО, добавленный в обход API: в кэше справочников его нет
+    async with AsyncSessionLocal() as db:
+        maintenance_type = TechMaintenanceModel(name="ТО импорта", description="")
+        db.add(maintenance_type)
+        await db.commit()
+    assert reference_cache.get(TechMaintenanceModel, maintenance_type.id) is None
+
+    body = HEADER + f"{car.vin};{maintenance_type.id};2025-05-02;IMP-1;2025-05-01\n"
+    report = await _import(client, manager, body)
+
+    assert (report["imported"], report["failed"]) == (1, 0), report
+    async with AsyncSessionLocal() as db:
+        count = len(
+            (
+                await db.execute(
+                    select(TechMaintenanceExtendModel.id).where(
+                        TechMaintenanceExtendModel.maintenance_type_id == maintenance_type.id
+                    )
+                )
+            ).all()
+        )
+    assert count == 1
@@ -0,0 +1,57 @@
+"""Очередь фоновых задач: задачу выполняет один исполнитель, а в очередь
+снова попадают только задачи, от исполнителя которых давно нет сигнала."""
+from datetime import datetime
+
+import pytest
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal
+from jobs import JOB_STALE_AFTER, QUEUED, RUNNING, JobRunner
+from models import JobModel, User
+
+pytestmark = pytest.mark.anyio
+
+
+async def _job(status: str, claimed_by=None, heartbeat_at=None) -> int:
+    async with AsyncSessionLocal() as db:
+        user_id = (await db.execute(select(User.id).where(User.username == "admin"))).scalar_one()
+        job = JobModel(
+            kind="test",
+            status=status,
+            user_id=user_id,
+            params="{}",
+            progress=0,
+            created_at=datetime.now(),
+            claimed_by=claimed_by,
+            heartbeat_at=heartbeat_at,
+        )
+        db.add(job)
+        await db.commit()
+        return job.id
+
+
+async def _state(job_id: int):
+    async with AsyncSessionLocal() as db:
+        job = await db.get(JobModel, job_id)
+        return job.status, job.claimed_by
+
+
+async def test_only_stale_jobs_are_requeued(app):
+    now = datetime.now()
+    alive = await _job(RUNNING, "other:1", now)
+    stale = await _job(RUNNING, "other:2", now - JOB_STALE_AFTER * 2)
+
+    await JobRunner(workers=0)._requeue_stale()
+
+    assert await _state(alive) == (RUNNING, "other:1")
+    assert await _state(stale) == (QUEUED, None)
+
+
+async def test_claimed_job_is_not_run_twice(app):
+    job_id = await _job(RUNNING, "other:1", datetime.now())
+    runner = JobRunner(workers=0)
+    runner.register("test", lambda context: pytest.fail("задача уже взята"))
+
+    await runner._run(job_id)
+
+    assert await _state(job_id) == (RUNNING, "other:1")
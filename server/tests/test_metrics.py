@@ -0,0 +1,24 @@
+"""Метрики пула: ожидание соединения и время его удержания — разные гистограммы."""
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def _count(text: str, metric: str) -> float:
+    prefix = f'{metric}_count{{engine="write"}} '
+    values = [float(line[len(prefix):]) for line in text.splitlines() if line.startswith(prefix)]
+    return values[0] if values else 0
+
+
+async def test_pool_wait_and_hold_are_observed(client, manager):
+    before = (await client.get("/metrics")).text
+    response = await client.get("/api/cars", headers=manager)
+    assert response.status_code == 200, response.text
+    after = (await client.get("/metrics")).text
+
+    for metric in (
+        "silant_db_pool_wait_duration_seconds",
+        "silant_db_connection_hold_duration_seconds",
+    ):
+        assert _count(after, metric) > _count(before, metric), metric
+    assert "silant_db_connection_checkout_duration_seconds" not in after
@@ -0,0 +1,93 @@
+"""Постраничный обход списка по курсору совпадает со списком целиком.
+
+Страницы запрашиваются с маленьким limit по заголовку X-Next-Cursor, в
+данных есть строки с одинаковым значением поля сортировки: на них курсор
+должен продолжать порядок по id, не теряя и не повторяя строк.
+"""
+import pytest
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal
+from models import CarModel, ComplaintModel, TechMaintenanceExtendModel
+from pagination import NEXT_CURSOR_HEADER
+
+pytestmark = pytest.mark.anyio
+
+PAGE_SIZE = 7
+# Копий одной записи: одинаковое значение сортировки на стыке страниц
+TIES = PAGE_SIZE + 2
+
+CASES = [
+    ("/api/cars", "shipment_date", {}),
+    ("/api/cars", "-shipment_date", {}),
+    ("/api/cars", "-id", {}),
+    ("/api/maintenance", "-maintenance_date", {}),
+    ("/api/maintenance", "order_date", {}),
+    ("/api/complaints", "date_of_failure", {}),
+    ("/api/complaints", "-date_of_failure", {}),
+]
+
+
+def _copies(row, count: int, **unique):
+    """Копии строки с новыми id; unique — функции номера копии -> значение"""
+    columns = [c for c in type(row).__table__.columns.keys() if c != "id"]
+    copies = []
+    for n in range(count):
+        values = {c: getattr(row, c) for c in columns}
+        values.update({c: make(n) for c, make in unique.items()})
+        copies.append(type(row)(**values))
+    return copies
+
+
+@pytest.fixture(scope="module")
+async def ties(app):
+    """Копии первых машины, ТО и рекламации; возвращает сервисную компанию рекламации"""
+    async with AsyncSessionLocal() as db:
+        for model_class in (CarModel, TechMaintenanceExtendModel, ComplaintModel):
+            row = (
+                await db.execute(select(model_class).order_by(model_class.id).limit(1))
+            ).scalar_one()
+            unique = {"vin": lambda n: f"PAGETIE{n:010d}"} if model_class is CarModel else {}
+            db.add_all(_copies(row, TIES, **unique))
+        await db.commit()
+        return row.service_company_id
+
+
+async def _walk(client, headers, path: str, params: dict) -> list:
+    rows, cursor = [], None
+    while True:
+        page_params = {**params, "limit": PAGE_SIZE}
+        if cursor:
+            page_params["cursor"] = cursor
+        response = await client.get(path, params=page_params, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page) <= PAGE_SIZE
+        rows += page
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return rows
+
+
+async def _check(client, headers, path: str, params: dict):
+    response = await client.get(path, params={**params, "all": "true"}, headers=headers)
+    assert response.status_code == 200, response.text
+    expected = [row["id"] for row in response.json()]
+    assert len(expected) > 2 * PAGE_SIZE
+
+    paged = [row["id"] for row in await _walk(client, headers, path, params)]
+    assert paged == expected
+
+
+@pytest.mark.parametrize(
+    "path,sort,params", CASES, ids=[f"{path} {sort}" for path, sort, _ in CASES]
+)
+async def test_cursor_pages_match_full_list(client, manager, ties, path, sort, params):
+    await _check(client, manager, path, {**params, "sort": sort})
+
+
+@pytest.mark.parametrize("path", ["/api/maintenance", "/api/complaints"])
+async def test_cursor_pages_match_full_list_with_filter(client, manager, ties, path):
+    await _check(
+        client, manager, path, {"sort": "-id", "service_company_id": ties}
+    )
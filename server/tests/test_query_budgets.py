@@ -0,0 +1,216 @@
+"""Число SQL-запросов каждого маршрута не превышает его бюджет.
+
+Приложение работает в strict-режиме: превышение бюджета — ответ 500, а
+обращение к незагруженной связи (lazy="raise") — исключение. Тест проверяет
+и заголовок X-DB-Query-Count, чтобы отчёт показывал фактическое число.
+"""
+from datetime import datetime
+
+import anyio
+import pytest
+
+from query_stats import QUERY_COUNT_HEADER, ROUTE_QUERY_BUDGETS, route_budget
+
+pytestmark = pytest.mark.anyio
+
+ANALYTICS_DIMENSIONS = ["node_failure", "recovery_method", "service_company", "vehicle_model"]
+
+
+@pytest.fixture(scope="module")
+async def ctx(app, client, manager):
+    """Идентификаторы записей, к которым обращаются запросы"""
+    from sqlalchemy.future import select
+
+    from database import AsyncSessionLocal
+    from models import (
+        CarModel,
+        EngineModel,
+        FailureNodeModel,
+        RecoveryMethodModel,
+        TechMaintenanceModel,
+        User,
+        VehicleModel,
+    )
+
+    async def first(db, model_class):
+        result = await db.execute(select(model_class).order_by(model_class.id).limit(1))
+        return result.scalar_one()
+
+    async with AsyncSessionLocal() as db:
+        car = await first(db, CarModel)
+        engine_model = await first(db, EngineModel)
+        result = await db.execute(select(User.id).where(User.username == "admin"))
+        context = {
+            "car": car,
+            "vehicle_model_id": (await first(db, VehicleModel)).id,
+            "engine_model": engine_model,
+            "maintenance_type_id": (await first(db, TechMaintenanceModel)).id,
+            "node_failure_id": (await first(db, FailureNodeModel)).id,
+            "recovery_method_id": (await first(db, RecoveryMethodModel)).id,
+            "manager_id": result.scalar_one(),
+        }
+    context["export_job_id"] = await _finished_export(client, manager)
+    return context
+
+
+async def _finished_export(client, headers) -> int:
+    response = await client.post("/api/cars/export", headers=headers)
+    assert response.status_code == 202, response.text
+    job_id = response.json()["id"]
+    with anyio.fail_after(30):
+        while True:
+            job = (await client.get(f"/api/jobs/{job_id}", headers=headers)).json()
+            if job["status"] == "succeeded":
+                return job_id
+            assert job["status"] in ("queued", "running"), job
+            await anyio.sleep(0.05)
+
+
+async def _queued_job(ctx) -> int:
+    # Задача только в таблице, исполнители её не возьмут: отмена всегда успевает
+    from database import AsyncSessionLocal
+    from models import JobModel
+
+    async with AsyncSessionLocal() as db:
+        job = JobModel(
+            kind="cars_export",
+            status="queued",
+            user_id=ctx["manager_id"],
+            params="{}",
+            progress=0,
+            created_at=datetime.now(),
+        )
+        db.add(job)
+        await db.commit()
+        return job.id
+
+
+def _car_payload(ctx, vin: str) -> dict:
+    car = ctx["car"]
+    return {
+        "vin": vin,
+        "vehicle_model_id": car.vehicle_model_id,
+        "engine_model_id": car.engine_model_id,
+        "transmission_model_id": car.transmission_model_id,
+        "drive_axle_model_id": car.drive_axle_model_id,
+        "steering_axle_model_id": car.steering_axle_model_id,
+        "shipment_date": "2025-01-15",
+        "client_id": car.client_id,
+        "service_company_id": car.service_company_id,
+    }
+
+
+# (метод, шаблон пути) -> функция (client, ctx, headers) -> ответ
+CASES = {
+    ("POST", "/api/login"): lambda c, ctx, h: c.post(
+        "/api/login", json={"username": "admin", "password": "admin123"}
+    ),
+    ("GET", "/api/cars/{vin}"): lambda c, ctx, h: c.get(f"/api/cars/{ctx['car'].vin}"),
+    ("GET", "/api/cars/{vin}/history"): lambda c, ctx, h: c.get(
+        f"/api/cars/{ctx['car'].vin}/history", headers=h
+    ),
+    ("GET", "/api/cars"): lambda c, ctx, h: c.get("/api/cars", headers=h),
+    ("POST", "/api/cars"): lambda c, ctx, h: c.post(
+        "/api/cars", json=_car_payload(ctx, "TESTBUDGET0000001"), headers=h
+    ),
+    ("GET", "/api/maintenance"): lambda c, ctx, h: c.get("/api/maintenance", headers=h),
+    ("POST", "/api/maintenance"): lambda c, ctx, h: c.post(
+        "/api/maintenance",
+        json={
+            "car_id": ctx["car"].id,
+            "maintenance_type_id": ctx["maintenance_type_id"],
+            "maintenance_date": "2025-03-10",
+            "order_number": "T-1",
+            "order_date": "2025-03-01",
+            "service_company_id": ctx["car"].service_company_id,
+        },
+        headers=h,
+    ),
+    ("GET", "/api/complaints"): lambda c, ctx, h: c.get("/api/complaints", headers=h),
+    ("POST", "/api/complaints"): lambda c, ctx, h: c.post(
+        "/api/complaints",
+        json={
+            "car_id": ctx["car"].id,
+            "date_of_failure": "2025-04-01",
+            "operating_time": "1200",
+            "node_failure_id": ctx["node_failure_id"],
+            "recovery_method_id": ctx["recovery_method_id"],
+            "date_recovery": "2025-04-05",
+            "service_company_id": ctx["car"].service_company_id,
+        },
+        headers=h,
+    ),
+    ("GET", "/api/analytics/maintenance"): lambda c, ctx, h: c.get(
+        "/api/analytics/maintenance", headers=h
+    ),
+    ("GET", "/api/tables"): lambda c, ctx, h: c.get("/api/tables", headers=h),
+    ("GET", "/api/bootstrap"): lambda c, ctx, h: c.get("/api/bootstrap", headers=h),
+    ("GET", "/api/search"): lambda c, ctx, h: c.get(
+        "/api/search", params={"q": ctx["car"].vin[:6]}, headers=h
+    ),
+    ("POST", "/api/cars/export"): lambda c, ctx, h: c.post("/api/cars/export", headers=h),
+    ("POST", "/api/maintenance/export"): lambda c, ctx, h: c.post(
+        "/api/maintenance/export", headers=h
+    ),
+    ("POST", "/api/complaints/export"): lambda c, ctx, h: c.post(
+        "/api/complaints/export", headers=h
+    ),
+    ("POST", "/api/analytics/rebuild"): lambda c, ctx, h: c.post(
+        "/api/analytics/rebuild", headers=h
+    ),
+    ("GET", "/api/jobs"): lambda c, ctx, h: c.get("/api/jobs", headers=h),
+    ("GET", "/api/jobs/{job_id}"): lambda c, ctx, h: c.get(
+        f"/api/jobs/{ctx['export_job_id']}", headers=h
+    ),
+    ("GET", "/api/jobs/{job_id}/result"): lambda c, ctx, h: c.get(
+        f"/api/jobs/{ctx['export_job_id']}/result", headers=h
+    ),
+    ("POST", "/api/events/ticket"): lambda c, ctx, h: c.post("/api/events/ticket", headers=h),
+    ("GET", "/api/models/vehicle"): lambda c, ctx, h: c.get("/api/models/vehicle", headers=h),
+    ("GET", "/api/models/vehicle/{model_id}"): lambda c, ctx, h: c.get(
+        f"/api/models/vehicle/{ctx['vehicle_model_id']}", headers=h
+    ),
+    ("PUT", "/api/models/engine/{model_id}"): lambda c, ctx, h: c.put(
+        f"/api/models/engine/{ctx['engine_model'].id}",
+        json={"name": ctx["engine_model"].name},
+        headers=h,
+    ),
+}
+
+
+async def _cancel(c, ctx, h):
+    return await c.post(f"/api/jobs/{await _queued_job(ctx)}/cancel", headers=h)
+
+
+async def _events(c, ctx, h):
+    ticket = (await c.post("/api/events/ticket", headers=h)).json()["ticket"]
+    return await c.get("/api/events", params={"ticket": ticket})
+
+
+CASES[("POST", "/api/jobs/{job_id}/cancel")] = _cancel
+CASES[("GET", "/api/events")] = _events
+for _dimension in ANALYTICS_DIMENSIONS:
+    CASES[("GET", f"/api/analytics/failures/{_dimension}")] = (
+        lambda c, ctx, h, d=_dimension: c.get(f"/api/analytics/failures/{d}", headers=h)
+    )
+
+
+def _template(method: str, path: str) -> tuple:
+    if path.startswith("/api/analytics/failures/"):
+        return method, "/api/analytics/failures/{dimension}"
+    return method, path
+
+
+def test_every_budgeted_route_is_covered():
+    covered = {_template(method, path) for method, path in CASES}
+    assert set(ROUTE_QUERY_BUDGETS) <= covered
+
+
+@pytest.mark.parametrize("case", list(CASES), ids=lambda case: " ".join(case))
+async def test_route_within_budget(client, ctx, manager, case):
+    response = await CASES[case](client, ctx, manager)
+    assert response.status_code < 400, response.text
+
+    budget = route_budget(*_template(*case))
+    count = int(response.headers[QUERY_COUNT_HEADER])
+    assert count <= budget, f"{' '.join(case)}: {count} SQL-запросов при бюджете {budget}"
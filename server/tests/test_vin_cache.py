@@ -0,0 +1,45 @@
+"""Кэш поиска по VIN не сохраняет ответ, устаревший из-за регистрации машины
+во время запроса к базе."""
+from vin_cache import VinLookupCache
+
+VIN = "RACE0000000000001"
+
+
+def test_lookup_started_before_invalidate_is_not_cached():
+    cache = VinLookupCache()
+    generation = cache.generation()
+    # Машину зарегистрировали, пока поиск ждал ответа базы
+    cache.invalidate(VIN)
+    cache.set(VIN, None, generation)
+
+    assert cache.get(VIN) == (False, None)
+
+
+def test_lookup_started_after_invalidate_is_cached():
+    cache = VinLookupCache()
+    cache.invalidate(VIN)
+    generation = cache.generation()
+    cache.set(VIN, {"vin": VIN}, generation)
+
+    assert cache.get(VIN) == (True, {"vin": VIN})
+
+
+def test_invalidate_of_other_vin_does_not_block_lookup():
+    cache = VinLookupCache()
+    generation = cache.generation()
+    cache.invalidate("OTHER000000000001")
+    cache.set(VIN, None, generation)
+
+    assert cache.get(VIN) == (True, None)
+
+
+def test_forgotten_invalidate_still_blocks_older_lookup():
+    cache = VinLookupCache(maxsize=2)
+    generation = cache.generation()
+    cache.invalidate(VIN)
+    # Отметка VIN вытеснена более поздними
+    cache.invalidate("OTHER000000000001")
+    cache.invalidate("OTHER000000000002")
+    cache.set(VIN, None, generation)
+
+    assert cache.get(VIN) == (False, None)
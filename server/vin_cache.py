@@ -0,0 +1,87 @@
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from reference_cache import reference_cache
+
+# Ограничения кэша публичного поиска по VIN
+VIN_CACHE_MAXSIZE = 10_000
+VIN_CACHE_TTL = 300.0
+# Отрицательные ответы живут меньше, чтобы новая машина быстро стала видна
+VIN_CACHE_NEGATIVE_TTL = 30.0
+
+
+class VinLookupCache:
+    """LRU-кэш ответов GET /cars/{vin} с ограничением по времени жизни.
+
+    Запись хранит версию кэша справочников на момент сохранения: любое
+    изменение справочника делает все записи устаревшими без явного обхода.
+    Для неизвестных VIN хранится None (отрицательное кэширование).
+
+    Поиск, начатый до регистрации машины, может закончиться уже после её
+    invalidate и сохранить устаревшее «не найдено». Поэтому invalidate
+    отмечает VIN номером поколения, а set с поколением, взятым до запроса
+    к базе, ничего не сохраняет, если VIN с тех пор сбрасывался.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = VIN_CACHE_MAXSIZE,
+        ttl: float = VIN_CACHE_TTL,
+        negative_ttl: float = VIN_CACHE_NEGATIVE_TTL,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._data: "OrderedDict[str, Tuple[float, int, Optional[dict]]]" = OrderedDict()
+        self._generation = 0
+        # VIN -> поколение последнего invalidate; хранится не больше maxsize
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        # Поколение последней вытесненной отметки: поиски, начатые раньше,
+        # уже не проверить по VIN, и их результат не сохраняется
+        self._forgotten = 0
+
+    def get(self, vin: str) -> Tuple[bool, Optional[dict]]:
+        """Возвращает (найдено_в_кэше, значение)"""
+        item = self._data.get(vin)
+        if item is None:
+            return False, None
+        expires_at, version, value = item
+        if expires_at < time.monotonic() or version != reference_cache.version:
+            del self._data[vin]
+            return False, None
+        self._data.move_to_end(vin)
+        return True, value
+
+    def generation(self) -> int:
+        """Текущее поколение; берётся перед запросом к базе и передаётся в set"""
+        return self._generation
+
+    def set(self, vin: str, value: Optional[dict], generation: Optional[int] = None) -> None:
+        if generation is not None and (
+            generation < self._forgotten or self._invalidated.get(vin, 0) > generation
+        ):
+            # VIN сбрасывался, пока шёл запрос: ответ мог устареть
+            return
+        ttl = self.ttl if value is not None else self.negative_ttl
+        self._data[vin] = (time.monotonic() + ttl, reference_cache.version, value)
+        self._data.move_to_end(vin)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, vin: Any) -> None:
+        self._data.pop(vin, None)
+        self._generation += 1
+        self._invalidated[vin] = self._generation
+        self._invalidated.move_to_end(vin)
+        while len(self._invalidated) > self.maxsize:
+            _, self._forgotten = self._invalidated.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+vin_cache = VinLookupCache()
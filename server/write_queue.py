@@ -0,0 +1,131 @@
+"""Групповая фиксация записей (group commit) для SQLite.
+
+Без очереди каждый POST создания машины, ТО или рекламации открывает свою
+пишущую транзакцию: при всплеске запросов они ждут блокировку записи SQLite
+по очереди, каждая платит за свой fsync, часть падает с SQLITE_BUSY.
+
+При SILANT_GROUP_COMMIT=1 вставки идут через одну задачу-писателя. Она берёт
+всё, что накопилось в очереди за SILANT_GROUP_COMMIT_WINDOW_MS, выполняет в
+одной транзакции и отдаёт каждому вызывающему его результат. Если пачка не
+зафиксировалась, записи повторяются по одной, чтобы ошибка одной (например,
+дубликат VIN) не отменяла остальные.
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from metrics import group_commit_batch
+
+GROUP_COMMIT = os.getenv("SILANT_GROUP_COMMIT", "0") == "1"
+# Сколько писатель ждёт попутные записи после первой; 0 — берёт только уже ждущие
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("SILANT_GROUP_COMMIT_WINDOW_MS", "2"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("SILANT_GROUP_COMMIT_MAX_BATCH", "256"))
+
+T = TypeVar("T")
+# Запись: получает сессию писателя, добавляет объекты и делает flush, но не commit
+Work = Callable[[AsyncSession], Awaitable[T]]
+
+
+class WriteQueue:
+    def __init__(self, window_ms: float, max_batch: int):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._writer())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Очередь записи остановлена"))
+
+    async def run(self, db: AsyncSession, work: Work) -> T:
+        """Выполняет запись: через писателя, если очередь запущена, иначе в db"""
+        if not self.running:
+            result = await work(db)
+            await db.commit()
+            return result
+        # Сессия обработчика (проверки перед записью) отдаёт соединение в пул:
+        # в production-профиле пишущее соединение SQLite одно, и оно нужно писателю
+        await db.commit()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((work, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Work, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _writer(self) -> None:
+        while True:
+            batch = await self._collect()
+            group_commit_batch.observe(len(batch))
+            try:
+                results = await self._commit([work for work, _ in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    _resolve(batch[0][1], error=e)
+                    continue
+                # Повтор по одной: виновная запись получит свою ошибку
+                for work, future in batch:
+                    try:
+                        (result,) = await self._commit([work])
+                    except Exception as single_error:
+                        _resolve(future, error=single_error)
+                    else:
+                        _resolve(future, result)
+                continue
+            for (_, future), result in zip(batch, results):
+                _resolve(future, result)
+
+    @staticmethod
+    async def _commit(works: List[Work]) -> list:
+        async with AsyncSessionLocal() as session:
+            results = [await work(session) for work in works]
+            await session.commit()
+        return results
+
+
+def _resolve(future: asyncio.Future, result=None, error: Optional[BaseException] = None) -> None:
+    # Клиент мог отключиться, пока запись ждала в очереди
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+write_queue = WriteQueue(GROUP_COMMIT_WINDOW_MS, GROUP_COMMIT_MAX_BATCH)